@@ -1,2 +1,38 @@
 __version__ = "0.0.1"
+import sys as _sys
 from .simplydrug import *
+from .dose_response import *
+from .parallel import *
+from .kinetics import *
+from .layout import *
+from .library import *
+from .campaign import *
+from .stats import *
+from .platestack import *
+from .kinetic_store import *
+from .memo import *
+from .instrument import *
+from .synthetic import *
+from .ingest import *
+
+# The compute core above only needs numpy, pandas and scipy. The plotting (matplotlib, seaborn) and reporting (python-pptx, PIL)
+# submodules are imported on first use of one of their names, so `import simplydrug` stays fast in headless pipelines.
+_LAZY = {'plotting': ['heatmap_plate', 'histogram_feature', 'plot_dr', 'plot_dr_viability', 'plot_polynomial', 'plot_treatments',
+                      'plot_curve_raw', 'plot_curve_mean', 'pointplot_plate'],
+         'render': ['get_render_config', 'set_render_config', 'render_config', 'new_figure', 'save_figure', 'render_batch'],
+         'report': ['ReportBuilder', 'folder_artifacts', 'df_to_table', 'create_presentation']}
+_LAZY_NAMES = {name: module for module, names in _LAZY.items() for name in names}
+_CORE = ['simplydrug', 'dose_response', 'parallel', 'kinetics', 'layout', 'library', 'campaign', 'stats', 'platestack', 'kinetic_store',
+         'memo', 'instrument', 'synthetic', 'ingest']
+__all__ = [name for module in _CORE for name in _sys.modules[f'{__name__}.{module}'].__all__] + list(_LAZY_NAMES) # `import *` loads the lazy ones too
+
+def __getattr__(name):
+    if name in _LAZY_NAMES:
+        import importlib
+        value = getattr(importlib.import_module(f'.{_LAZY_NAMES[name]}', __name__), name)
+        globals()[name] = value # later lookups skip __getattr__
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_NAMES))
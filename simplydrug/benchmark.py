@@ -0,0 +1,636 @@
+__all__ = ['SCALES', 'public_functions', 'benchmark_cases', 'uncovered', 'run_benchmarks', 'save_baseline', 'load_baseline',
+           'compare_baseline', 'default_baseline']
+
+# Cell
+import os
+import sys
+import json
+import time
+import logging
+import platform
+import tempfile
+import inspect
+import importlib
+import pkgutil
+import tracemalloc
+from datetime import date
+import numpy as np
+import pandas as pd
+
+# Cell
+SCALES = {'small': dict(n_plates = 2, n_wells = 96, n_times = 24, n_compounds = 50, n_plot = 2),
+          'medium': dict(n_plates = 8, n_wells = 384, n_times = 48, n_compounds = 500, n_plot = 4),
+          'large': dict(n_plates = 32, n_wells = 1536, n_times = 96, n_compounds = 5000, n_plot = 8)}
+
+def public_functions():
+    """Public functions and classes of simplydrug, the names exported by the `__all__` of every module
+    (constants such as PLATE_FORMATS are left out), mapped to their module name."""
+    import simplydrug
+    names = {}
+    for module in pkgutil.iter_modules(simplydrug.__path__):
+        if module.name.startswith('_') or module.name == 'benchmark':
+            continue
+        mod = importlib.import_module(f'simplydrug.{module.name}')
+        for name in getattr(mod, '__all__', []):
+            if callable(getattr(mod, name)):
+                names[name] = module.name
+    return names
+
+# Cell
+class _Data:
+    """Synthetic inputs of one benchmark scale, generated on first use and shared by the cases."""
+    def __init__(self, scale, path, n_jobs):
+        self.scale, self.path, self.n_jobs, self._cache = dict(scale), path, n_jobs, {}
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name not in self._cache:
+            self._cache[name] = getattr(self, '_make_' + name)()
+        return self._cache[name]
+
+    def folder(self, name):
+        """Empty output folder for a case."""
+        folder = os.path.join(self.path, name)
+        os.makedirs(folder, exist_ok = True)
+        for f in os.listdir(folder):
+            if os.path.isfile(os.path.join(folder, f)):
+                os.remove(os.path.join(folder, f))
+        return folder
+
+    def _make_screen(self):
+        from .synthetic import write_synthetic_screen
+        s = self.scale
+        return write_synthetic_screen(os.path.join(self.path, 'screen'), s['n_plates'], s['n_wells'], s['n_times'])
+
+    def _make_layout(self):
+        from .layout import load_layout
+        return load_layout(self.screen['layout_path'], disk_cache = False)
+
+    def _make_excel_reading(self):
+        """The first plate reading also written as an excel file, next to the csv files."""
+        path = os.path.splitext(self.screen['readings'][0])[0] + '.xlsx'
+        pd.read_csv(self.screen['readings'][0]).to_excel(path, index = False)
+        return path
+
+    def _make_reading(self):
+        return pd.read_csv(self.screen['readings'][0]).drop(columns = ['Plate'])
+
+    def _make_growth(self):
+        from .simplydrug import get_growth_scores, add_layout
+        return add_layout(get_growth_scores(self.reading), self.layout, self.screen['chem_path'], self.screen['chem_plates'][0])
+
+    def _make_curves(self):
+        from .simplydrug import filter_curves
+        return filter_curves(self.growth).reset_index(drop = True)
+
+    def _make_results(self):
+        from .simplydrug import normalize_z
+        results = normalize_z(self.curves.drop_duplicates(subset = ['Well']).copy(), 'gscore')
+        results['Result'] = np.where(results.gscore_norm >= 2.5, 'Hit', results.Result)
+        return results
+
+    def _make_readout(self):
+        from .synthetic import synthetic_readout
+        return synthetic_readout(self.screen['chem_plates'], self.layout, ('Signal', 'Area'))
+
+    def _make_dr(self):
+        from .synthetic import synthetic_dose_response
+        return synthetic_dose_response(self.scale['n_compounds'])
+
+    def _make_dr_plot(self):
+        return self.dr[self.dr.Compound_id.isin(self.dr.Compound_id.unique()[:self.scale['n_plot']])]
+
+    def _make_stacked(self):
+        from .dose_response import stack_curves
+        df_mean = self.dr.groupby(['Compound_id', 'Dose'], as_index = False).Response.mean()
+        return stack_curves(df_mean)
+
+    def _make_kinetic_store(self):
+        from .kinetic_store import KineticStore
+        return KineticStore(os.path.join(self.path, 'kinetic_store'))
+
+    def _make_enzyme_read(self):
+        """Enzyme kinetics read: one row per well, one column per timepoint ('0s', '30s', ...)."""
+        rng = np.random.default_rng(0)
+        n_wells, n_times = self.scale['n_wells'], self.scale['n_times']
+        times = 30*np.arange(n_times)
+        rates = rng.uniform(0, 2, n_wells)[:, None]
+        reads = 100 + rates*times*np.exp(-times/times.max()) + rng.normal(0, 1, (n_wells, n_times))
+        read = pd.DataFrame(reads, columns = [f'{t}s' for t in times])
+        read.insert(0, 'Well', self.layout['Well'])
+        return read
+
+# Cell
+_CASES = []
+
+def _case(setup):
+    """Registers a benchmark case. The decorated function gets the _Data of the scale and returns the callable that is timed."""
+    _CASES.append((setup.__name__.lstrip('_'), setup))
+    return setup
+
+def benchmark_cases():
+    """Names of the benchmark cases."""
+    return [name for name, _ in _CASES]
+
+def _public_code():
+    """Code objects of the public functions and of the methods of the public classes, mapped to the public name."""
+    code = {}
+    for name, module in public_functions().items():
+        obj = getattr(importlib.import_module(f'simplydrug.{module}'), name)
+        members = [m for v in vars(obj).values() for m in (getattr(v, '__func__', v), getattr(v, 'fget', None))] if isinstance(obj, type) else [obj]
+        for member in members:
+            member = inspect.unwrap(member) if callable(member) else member
+            if hasattr(member, '__code__'):
+                code[member.__code__] = name
+    return code
+
+def _calls(run, code):
+    """Public functions called (in this process, threads included) while run() runs, recorded with a profiler hook."""
+    import threading
+    called = set()
+    def profile(frame, event, arg):
+        if event == 'call' and frame.f_code in code:
+            called.add(code[frame.f_code])
+    threading.setprofile(profile)
+    sys.setprofile(profile)
+    try:
+        run()
+    finally:
+        sys.setprofile(None)
+        threading.setprofile(None)
+    return called
+
+def uncovered(results):
+    """Public functions not called by any case of a benchmark run (the output of `run_benchmarks` with coverage = True)."""
+    covered = {name for covers in results.covers for name in covers.split(', ') if name}
+    return sorted(set(public_functions()) - covered)
+
+# Cell
+# layout and library
+@_case
+def _order_wells(data):
+    from .simplydrug import order_wells
+    wells = np.random.default_rng(0).permutation(np.tile(data.layout['Well'], data.scale['n_plates']))
+    return lambda: order_wells(wells)
+
+@_case
+def _infer_geometry(data):
+    from .layout import infer_geometry
+    wells = data.readout.Well.values
+    return lambda: infer_geometry(wells)
+
+@_case
+def _load_layout(data):
+    from .layout import load_layout, clear_layout_cache
+    def run():
+        clear_layout_cache()
+        return load_layout(data.screen['layout_path'], disk_cache = False)
+    return run
+
+@_case
+def _build_library(data):
+    from .library import build_library, open_library
+    store = os.path.join(data.path, 'library_store')
+    return lambda: open_library(build_library(data.screen['chem_path'], store).store_path).plate(data.screen['chem_plates'][-1])
+
+@_case
+def _add_layout(data):
+    from .simplydrug import add_layout
+    scores = data.growth[['Well', 'Time', 'OD', 'grate', 'gscore']]
+    return lambda: add_layout(scores, data.layout, data.screen['chem_path'], data.screen['chem_plates'][0])
+
+# Cell
+# plate reader ingestion
+@_case
+def _read_plates(data):
+    """Plate reader files (csv and excel) parsed with explicit dtypes, the cache is cleared before every run."""
+    from .ingest import read_plates, clear_plate_cache
+    paths = data.screen['readings'] + [data.excel_reading]
+    def run():
+        clear_plate_cache(os.path.dirname(paths[0]))
+        return read_plates(paths, n_jobs = data.n_jobs)
+    return run
+
+@_case
+def _read_plates_cached(data):
+    """The same files loaded from the cache and melted to the long format."""
+    from .ingest import read_plates
+    paths = data.screen['readings'] + [data.excel_reading]
+    read_plates(paths, n_jobs = data.n_jobs)
+    return lambda: read_plates(paths, long = True)
+
+# Cell
+# kinetics
+@_case
+def _get_growth_scores(data):
+    from .simplydrug import get_growth_scores
+    return lambda: get_growth_scores(data.reading)
+
+@_case
+def _filter_curves(data):
+    from .simplydrug import filter_curves
+    return lambda: filter_curves(data.growth)
+
+@_case
+def _initial_rates(data):
+    """Initial rates over an automatic range (prefix fits) and over a fixed window (`linear_fits`)."""
+    from .kinetics import initial_rates
+    return lambda: (initial_rates(data.enzyme_read, auto = True), initial_rates(data.enzyme_read, window = 10))
+
+@_case
+def _kinetic_store(data):
+    from .simplydrug import get_growth_scores
+    return lambda: get_growth_scores(data.kinetic_store.add_plate('bench', data.reading))
+
+# Cell
+# statistics and normalization
+@_case
+def _run_statistics(data):
+    from .simplydrug import run_statistics
+    return lambda: run_statistics(data.readout, 'Signal')
+
+@_case
+def _normalize_z(data):
+    from .simplydrug import normalize_z
+    return lambda: normalize_z(data.readout.copy(), 'Signal')
+
+@_case
+def _normalize_b(data):
+    from .simplydrug import normalize_b
+    return lambda: normalize_b(data.readout.copy(), 'Signal', plate = 'Plate')
+
+@_case
+def _plate_stack(data):
+    from .platestack import PlateStack
+    from .simplydrug import normalize_b
+    return lambda: normalize_b(PlateStack.from_frame(data.readout, ['Signal', 'Area']), 'Signal').to_frame()
+
+@_case
+def _screen_stats(data):
+    from .stats import ScreenStats
+    plates = list(data.readout.groupby('Plate'))
+    def run():
+        stats = ScreenStats('Signal')
+        for plate, df in plates:
+            stats.update(df, plate)
+        return stats.summary(), stats.robust_z(plates[0][1])
+    return run
+
+# Cell
+# dose response
+@_case
+def _fit_dr(data):
+    from .dose_response import fit_dr
+    return lambda: fit_dr(data.dr)
+
+@_case
+def _fit_dr_uncertainty(data):
+    from .dose_response import fit_dr
+    return lambda: fit_dr(data.dr, uncertainty = 'bootstrap', n_boot = 50)
+
+@_case
+def _fit_ll4_bounded(data):
+    from .dose_response import fit_ll4_batch
+    names, x, y, mask = data.stacked
+    return lambda: fit_ll4_batch(x, y, mask, p0 = 'self_start', bounds = 'physical')
+
+@_case
+def _prune_dose(data):
+    from .simplydrug import prune_dose
+    return lambda: prune_dose(data.dr)
+
+@_case
+def _fit_polynomials(data):
+    from .plotting import plot_polynomial
+    return lambda: plot_polynomial(data.dr, 'Response', None, None, plot = False)
+
+@_case
+def _run_dr_parallel(data):
+    from .parallel import run_dr_parallel
+    return lambda: run_dr_parallel(data.dr, 'Response', None, None, n_jobs = data.n_jobs, plot = False)
+
+# Cell
+# memoization
+@_case
+def _memo_hit(data):
+    from .memo import enable_cache, disable_cache, cache_stats
+    from .dose_response import fit_dr
+    def run():
+        enable_cache(path = os.path.join(data.path, 'memo'))
+        try:
+            fit_dr(data.dr) # stored on the first call, a hit afterwards
+            return fit_dr(data.dr), cache_stats()
+        finally:
+            disable_cache()
+    return run
+
+@_case
+def _memo_store(data):
+    """A fit computed and stored in an emptied cache, the cost of a miss compared to fit_dr."""
+    from .memo import enable_cache, disable_cache, cache_enabled, clear_cache
+    from .dose_response import fit_dr
+    def run():
+        enable_cache(path = os.path.join(data.path, 'memo_store'))
+        try:
+            clear_cache()
+            return fit_dr(data.dr), cache_enabled()
+        finally:
+            disable_cache()
+    return run
+
+# Cell
+# instrumentation
+@_case
+def _instrumented(data):
+    from .instrument import instrumented, instrumentation_enabled, MemorySink, JsonLinesSink
+    from .simplydrug import get_growth_scores, normalize_z
+    calls = os.path.join(data.path, 'calls.jsonl')
+    def run():
+        with instrumented(MemorySink(), JsonLinesSink(calls), strict = True) as (sink, _):
+            for _ in range(10):
+                normalize_z(get_growth_scores(data.reading).assign(Status = 'Sample'), 'gscore')
+            assert instrumentation_enabled()
+        return sink.summary()
+    return run
+
+# Cell
+# import time and call overhead
+_HEAVY_MODULES = ('matplotlib', 'seaborn', 'pptx', 'PIL', 'scipy.stats', 'scipy.optimize')
+
+@_case
+def _cold_import(data):
+    """`import simplydrug` in a fresh interpreter (the time includes the interpreter start-up). Fails when the import
+    loads plotting, reporting or other heavy modules that the compute core should not need."""
+    import subprocess
+    code = f'import sys, simplydrug; print(",".join(m for m in {_HEAVY_MODULES!r} if m in sys.modules))'
+    def run():
+        heavy = subprocess.run([sys.executable, '-c', code], capture_output = True, text = True, check = True).stdout.strip()
+        if heavy:
+            raise RuntimeError(f'import simplydrug loads {heavy}')
+    return run
+
+@_case
+def _call_overhead(data):
+    """100 calls of core functions on a 4-well plate, where the time is spent in the calls and not in the computation,
+    and 100 calls of a function decorated with `instrument` and `handle_exceptions` (decorated once per run)."""
+    from .simplydrug import order_wells, normalize_z, run_statistics, handle_exceptions
+    from .instrument import instrument
+    tiny = pd.DataFrame({'Well': ['A2', 'A1', 'B1', 'B2'], 'Status': ['Sample', 'Sample', 'Positive', 'Negative'], 'Signal': [1., 2., 3., 4.]})
+    def run():
+        noop = handle_exceptions(instrument(lambda x: x, catch = False))
+        for _ in range(100):
+            order_wells(tiny.Well)
+            normalize_z(tiny, 'Signal')
+            run_statistics(tiny, 'Signal')
+            noop(tiny)
+    return run
+
+# Cell
+# plots and reports
+@_case
+def _heatmap_plate(data):
+    from .plotting import heatmap_plate
+    folder = data.folder('heatmap')
+    return lambda: heatmap_plate(data.results, data.layout, ['gscore_norm'], folder, 'heatmap.png')
+
+@_case
+def _histogram_feature(data):
+    from .plotting import histogram_feature
+    folder = data.folder('histogram')
+    return lambda: histogram_feature(data.results, 'gscore_norm', folder, 'histogram.png')
+
+@_case
+def _plot_curve_raw(data):
+    from .plotting import plot_curve_raw
+    from .campaign import _HUE_ORDER, _PALETTE
+    folder = data.folder('curve_raw')
+    return lambda: plot_curve_raw(data.curves, 'Time', 'OD', 'Well', 'Result', _HUE_ORDER, 'Time, h', 'OD', data.scale['n_times'], _PALETTE,
+                                  folder, 'curves.png')
+
+@_case
+def _plot_curve_mean(data):
+    from .plotting import plot_curve_mean
+    from .campaign import _HUE_ORDER, _PALETTE
+    folder = data.folder('curve_mean')
+    return lambda: plot_curve_mean(data.curves, 'Time', 'OD', 'Result', _HUE_ORDER, 'Time, h', 'OD', data.scale['n_times'], _PALETTE,
+                                   folder, 'curves.png')
+
+@_case
+def _pointplot_plate(data):
+    from .plotting import pointplot_plate
+    from .campaign import _HUE_ORDER, _PALETTE
+    folder = data.folder('pointplot')
+    return lambda: pointplot_plate(data.results, 'Well', 'gscore_norm', 'Result', _HUE_ORDER, 2.5, 'gscore normalized', _PALETTE,
+                                   folder, 'pointplot.png')
+
+@_case
+def _plot_treatments(data):
+    from .plotting import plot_treatments
+    folder = data.folder('treatments')
+    df = data.readout.assign(Compound_id = data.readout.Status)
+    return lambda: plot_treatments(df, 'Compound_id', 'Signal', 'Plate', 'box', 'Signal', 'dark', 4, 1, folder, 'treatments.png')
+
+@_case
+def _run_dr(data):
+    from .simplydrug import run_dr
+    folder = data.folder('run_dr')
+    return lambda: run_dr(data.dr_plot, 'Response', folder, '.png')
+
+@_case
+def _plot_polynomial(data):
+    from .plotting import plot_polynomial
+    folder = data.folder('polynomial')
+    return lambda: plot_polynomial(data.dr_plot, 'Response', folder, '.png')
+
+@_case
+def _plot_dr_viability(data):
+    from .parallel import plot_dr_viability_parallel
+    folder = data.folder('viability')
+    df = data.dr_plot.assign(logDose = -np.log10(1e-6*data.dr_plot.Dose))
+    return lambda: plot_dr_viability_parallel(df, 'Response', folder, n_jobs = data.n_jobs)
+
+@_case
+def _render_batch(data):
+    """A queue of plots rendered as svg files, the format set for the batch with `render_config`."""
+    from .plotting import histogram_feature
+    from .render import render_batch, render_config
+    folder = data.folder('render_batch')
+    specs = [(histogram_feature, dict(df = data.results, feature = 'gscore_norm', path = folder, save_as = f'histogram_{i}.png'))
+             for i in range(4)]
+    def run():
+        with render_config(format = 'svg'):
+            return render_batch(specs, n_jobs = data.n_jobs, processes = data.n_jobs > 1)
+    return run
+
+@_case
+def _df_to_table(data):
+    """The per-well results written as one table slide."""
+    from pptx import Presentation
+    from pptx.util import Inches
+    from .report import df_to_table
+    def run():
+        prs = Presentation()
+        slide = prs.slides.add_slide(prs.slide_layouts[6])
+        return df_to_table(data.results, slide, Inches(0.5), Inches(0.5), Inches(9), Inches(6.5))
+    return run
+
+@_case
+def _create_presentation(data):
+    from .simplydrug import run_statistics
+    from .plotting import histogram_feature
+    from .report import create_presentation
+    folder = data.folder('report')
+    histogram_feature(data.results, 'gscore_norm', folder, 'gscore_norm_histogram.png')
+    run_statistics(data.results, 'gscore_norm').to_csv(os.path.join(folder, 'sum_statistics.csv'), index = False)
+    return lambda: create_presentation(folder, n_jobs = data.n_jobs).save(os.path.join(data.path, 'report.pptx'))
+
+# Cell
+# pipelines and synthetic data
+@_case
+def _run_campaign(data):
+    from .campaign import run_campaign
+    folder = data.folder('campaign')
+    return lambda: run_campaign(path = folder, n_jobs = data.n_jobs, plots = False, **data.screen)
+
+@_case
+def _write_synthetic_screen(data):
+    from .synthetic import write_synthetic_screen
+    s = data.scale
+    return lambda: write_synthetic_screen(os.path.join(data.path, 'synthetic'), s['n_plates'], s['n_wells'], s['n_times'])
+
+@_case
+def _synthetic_readout(data):
+    from .synthetic import synthetic_readout, synthetic_dose_response
+    return lambda: (synthetic_readout(data.screen['chem_plates'], data.layout), synthetic_dose_response(data.scale['n_compounds']))
+
+# Cell
+def _measure(run, repeat, min_time, memory):
+    """Best wall time of up to repeat calls (stopping once min_time seconds are spent), and the peak traced memory of one more call."""
+    times = []
+    while len(times) < repeat and (not times or sum(times) < min_time):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    peak = np.nan
+    if memory:
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1]/2**20
+        finally:
+            tracemalloc.stop()
+    return min(times), len(times), peak
+
+def run_benchmarks(scale = 'small', only = None, repeat = 5, min_time = 1., memory = True, coverage = True, n_jobs = 1, path = None, dpi = 72):
+    """Runs the benchmark cases on synthetic data of a scale in SCALES (or a dict with the same keys). only restricts the run
+    to the cases whose name contains one of the given strings. Every case is timed up to repeat times (best time is kept)
+    and then run once more under tracemalloc for the peak memory in MiB. Memory allocated in worker processes
+    (cases with n_jobs > 1) is not traced. With coverage = True every case is run once more with a profiler hook that records
+    the public functions it calls, in this process and its threads only (see `uncovered`). Plots are rendered at dpi.
+    Setting up the inputs is not part of the timings.
+    Returns a DataFrame with 'case', 'covers' (the public functions called), 'time' (seconds), 'runs', 'peak_mb' and 'error' for every case."""
+    from .render import render_config
+    from .memo import _MEMO
+    settings = SCALES[scale] if isinstance(scale, str) else scale
+    cases = [c for c in _CASES if only is None or any(pattern in c[0] for pattern in ([only] if isinstance(only, str) else only))]
+    rows = []
+    level, memo = logging.getLogger().level, dict(_MEMO)
+    logging.getLogger().setLevel(logging.WARNING) # the functions log every file they write
+    _MEMO['enabled'] = False # cached results would hide the computations
+    with tempfile.TemporaryDirectory(dir = path) as tmp, render_config(dpi = dpi):
+        data, code = _Data(settings, tmp, n_jobs), _public_code() if coverage else {}
+        try:
+            for name, setup in cases:
+                row = dict(case = name, covers = '', time = np.nan, runs = 0, peak_mb = np.nan, error = '')
+                try:
+                    run = setup(data)
+                    row['time'], row['runs'], row['peak_mb'] = _measure(run, repeat, min_time, memory)
+                    if coverage:
+                        row['covers'] = ', '.join(sorted(_calls(run, code)))
+                except Exception as e:
+                    row['error'] = f'{type(e).__name__}: {e}'
+                rows.append(row)
+                logging.warning(f'run_benchmarks: {name} {row["time"]:.4f} s, {row["peak_mb"]:.1f} MiB {row["error"]}')
+        finally:
+            logging.getLogger().setLevel(level)
+            _MEMO.update(memo)
+    return pd.DataFrame(rows)
+
+# Cell
+def _environment():
+    import scipy
+    import matplotlib
+    from . import __version__
+    return {'simplydrug': __version__, 'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'scipy': scipy.__version__, 'matplotlib': matplotlib.__version__, 'machine': platform.machine(), 'cpus': os.cpu_count()}
+
+def save_baseline(results, file, scale = 'small'):
+    """Stores benchmark results (the output of `run_benchmarks`) as a json baseline with the versions of the environment."""
+    baseline = {'scale': scale if isinstance(scale, str) else 'custom', 'date': str(date.today()), 'environment': _environment(),
+                'results': {row.case: {'time': row.time, 'peak_mb': row.peak_mb} for row in results.itertuples() if not row.error}}
+    with open(file, 'w') as f:
+        json.dump(baseline, f, indent = 1, sort_keys = True)
+    return file
+
+def load_baseline(file):
+    with open(file) as f:
+        return json.load(f)
+
+def compare_baseline(results, baseline, time_tolerance = 1.5, memory_tolerance = 1.25, min_time = 0.005, min_mb = 1.):
+    """Compares benchmark results to a baseline (a file or the output of `load_baseline`). A case regresses when it fails,
+    or when it is more than time_tolerance times slower or needs more than memory_tolerance times the peak memory of the baseline.
+    Cases under min_time seconds, and memory increases under min_mb MiB, are too noisy to judge.
+    Returns the results with the baseline values, the 'time_ratio' and 'memory_ratio' and a 'regression' flag."""
+    if isinstance(baseline, str):
+        baseline = load_baseline(baseline)
+    base = pd.DataFrame.from_dict(baseline['results'], orient = 'index').add_prefix('base_')
+    out = results.merge(base, how = 'left', left_on = 'case', right_index = True)
+    out['time_ratio'] = out.time/out.base_time
+    out['memory_ratio'] = out.peak_mb/out.base_peak_mb
+    slow = (out.time_ratio > time_tolerance) & (out.time > min_time)
+    heavy = (out.memory_ratio > memory_tolerance) & (out.peak_mb - out.base_peak_mb > min_mb)
+    out['regression'] = (out.error != '') | slow | heavy
+    return out
+
+# Cell
+def default_baseline(scale = 'small'):
+    """Baseline file of a scale in the benchmarks folder of the source tree (benchmarks/baseline_<scale>.json)."""
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', f'baseline_{scale}.json')
+
+def _main(argv = None):
+    import argparse
+    parser = argparse.ArgumentParser(prog = 'python -m simplydrug.benchmark', description = 'Benchmarks simplydrug on synthetic screening data.')
+    parser.add_argument('scale', nargs = '?', default = 'small', choices = list(SCALES))
+    parser.add_argument('--only', nargs = '*', help = 'run only the cases whose name contains one of these strings')
+    parser.add_argument('--baseline', help = 'json baseline to compare to, or to write with --save (default: benchmarks/baseline_<scale>.json, '
+                                             'compared to when it exists)')
+    parser.add_argument('--save', action = 'store_true', help = 'store the results as the baseline')
+    parser.add_argument('--no-compare', action = 'store_true', help = 'do not compare to the baseline')
+    parser.add_argument('--repeat', type = int, default = 5)
+    parser.add_argument('--jobs', type = int, default = 1)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.scale, only = args.only, repeat = args.repeat, n_jobs = args.jobs)
+    if not args.only:
+        missing = uncovered(results)
+        if missing:
+            logging.warning(f'benchmark: public functions not called by any case: {missing}')
+    pd.set_option('display.width', 200)
+    baseline = args.baseline or default_baseline(args.scale)
+    if args.save:
+        save_baseline(results, baseline, args.scale)
+        print(results[['case', 'time', 'runs', 'peak_mb', 'error']].to_string(index = False))
+        return 0
+    if not args.no_compare and os.path.exists(baseline):
+        report = compare_baseline(results, baseline)
+        new = list(report.case[report.base_time.isna() & (report.error == '')])
+        if new:
+            logging.warning(f'benchmark: cases missing from {baseline}, run with --save to record them: {new}')
+        print(report[['case', 'time', 'base_time', 'time_ratio', 'peak_mb', 'base_peak_mb', 'memory_ratio', 'regression', 'error']].to_string(index = False))
+        return int(report.regression.any())
+    print(results[['case', 'time', 'runs', 'peak_mb', 'error']].to_string(index = False))
+    return int((results.error != '').any())
+
+if __name__ == '__main__':
+    sys.exit(_main())
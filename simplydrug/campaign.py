@@ -0,0 +1,149 @@
+__all__ = ['PlateTimer', 'growth_plate_pipeline', 'run_campaign']
+
+# Cell
+import os
+import time
+import logging
+import numpy as np
+import pandas as pd
+from .layout import load_layout
+from .library import ChemLibrary, open_library
+from .parallel import _map_shards, _run_logged
+from .ingest import read_plate
+from .instrument import instrument
+
+# Cell
+class PlateTimer:
+    """Records the wall time of the named steps of a plate pipeline, e.g.
+    `with timer('add_layout'): ...`. `timings` maps step names to seconds, in the order the steps ran."""
+    def __init__(self):
+        self.timings = {}
+
+    def __call__(self, step):
+        self._step = step
+        return self
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timings[self._step] = self.timings.get(self._step, 0.) + time.perf_counter() - self._start
+        return False
+
+# Cell
+_HUE_ORDER = ['Sample', 'Negative', 'Positive', 'Hit', 'Invalid_sample']
+_PALETTE = {'Sample':'Navy','Negative':'Darkred','Positive':'Darkgreen', 'Hit': 'Orange', 'Invalid_sample':'Darkgray'}
+
+def _read_reading(reading):
+    """Plate reading as a DataFrame: a DataFrame is used as is, a csv or excel file is loaded with `read_plate` (cached next to the file)."""
+    if isinstance(reading, pd.DataFrame):
+        return reading.copy()
+    return read_plate(reading)
+
+@instrument(catch = False)
+def growth_plate_pipeline(reading, layout_path, chem_path, chem_plate, path, name, timer = None,
+                          threshold = 2.5, xlimit = 24, plots = True, report = True, keep_images = True):
+    """Analysis chain of one yeast growth plate, as in the `03b_yeast_growth_in_chain` notebook:
+    `get_growth_scores` -> `add_layout` -> `filter_curves` -> `normalize_z` -> hit calling -> plots -> `run_statistics` -> `create_presentation`.
+    All files are written to path, which should not be shared with other plates. Wells with normalized growth score >= threshold are hits.
+    Returns the per-well results (one row per well, 'Plate' column set to name). Step timings are recorded in timer (a PlateTimer) if given.
+    """
+    from . import simplydrug as sd
+    timer = timer or PlateTimer()
+
+    with timer('load'):
+        data = _read_reading(reading).drop(columns = ['Plate'], errors = 'ignore')
+    with timer('growth_scores'):
+        gs_data = sd.get_growth_scores(data)
+    with timer('add_layout'):
+        gs_data = sd.add_layout(df = gs_data, layout_path = layout_path, chem_path = chem_path, chem_plate = chem_plate)
+    with timer('filter_curves'):
+        gs_data = sd.filter_curves(gs_data)
+    with timer('normalize'):
+        results = sd.normalize_z(gs_data.drop_duplicates(subset = ['Well']).copy(), 'gscore')
+        results['Result'] = np.where((results['gscore_norm'] >= threshold) & (results['Result'] == 'Sample'), 'Hit', results['Result'])
+        gs_data = pd.merge(gs_data.drop(columns = ['Result']), results[['Well', 'Result']], how = 'left', on = 'Well')
+
+    if plots:
+        from . import plotting
+        with timer('plots'):
+            for subset, hue_order, save_as in [(gs_data, _HUE_ORDER, 'all_curves.png'),
+                                              (gs_data[gs_data.Result == 'Invalid_sample'], ['Invalid_sample'], 'invalid_curves.png'),
+                                              (gs_data[gs_data.Result != 'Invalid_sample'], _HUE_ORDER[:4], 'valid_curves.png')]:
+                if not subset.empty:
+                    plotting.plot_curve_raw(df = subset, x = 'Time', y = 'OD', units = 'Well', hue = 'Result', hue_order = hue_order,
+                                            ylabel = 'OD', xlabel = 'Time, h', xlimit = xlimit, palette = _PALETTE, path = path, save_as = save_as)
+            plotting.pointplot_plate(df = results, x = 'Well', y = 'gscore_norm', hue = 'Result', hue_order = _HUE_ORDER, threshold = threshold,
+                                     ylabel = 'gscore normalized', palette = _PALETTE, path = path, save_as = 'pointplot.png')
+            plotting.heatmap_plate(df = results, layout_path = layout_path, features = ['gscore_norm'], path = path, save_as = 'heatmap.png')
+            plotting.histogram_feature(df = results, feature = 'gscore_norm', path = path, save_as = 'gscore_norm_histogram.png')
+
+    with timer('statistics'):
+        stats = sd.run_statistics(df = results, feature = 'gscore_norm')
+        if stats is not None and not stats.empty:
+            stats.to_csv(os.path.join(path, 'sum_statistics.csv'), index = False)
+        results['Plate'] = name # library plate replaced by the plate name, as in the notebook
+        results.to_csv(os.path.join(path, name + '_results.csv'), index = False)
+        results[results.Result == 'Hit'].to_csv(os.path.join(path, name + '_hits.csv'), index = False)
+
+    if report:
+        from .report import create_presentation
+        with timer('report'):
+            images = ['all_curves.png', 'invalid_curves.png', 'valid_curves.png', 'pointplot.png', 'gscore_normheatmap.png', 'gscore_norm_histogram.png']
+            tables = ['sum_statistics.csv', name + '_hits.csv', name + '_results.csv']
+            artifacts = [os.path.join(path, f) for f in images + tables if os.path.exists(os.path.join(path, f))]
+            create_presentation(path, artifacts = artifacts).save(os.path.join(path, name + '_report.pptx'))
+    if not keep_images:
+        for f in os.listdir(path):
+            if f.endswith('.png'):
+                os.remove(os.path.join(path, f))
+    return results
+
+# Cell
+def _campaign_plate(args):
+    pipeline, reading, name, plate_path, kwargs = args
+    def run():
+        timer, start = PlateTimer(), time.perf_counter()
+        try:
+            results, error = pipeline(reading, path = plate_path, name = name, timer = timer, **kwargs), ''
+        except Exception as e:
+            logging.error(f'run_campaign: plate {name} failed: {e}')
+            results, error = None, str(e)
+        timing = dict(Plate = name, **timer.timings, total = time.perf_counter() - start, pid = os.getpid(), error = error)
+        return results, timing
+    return _run_logged(run)
+
+@instrument(catch = False)
+def run_campaign(readings, chem_plates, layout_path, chem_path, path, names = None, pipeline = growth_plate_pipeline,
+                 n_jobs = None, **kwargs):
+    """Runs the plate pipeline for every plate reading of a screening campaign in a pool of n_jobs processes (all cores by default).
+    readings are files or DataFrames, chem_plates the chemical library plate of each reading, names the plate names (chem_plates by default).
+    Every plate writes to its own folder path/<name>, so plates never overwrite each other's files.
+    The layout and the chemical library are loaded once in the parent (see `load_layout` and `open_library`) and shared with the workers.
+    pipeline is called as pipeline(reading, layout_path = ..., chem_path = ..., chem_plate = ..., path = ..., name = ..., timer = ..., **kwargs),
+    it must be a module-level function to be sent to the workers. A plate whose pipeline raises is logged and left out of the results.
+    Returns the combined per-well results of all plates, and a per-plate timing table (seconds per step, total, worker pid, error).
+    """
+    names = list(names) if names is not None else [str(plate) for plate in chem_plates]
+    if not len(readings) == len(chem_plates) == len(names):
+        raise ValueError('run_campaign: readings, chem_plates and names must have the same length')
+    if len(set(names)) != len(names):
+        raise ValueError('run_campaign: plate names must be unique, they name the output folders')
+
+    layout = load_layout(layout_path)
+    chem = open_library(chem_path) if chem_path and not isinstance(chem_path, ChemLibrary) else chem_path
+    tasks = []
+    for reading, chem_plate, name in zip(readings, chem_plates, names):
+        plate_path = os.path.join(path, name)
+        os.makedirs(plate_path, exist_ok = True)
+        tasks.append((pipeline, reading, name, plate_path,
+                      dict(kwargs, layout_path = layout, chem_path = chem, chem_plate = chem_plate)))
+
+    n_jobs = n_jobs or os.cpu_count() or 1
+    start = time.perf_counter()
+    outputs = _map_shards(_campaign_plate, tasks, min(n_jobs, len(tasks)) or 1)
+    tables = [results for results, _ in outputs if results is not None]
+    timings = pd.DataFrame([timing for _, timing in outputs])
+    logging.info(f'run_campaign: {len(tables)} of {len(tasks)} plates done in {time.perf_counter() - start:.1f} s')
+    return (pd.concat(tables, ignore_index = True) if tables else pd.DataFrame()), timings
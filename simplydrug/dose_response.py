@@ -0,0 +1,443 @@
+__all__ = ['ll4_jacobian', 'stack_curves', 'll4_self_start', 'll4_bounds', 'fit_ll4_batch', 'll4_covariance',
+           'fit_ll4_table', 'bootstrap_dr', 'fit_dr', 'fit_polynomial_batch', 'fit_polynomials']
+
+# Cell
+import numpy as np
+import pandas as pd
+from scipy.special import expit
+from .instrument import instrument
+
+# Cell
+def ll4_jacobian(x, b, c, d, e):
+    """Analytic Jacobian of the LL.4 function with respect to its parameters.
+    Arguments broadcast against each other, the result has an extra last axis ordered as (b, c, d, e).
+     - b: hill slope
+     - c: min response
+     - d: max response
+     - e: EC50"""
+    with np.errstate(all = 'ignore'):
+        logx = np.log(x) - np.log(e)
+        s = expit(-b*logx)            # 1/(1 + exp(b*(log(x) - log(e))))
+        ds = (d - c)*s*(1 - s)        # (d - c)*u/(1 + u)**2, without overflow
+        return np.stack(np.broadcast_arrays(-ds*logx, 1 - s, s, ds*b/e), axis = -1)
+
+# Cell
+def _ll4(x, p):
+    """LL.4 function evaluated on stacked curves, p has shape (n_curves, 4)."""
+    b, c, d, e = [p[:, [i]] for i in range(4)]
+    with np.errstate(all = 'ignore'):
+        return c + (d - c)*expit(-b*(np.log(x) - np.log(e)))
+
+# Cell
+def stack_curves(df, key = 'Compound_id', x = 'Dose', y = 'Response'):
+    """Stacks long-format curve data into padded 2D arrays, one row per curve.
+    Returns curve names, x and y arrays of shape (n_curves, max_points) and a boolean mask of valid points.
+    Padded points hold x = 1 and y = 0 and are excluded from every computation through the mask."""
+    df = df.sort_values(key, kind = 'mergesort')
+    codes, names = pd.factorize(df[key], sort = True)
+    counts = np.bincount(codes, minlength = len(names))
+    pos = np.arange(len(codes)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    shape = (len(names), counts.max() if len(names) else 0)
+    X, Y, mask = np.ones(shape), np.zeros(shape), np.zeros(shape, dtype = bool)
+    X[codes, pos] = df[x].values.astype(float)
+    Y[codes, pos] = df[y].values.astype(float)
+    mask[codes, pos] = True
+    return np.asarray(names), X, Y, mask
+
+# Cell
+def ll4_self_start(x, y, mask = None):
+    """Data-driven starting values for LL.4 fits of stacked curves (one curve per row), returns an (n_curves x 4) array ordered b, c, d, e.
+    Min and max response start slightly outside the observed response range, hill slope and EC50 come from
+    the logit linearization log((d - y)/(y - c)) = b*(log(x) - log(e)), solved in closed form for all curves at once.
+    Flat curves start from b = 1 and EC50 at the geometric mean dose."""
+    x, y = np.atleast_2d(np.asarray(x, dtype = float)), np.atleast_2d(np.asarray(y, dtype = float))
+    mask = np.ones(x.shape, dtype = bool) if mask is None else np.asarray(mask, dtype = bool)
+    N = np.maximum(mask.sum(axis = 1), 1)
+    ymin = np.where(mask, y, np.inf).min(axis = 1)
+    ymax = np.where(mask, y, -np.inf).max(axis = 1)
+    span = np.where(ymax > ymin, ymax - ymin, 1.)
+    c, d = ymin - 0.05*span, ymax + 0.05*span
+
+    with np.errstate(all = 'ignore'):
+        lx = np.where(mask, np.log(x), 0.)
+        z = np.where(mask, np.log((d[:, None] - y)/(y - c[:, None])), 0.)
+        mlx, mz = lx.sum(axis = 1)/N, z.sum(axis = 1)/N
+        dlx = np.where(mask, lx - mlx[:, None], 0.)
+        slope = np.sum(dlx*(z - mz[:, None]), axis = 1)/np.sum(dlx**2, axis = 1)
+        lx_min = np.where(mask, lx, np.inf).min(axis = 1)
+        lx_max = np.where(mask, lx, -np.inf).max(axis = 1)
+    ok = np.isfinite(slope) & (np.abs(slope) > 1e-6)
+    b = np.where(ok, slope, 1.)
+    loge = np.where(ok, mlx - mz/np.where(ok, slope, 1.), mlx)
+    loge = np.clip(loge, lx_min - np.log(100), lx_max + np.log(100)) # keep EC50 within two logs of the tested doses
+    return np.column_stack([b, c, d, np.exp(loge)])
+
+# Cell
+def ll4_bounds(x, y, mask = None, max_slope = 50., dose_margin = 100.):
+    """Physical bounds for LL.4 fits of stacked curves, returns (lower, upper) arrays of shape (n_curves x 4) ordered b, c, d, e.
+     - b: hill slope within +/- max_slope
+     - c, d: min and max response within one response range below the lowest and above the highest response
+     - e: EC50 within dose_margin-fold of the lowest and highest dose"""
+    x, y = np.atleast_2d(np.asarray(x, dtype = float)), np.atleast_2d(np.asarray(y, dtype = float))
+    mask = np.ones(x.shape, dtype = bool) if mask is None else np.asarray(mask, dtype = bool)
+    ymin = np.where(mask, y, np.inf).min(axis = 1)
+    ymax = np.where(mask, y, -np.inf).max(axis = 1)
+    span = np.where(ymax > ymin, ymax - ymin, np.abs(ymax) + 1.)
+    xmin = np.where(mask, x, np.inf).min(axis = 1)
+    xmax = np.where(mask, x, -np.inf).max(axis = 1)
+    lower = np.column_stack([np.full(len(y), -max_slope), ymin - span, ymin - span, xmin/dose_margin])
+    upper = np.column_stack([np.full(len(y), max_slope), ymax + span, ymax + span, xmax*dose_margin])
+    return lower, upper
+
+# Cell
+def _lm_step(Js, r, delta, par, n_sub = 10):
+    """Levenberg-Marquardt parameter and scaled step of stacked trust-region subproblems, as MINPACK's lmpar:
+    z minimizes ||Js z - r|| subject to ||z|| <= delta (within 10%), for every curve at once. Js is the Jacobian divided by the scaling.
+    Returns the scaled steps z and the parameters par (0 for Gauss-Newton steps inside the trust region)."""
+    U, s, Vt = np.linalg.svd(Js, full_matrices = False)
+    c = np.einsum('nki,nk->ni', U, r)
+    tiny = s <= s[:, :1]*1e-12*s.shape[1] # rank deficient directions are dropped, as by the pivoted QR of MINPACK
+    s = np.where(tiny, 0., s)
+
+    sc = s*c
+    def norm(par):
+        d = np.where(tiny, np.inf, s**2 + par[:, None])
+        w = sc/d
+        return w, np.sqrt(np.einsum('ni,ni->n', w, w)), np.einsum('ni,ni->n', w, w/d)
+
+    w, znorm, dz = norm(np.zeros(len(s)))
+    fp = znorm - delta
+    solve = fp > 0.1*delta
+    par = np.where(solve, par, 0.)
+    # bounds of the parameter: parl from the Newton step of 1/||z|| - 1/delta at 0 (0 if Js is rank deficient), paru from the gradient
+    parl = np.where(~tiny.any(axis = 1), fp/delta*znorm**2/dz, 0.)
+    gnorm = np.sqrt(np.einsum('ni,ni->n', sc, sc))
+    paru = gnorm/delta
+    paru = np.where(paru == 0, np.finfo(float).tiny/np.minimum(delta, 0.1), paru)
+    par = np.where(solve, np.minimum(np.maximum(par, parl), paru), par)
+    par = np.where(solve & (par == 0), gnorm/znorm, par)
+    for i in range(n_sub):
+        if not solve.any():
+            break
+        par = np.where(solve & (par == 0), np.maximum(np.finfo(float).tiny, 0.001*paru), par)
+        w_par, znorm_par, dz_par = norm(par)
+        w = np.where(solve[:, None], w_par, w)
+        fp, last = np.where(solve, znorm_par - delta, fp), fp
+        solve &= ~((np.abs(fp) <= 0.1*delta) | ((parl == 0) & (fp <= last) & (last < 0)) | (i == n_sub - 1))
+        parc = fp/delta*znorm_par**2/dz_par # Newton correction
+        parl = np.where(solve & (fp > 0), np.maximum(parl, par), parl)
+        paru = np.where(solve & (fp < 0), np.minimum(paru, par), paru)
+        par = np.where(solve, np.maximum(parl, par + parc), par)
+    return np.einsum('nij,ni->nj', Vt, w), par
+
+def fit_ll4_batch(x, y, mask = None, p0 = None, bounds = None, max_iter = 1000, ftol = 1.49012e-08, xtol = 1.49012e-08,
+                  jac = 'forward'):
+    """Fits LL.4 curves to all rows of the stacked arrays at once with a vectorized Levenberg-Marquardt solver.
+    Every curve follows the scaled trust-region iteration of MINPACK (lmdif, which `scipy.optimize.curve_fit(ll4, ..., method = 'lm')` calls),
+    keeps its own trust region and is frozen as soon as it converges, so one bad curve does not slow down the others.
+    The defaults are the ones of `curve_fit`, so the fits match its results: all ones as starting point, forward difference Jacobians,
+    the same tolerances and convergence tests, and max_iter caps the function evaluations of every curve as its maxfev does
+    (a Jacobian takes 4). jac = 'analytic' uses `ll4_jacobian` instead, as lmder does.
+    p0 = 'self_start' starts from `ll4_self_start` estimates. bounds = (lower, upper) keeps the parameters in a box
+    by projecting every step onto it, bounds = 'physical' uses `ll4_bounds`.
+    Returns a dict with 'params' (n_curves x 4, ordered b, c, d, e), 'converged', 'status', 'n_iter', 'residuals' (sum of squares),
+    'r_squared' and 'N' arrays. 'status' is one of 'converged', 'max_iter', 'stalled', 'too_few_points' or 'not_finite'.
+    """
+    x, y = np.atleast_2d(np.asarray(x, dtype = float)), np.atleast_2d(np.asarray(y, dtype = float))
+    mask = np.ones(x.shape, dtype = bool) if mask is None else np.asarray(mask, dtype = bool)
+    n = x.shape[0]
+    if isinstance(p0, str) and p0 == 'self_start':
+        p0 = ll4_self_start(x, y, mask)
+    p = np.ones((n, 4)) if p0 is None else np.array(p0, dtype = float).reshape(n, 4)
+    if isinstance(bounds, str) and bounds == 'physical':
+        bounds = ll4_bounds(x, y, mask)
+    if bounds is not None:
+        lower, upper = [np.broadcast_to(np.asarray(b, dtype = float), (n, 4)) for b in bounds]
+        p = np.clip(p, lower, upper)
+
+    def residuals(p, rows):
+        return np.where(mask[rows], y[rows] - _ll4(x[rows], p), 0.)
+
+    eps = np.finfo(float).eps
+    r = residuals(p, slice(None))
+    fnorm = np.sqrt(np.sum(r**2, axis = 1))
+    J = np.zeros(x.shape + (4, ))
+    scale, delta, par = np.ones((n, 4)), np.zeros(n), np.zeros(n)
+    n_iter, n_eval = np.zeros(n, dtype = int), np.ones(n, dtype = int)
+    new_jac, first = np.ones(n, dtype = bool), np.ones(n, dtype = bool)
+    converged, stalled = np.zeros(n, dtype = bool), np.zeros(n, dtype = bool)
+    active = np.isfinite(fnorm) & (mask.sum(axis = 1) >= 4)
+
+    with np.errstate(all = 'ignore'): # overflowing trial steps are rejected below
+        while True:
+            rows = np.flatnonzero(active)
+            if rows.size == 0:
+                break
+            # Jacobian and scaling after every accepted step, the first scaling also sets the initial trust region
+            stale = rows[new_jac[rows]]
+            if stale.size:
+                if jac == 'analytic':
+                    J[stale] = np.nan_to_num(ll4_jacobian(x[stale], *[p[stale][:, [i]] for i in range(4)])) * mask[stale, :, None]
+                else: # forward differences with the steps of MINPACK's fdjac2
+                    h = np.sqrt(eps)*np.abs(p[stale])
+                    h[h == 0] = np.sqrt(eps)
+                    for i in range(4):
+                        shifted = p[stale].copy()
+                        shifted[:, i] += h[:, i]
+                        J[stale, :, i] = np.nan_to_num((r[stale] - residuals(shifted, stale))/h[:, [i]])
+                colnorm = np.sqrt(np.sum(J[stale]**2, axis = 1))
+                init = first[stale]
+                scale[stale] = np.where(init[:, None], np.where(colnorm == 0, 1., colnorm), np.maximum(scale[stale], colnorm))
+                xnorm0 = np.linalg.norm(scale[stale]*p[stale], axis = 1)
+                delta[stale] = np.where(init, np.where(xnorm0 == 0, 100., 100.*xnorm0), delta[stale])
+                gnorm_zero = np.all(np.abs(np.einsum('nki,nk->ni', J[stale], r[stale])) == 0, axis = 1) | (fnorm[stale] == 0)
+                converged[stale[gnorm_zero]] = True
+                active[stale[gnorm_zero]] = False
+                new_jac[stale] = False
+                n_eval[stale] += 4
+                rows = rows[active[rows]]
+                if rows.size == 0:
+                    continue
+
+            z, par[rows] = _lm_step(J[rows]/scale[rows, None, :], r[rows], delta[rows], par[rows])
+            step = z/scale[rows]
+            p_new = p[rows] + step
+            if bounds is not None:
+                p_new = np.clip(p_new, lower[rows], upper[rows])
+                step = p_new - p[rows]
+            pnorm = np.linalg.norm(scale[rows]*step, axis = 1)
+            delta[rows] = np.where(first[rows], np.minimum(delta[rows], pnorm), delta[rows])
+            first[rows] = False
+            r_new = residuals(p_new, rows)
+            fnorm_new = np.sqrt(np.sum(r_new**2, axis = 1))
+            n_iter[rows] += 1
+            n_eval[rows] += 1
+
+            # ratio of the actual to the predicted reduction, trust region update as in lmder
+            f = fnorm[rows]
+            actred = np.where(np.isfinite(fnorm_new) & (0.1*fnorm_new < f), 1 - (fnorm_new/f)**2, -1.)
+            t1 = np.linalg.norm(np.einsum('nki,ni->nk', J[rows], step), axis = 1)/f
+            t2 = np.sqrt(par[rows])*pnorm/f
+            prered, dirder = t1**2 + t2**2/0.5, -(t1**2 + t2**2)
+            ratio = np.where(prered != 0, actred/prered, 0.)
+            shrink = np.where(actred >= 0, 0.5, 0.5*dirder/(dirder + 0.5*actred))
+            shrink = np.where(~(0.1*fnorm_new < f) | ~(shrink >= 0.1), 0.1, shrink)
+            low, high = ratio <= 0.25, (ratio > 0.25) & ((par[rows] == 0) | (ratio >= 0.75))
+            delta[rows] = np.where(low, shrink*np.minimum(delta[rows], pnorm/0.1), np.where(high, pnorm/0.5, delta[rows]))
+            par[rows] = np.where(low, par[rows]/shrink, np.where(high, 0.5*par[rows], par[rows]))
+
+            accept = ratio >= 1e-4
+            acc = rows[accept]
+            p[acc], r[acc], fnorm[acc] = p_new[accept], r_new[accept], fnorm_new[accept]
+            new_jac[acc] = True
+            xnorm = np.linalg.norm(scale[rows]*p[rows], axis = 1)
+
+            # convergence tests of lmder: relative reduction of the sum of squares, or relative size of the trust region
+            done = ((np.abs(actred) <= ftol) & (prered <= ftol) & (0.5*ratio <= 1)) | (delta[rows] <= xtol*xnorm)
+            stuck = ((np.abs(actred) <= eps) & (prered <= eps) & (0.5*ratio <= 1)) | (delta[rows] <= eps*xnorm) | ~np.isfinite(delta[rows])
+            converged[rows[done]] = True
+            stalled[rows[~done & stuck]] = True
+            active[rows[done | stuck | (n_eval[rows] >= max_iter)]] = False
+
+    cost = fnorm**2
+    N = mask.sum(axis = 1)
+    with np.errstate(all = 'ignore'):
+        pred = np.where(mask, _ll4(x, p), 0.)
+        ym, pm = [np.sum(a, axis = 1, keepdims = True)/N[:, None] for a in (np.where(mask, y, 0.), pred)]
+        dy, dp = np.where(mask, y - ym, 0.), np.where(mask, pred - pm, 0.)
+        r_squared = np.sum(dy*dp, axis = 1)**2/(np.sum(dy**2, axis = 1)*np.sum(dp**2, axis = 1))
+    finite = np.all(np.isfinite(p), axis = 1) & np.isfinite(cost)
+    converged &= finite
+    status = np.select([converged, N < 4, ~finite, stalled], ['converged', 'too_few_points', 'not_finite', 'stalled'], 'max_iter')
+    return {'params': p, 'converged': converged, 'status': status, 'n_iter': n_iter, 'residuals': cost,
+            'r_squared': r_squared, 'N': N}
+
+# Cell
+def ll4_covariance(x, y, mask, params):
+    """Covariance matrices (n_curves x 4 x 4) of LL.4 parameters fitted to stacked curves, estimated as in `scipy.optimize.curve_fit`:
+    the inverse of J'J at the solution, computed from the singular values of J, scaled by the residual variance.
+    Ill-conditioned fits keep their (large) variances, curves with fewer than 5 points or a singular Jacobian
+    (a singular value below the threshold `curve_fit` uses, eps*max(J.shape)*largest) get NaN."""
+    x, y = np.atleast_2d(np.asarray(x, dtype = float)), np.atleast_2d(np.asarray(y, dtype = float))
+    mask = np.ones(x.shape, dtype = bool) if mask is None else np.asarray(mask, dtype = bool)
+    J = np.nan_to_num(ll4_jacobian(x, *[params[:, [i]] for i in range(4)])) * mask[..., None]
+    dof = mask.sum(axis = 1) - 4
+    with np.errstate(all = 'ignore'):
+        s2 = np.sum(np.where(mask, y - _ll4(x, params), 0.)**2, axis = 1)/dof
+    cov = np.full((len(J), 4, 4), np.nan)
+    ok = (dof > 0) & np.all(np.isfinite(params), axis = 1)
+    if ok.any():
+        _, s, Vt = np.linalg.svd(J[ok], full_matrices = False)
+        singular = s[:, -1] <= np.finfo(float).eps*max(J.shape[1:])*s[:, 0]
+        with np.errstate(all = 'ignore'):
+            cov[ok] = np.einsum('nki,nk,nkj->nij', Vt, 1/s**2, Vt)*s2[ok, None, None]
+        cov[np.flatnonzero(ok)[singular]] = np.nan
+    return cov
+
+# Cell
+def fit_ll4_table(df_mean, p0 = None, bounds = None, max_iter = 1000, ci = None):
+    """Fits LL.4 curves for all compounds in one batch. The input DataFrame should contain columns 'Compound_id', 'Dose', 'Response',
+    usually the per-dose mean values computed in `run_dr`. p0 and bounds are passed to `fit_ll4_batch`.
+    Returns the fit table with columns 'Compound_id', 'hill slope', 'min response', 'max response', 'EC50', 'residuals', 'r_squared', 'N'
+    for the converged fits, and a status table with 'Compound_id', 'converged', 'status' and 'n_iter' for every compound.
+    With ci set to a confidence level (e.g. 0.95) the fit table also gets covariance-based confidence intervals
+    'hill slope low', 'hill slope high', 'EC50 low', 'EC50 high'. The EC50 interval is computed on log scale so it stays positive.
+    """
+    names, X, Y, mask = stack_curves(df_mean)
+    fit = fit_ll4_batch(X, Y, mask, p0 = p0, bounds = bounds, max_iter = max_iter)
+    ok = fit['converged']
+    fitData = pd.DataFrame(fit['params'][ok], columns = ['hill slope', 'min response', 'max response', 'EC50'])
+    fitData.insert(0, 'Compound_id', names[ok])
+    fitData['residuals'] = fit['residuals'][ok]
+    fitData['r_squared'] = fit['r_squared'][ok]
+    fitData['N'] = fit['N'][ok].astype(int)
+    if ci:
+        from scipy import stats # scipy.stats takes longer to import than the rest of the package
+        cov = ll4_covariance(X[ok], Y[ok], mask[ok], fit['params'][ok])
+        se = np.sqrt(np.diagonal(cov, axis1 = 1, axis2 = 2))
+        t = stats.t.ppf(0.5 + ci/2, np.maximum(fitData.N.values - 4, 1))
+        b, e = fitData['hill slope'].values, fitData['EC50'].values
+        fitData['hill slope low'], fitData['hill slope high'] = b - t*se[:, 0], b + t*se[:, 0]
+        fitData['EC50 low'], fitData['EC50 high'] = e*np.exp(-t*se[:, 3]/e), e*np.exp(t*se[:, 3]/e)
+    status = pd.DataFrame({'Compound_id': names, 'converged': ok, 'status': fit['status'], 'n_iter': fit['n_iter']})
+    return fitData, status
+
+# Cell
+def bootstrap_dr(df, fitData, n_boot = 200, ci = 0.95, seed = 0, p0 = 'self_start', bounds = None, max_iter = 1000, max_curves = 200000):
+    """Bootstrap confidence intervals for EC50 and hill slope. The replicate wells of every compound and dose in df
+    (columns 'Compound_id', 'Dose', 'Response') are resampled with replacement n_boot times, every resample is averaged per dose
+    and all resampled curves are fitted together as stacked arrays (at most max_curves at a time). Every resample starts from its own
+    `ll4_self_start` estimates, not from the fitted parameters in fitData, so the intervals do not lean towards the point estimate;
+    p0 and bounds are passed to `fit_ll4_batch`. Resamples that do not converge within max_iter function evaluations are left out of the intervals.
+    The random generator is seeded, so the same seed gives the same intervals.
+    Returns a table with 'Compound_id', 'hill slope boot low', 'hill slope boot high', 'EC50 boot low', 'EC50 boot high',
+    'n_boot' (number of converged resamples) and the bootstrap parameters array of shape (n_boot, n_compounds, 4).
+    """
+    df = df[df.Compound_id.isin(fitData.Compound_id)].sort_values(['Compound_id', 'Dose'], kind = 'mergesort')
+    codes = df.groupby(['Compound_id', 'Dose'], sort = True).ngroup().values # contiguous, as df is sorted
+    counts = np.bincount(codes)
+    starts = np.cumsum(counts) - counts
+    y = df.Response.values.astype(float)
+
+    # resample the replicates of every (compound, dose) group and average them, for all resamples at once
+    rng = np.random.default_rng(seed)
+    idx = starts[codes] + (rng.random((n_boot, len(y)))*counts[codes]).astype(int)
+    means = np.add.reduceat(y[idx], starts, axis = 1)/counts
+
+    groups = df.drop_duplicates(['Compound_id', 'Dose'])[['Compound_id', 'Dose']]
+    names, X, _, mask = stack_curves(groups.assign(Response = 0.))
+    order = pd.factorize(groups.Compound_id, sort = True)[0]
+    pos = np.arange(len(order)) - np.repeat(np.cumsum(np.bincount(order)) - np.bincount(order), np.bincount(order))
+
+    params = np.full((n_boot, len(names), 4), np.nan)
+    chunk = max(1, max_curves//max(1, len(names)))
+    for i in range(0, n_boot, chunk):
+        B = min(chunk, n_boot - i)
+        Y = np.zeros((B, ) + X.shape)
+        Y[:, order, pos] = means[i:i + B]
+        fit = fit_ll4_batch(np.tile(X, (B, 1)), Y.reshape(-1, X.shape[1]), np.tile(mask, (B, 1)),
+                            p0 = p0, bounds = bounds, max_iter = max_iter)
+        p = fit['params'].reshape(B, len(names), 4)
+        p[~fit['converged'].reshape(B, len(names))] = np.nan
+        params[i:i + B] = p
+
+    q = [50 - 50*ci, 50 + 50*ci]
+    with np.errstate(all = 'ignore'):
+        b_ci, e_ci = [np.nanpercentile(params[..., j], q, axis = 0) if n_boot else np.full((2, len(names)), np.nan) for j in (0, 3)]
+    table = pd.DataFrame({'Compound_id': names, 'hill slope boot low': b_ci[0], 'hill slope boot high': b_ci[1],
+                          'EC50 boot low': e_ci[0], 'EC50 boot high': e_ci[1],
+                          'n_boot': np.sum(np.isfinite(params[..., 0]), axis = 0)})
+    return table, params
+
+# Cell
+@instrument(catch = False)
+def fit_dr(df, p0 = None, bounds = None, uncertainty = None, ci = 0.95, n_boot = 200, seed = 0, n_points = 256):
+    """Compute-only counterpart of `run_dr`: fits LL.4 curves for all compounds without plotting anything.
+    The input DataFrame should contain columns 'Compound_id', 'Dose', 'Response'. Zero values are dropped as in `run_dr`.
+    Returns a dict with
+     - 'fit': the fit table returned by `run_dr`
+     - 'failed': list of compounds whose fit did not converge
+     - 'status': convergence status and iteration count of every fit
+     - 'data': per-dose mean values with 'logDose' and the response 'std'
+     - 'curves': dict of Compound_id -> (dose, response) arrays of the fitted curve, sampled at n_points doses
+    p0 and bounds are passed to `fit_ll4_batch`, by default fits start from all ones and are unbounded as with `curve_fit`,
+    so `run_dr` keeps its results. p0 = 'self_start' with bounds = 'physical' (`ll4_self_start` estimates within `ll4_bounds`)
+    is recommended for new analyses: on noisy curves it fails far less often and converges in fewer iterations.
+    Either one alone does not help, unbounded self-starting fits fail about as often and bounded fits from all ones need more iterations.
+    uncertainty = 'covariance' adds covariance-based ci-level confidence intervals of hill slope and EC50 to the fit table,
+    uncertainty = 'bootstrap' also adds the `bootstrap_dr` intervals from n_boot resamples of the replicate wells
+    and stores the resampled parameters under 'bootstrap'.
+    The result can be passed to `plot_dr` to draw plots for any subset of compounds.
+    When the cache is enabled (`simplydrug.memo.enable_cache`) results are reused for the same data and parameters.
+    """
+    from .memo import memoized
+    df = df[['Compound_id', 'Dose', 'Response']]
+    params = dict(model = 'LL.4', method = 'levenberg-marquardt', p0 = p0, bounds = bounds, uncertainty = uncertainty,
+                  ci = ci, n_boot = n_boot, seed = seed, n_points = n_points)
+    return memoized('fit_dr', (df, params), lambda: _fit_dr(df, p0, bounds, uncertainty, ci, n_boot, seed, n_points))
+
+def _fit_dr(df, p0, bounds, uncertainty, ci, n_boot, seed, n_points):
+    df = df.copy()
+    df = df[(df != 0).all(1)]  # drop zero values
+    df['logDose'] = -np.log10(1e-6*df.Dose.astype(float)) # calculate logDose
+    df_mean = df.groupby(['Compound_id','Dose'], as_index = False).mean() # calculate response mean values
+    df_mean['std'] = list(df.groupby(['Compound_id','Dose']).std().Response.values) # calculate response std
+
+    fitData, status = fit_ll4_table(df_mean, p0 = p0, bounds = bounds, ci = ci if uncertainty else None)
+    boot = None
+    if uncertainty == 'bootstrap':
+        boot_table, boot = bootstrap_dr(df, fitData, n_boot = n_boot, ci = ci, seed = seed, bounds = bounds)
+        fitData = pd.merge(fitData, boot_table, how = 'left', on = 'Compound_id')
+    dose_range = df.groupby('Compound_id').Dose.agg(['min', 'max']).loc[fitData.Compound_id]
+    refDose = np.linspace(dose_range['min'].values*0.55, dose_range['max'].values*1.6, n_points, axis = 1)
+    fitted = _ll4(refDose, fitData[['hill slope', 'min response', 'max response', 'EC50']].values)
+    curves = dict(zip(fitData.Compound_id, zip(refDose, fitted)))
+    failed = list(status.Compound_id[~status.converged])
+    result = {'fit': fitData, 'failed': failed, 'status': status, 'data': df_mean, 'curves': curves}
+    if boot is not None:
+        result['bootstrap'] = boot
+    return result
+
+# Cell
+def _log_failed_fits(result):
+    """Logs every compound of a `fit_dr` result whose fit did not converge, with the reason."""
+    import logging
+    status = result['status']
+    for _, row in status[~status.converged].iterrows():
+        logging.info(f'Fitting curve failed: {row.Compound_id} ({row.status} after {row.n_iter} iterations)')
+
+# Cell
+def fit_polynomial_batch(x, y, mask = None, degree = 2):
+    """Least-squares polynomial fits of stacked curves (one curve per row, valid points first as given by `stack_curves`).
+    Curves are grouped by their number of points and every group is solved at once from its stacked Vandermonde matrices.
+    Returns coefficients (n_curves x degree+1, highest power first as np.polyfit), R2 and RMSE of every curve.
+    Curves with no more points than degree are not fitted (NaN)."""
+    x, y = np.atleast_2d(np.asarray(x, dtype = float)), np.atleast_2d(np.asarray(y, dtype = float))
+    mask = np.ones(x.shape, dtype = bool) if mask is None else np.asarray(mask, dtype = bool)
+    counts = mask.sum(axis = 1)
+    coef = np.full((len(x), degree + 1), np.nan)
+    r2, rmse = np.full(len(x), np.nan), np.full(len(x), np.nan)
+    for n in np.unique(counts[counts > degree]):
+        rows = np.flatnonzero(counts == n)
+        X, Y = x[rows, :n], y[rows, :n]
+        V = X[:, :, None]**np.arange(degree, -1, -1) # (curves, n, degree+1) Vandermonde matrices
+        c = (np.linalg.pinv(V) @ Y[:, :, None])[:, :, 0]
+        resid = Y - (V @ c[:, :, None])[:, :, 0]
+        ss_res, ss_tot = (resid**2).sum(axis = 1), ((Y - Y.mean(axis = 1, keepdims = True))**2).sum(axis = 1)
+        coef[rows], rmse[rows] = c, np.sqrt(ss_res/n)
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            r2[rows] = np.where(ss_tot > 0, 1 - ss_res/ss_tot, np.nan)
+    return coef, r2, rmse
+
+@instrument(catch = False)
+def fit_polynomials(df, degree = 2, key = 'Compound_id', x = 'logDose', y = 'Response'):
+    """Polynomial fits of y against x for every compound of a long DataFrame, all compounds at once (see `fit_polynomial_batch`).
+    Returns a table with the compound, the number of points 'N', coefficients 'p0' (highest power) to 'p<degree>', 'r2' and 'rmse'."""
+    names, X, Y, mask = stack_curves(df, key, x, y)
+    coef, r2, rmse = fit_polynomial_batch(X, Y, mask, degree)
+    table = pd.DataFrame(coef, columns = [f'p{i}' for i in range(degree + 1)])
+    table.insert(0, key, names)
+    table.insert(1, 'N', mask.sum(axis = 1))
+    table['r2'], table['rmse'] = r2, rmse
+    return table
@@ -0,0 +1,211 @@
+__all__ = ['TEXT_COLUMNS', 'file_hash', 'plate_format', 'read_plate', 'read_plates', 'clear_plate_cache']
+
+# Cell
+import os
+import re
+import pickle
+import shutil
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+from .kinetics import melt_wells, _time_axis
+from .parallel import _map_shards, _run_logged
+from .instrument import instrument
+
+# Cell
+TEXT_COLUMNS = ('Well', 'Plate', 'Status', 'Compound_id', 'SMILES', 'Result', 'Treatment', 'Reason')
+_CACHE_FOLDER = '.simplydrug'
+_CACHE_VERSION = 1
+_HASHES = {}
+
+def file_hash(path, chunk_size = 1 << 20):
+    """sha1 of the content of a file. Hashes are remembered in-process by path, size and modification time,
+    so a file is read for hashing only once per session."""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if key not in _HASHES:
+        h = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                h.update(chunk)
+        _HASHES[key] = h.hexdigest()
+    return _HASHES[key]
+
+def _is_excel(path):
+    return str(path).lower().endswith(('.xlsx', '.xlsm', '.xls'))
+
+def _dtypes(columns, dtype, value_dtype):
+    """Explicit dtype of every column: the dtype overrides, str for TEXT_COLUMNS and value_dtype for the measurements."""
+    dtype = dtype or {}
+    return {c: dtype.get(c, str if c in TEXT_COLUMNS else value_dtype) for c in columns}
+
+def _parse(path, sheet, dtype, value_dtype):
+    """Reads a plate reader export with explicit column types. csv files are converted by the parser directly,
+    excel cells are typed already and the columns are cast after parsing."""
+    try:
+        if not _is_excel(path):
+            dtypes = _dtypes(pd.read_csv(path, nrows = 0).columns, dtype, value_dtype)
+            return pd.read_csv(path, dtype = dtypes)
+        df = pd.read_excel(path, sheet_name = sheet)
+        for c, t in _dtypes(df.columns, dtype, value_dtype).items():
+            col = df[c]
+            df[c] = col.where(col.isna(), col.astype(str)).astype(object) if t is str else col.astype(t)
+        return df
+    except ValueError as e: # name the text columns that need a dtype
+        raw = pd.read_excel(path, sheet_name = sheet, dtype = object) if _is_excel(path) else pd.read_csv(path, dtype = str)
+        text = [c for c in raw.columns if c not in TEXT_COLUMNS and c not in (dtype or {})
+                and pd.to_numeric(raw[c], errors = 'coerce').notna().sum() < raw[c].notna().sum()]
+        hint = f', pass their dtype, e.g. dtype = {{{text[0]!r}: str}}' if text else ''
+        raise ValueError(f'read_plate: {os.path.basename(path)}: {e}; text columns: {text}{hint}') from e
+
+# Cell
+def _cache_entry(path, sheet, dtype, value_dtype):
+    """Cache folder of a source file and read options: <folder of the file>/.simplydrug/<file name>.<key>,
+    the key hashes the file content and the options."""
+    options = (file_hash(path), sheet, sorted((repr(c), repr(t)) for c, t in (dtype or {}).items()), repr(value_dtype), _CACHE_VERSION)
+    key = hashlib.sha1(repr(options).encode()).hexdigest()[:16]
+    return os.path.join(os.path.dirname(os.path.abspath(path)), _CACHE_FOLDER, f'{os.path.basename(path)}.{key}')
+
+def _write_cache(df, entry):
+    """Stores df column by column: numeric columns of the same dtype in one (columns x rows) array per dtype,
+    text columns as integer codes of their unique values. Written to a temporary folder and renamed, so concurrent readers
+    only see complete entries; older entries of the same source file are removed."""
+    tmp = entry + f'.{os.getpid()}.tmp'
+    try:
+        os.makedirs(tmp, exist_ok = True)
+        layout, blocks, codes, uniques = [], {}, [], []
+        for i in range(df.shape[1]):
+            col = df.iloc[:, i]
+            if col.dtype == object:
+                code, unique = pd.factorize(col)
+                layout.append((df.columns[i], 'text', len(codes)))
+                codes.append(code.astype(np.int32))
+                uniques.append(np.append(np.asarray(unique, dtype = object), np.nan)) # code -1 (missing) picks the nan
+            elif isinstance(col.dtype, np.dtype) and col.dtype.kind in 'biufcmM':
+                block = blocks.setdefault(col.dtype.str, [])
+                layout.append((df.columns[i], col.dtype.str, len(block)))
+                block.append(col.values)
+            else: # categorical and other extension dtypes
+                layout.append((df.columns[i], 'pickle', col))
+        names = {}
+        for k, (key, arrays) in enumerate(blocks.items()):
+            names[key] = f'block_{k}.npy'
+            np.save(os.path.join(tmp, names[key]), np.stack(arrays))
+        if codes:
+            np.save(os.path.join(tmp, 'text.npy'), np.stack(codes))
+        with open(os.path.join(tmp, 'index.pkl'), 'wb') as f:
+            pickle.dump({'columns': layout, 'blocks': names, 'uniques': uniques, 'rows': len(df)}, f, protocol = pickle.HIGHEST_PROTOCOL)
+        root, name = os.path.split(entry)
+        for old in os.listdir(root):
+            if old.rsplit('.', 1)[0] == name.rsplit('.', 1)[0] and old != name and not old.endswith('.tmp'):
+                shutil.rmtree(os.path.join(root, old), ignore_errors = True)
+        os.replace(tmp, entry)
+    except OSError as e: # read-only folder, or another process stored the same entry first
+        logging.debug(f'read_plate: could not write plate cache: {e}')
+        shutil.rmtree(tmp, ignore_errors = True)
+
+def _load_cache(entry):
+    """DataFrame of a cache entry, None if there is no complete entry."""
+    try:
+        with open(os.path.join(entry, 'index.pkl'), 'rb') as f:
+            index = pickle.load(f)
+        blocks = {key: np.load(os.path.join(entry, name)) for key, name in index['blocks'].items()}
+        codes = np.load(os.path.join(entry, 'text.npy')) if index['uniques'] else None
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    columns = {}
+    for i, (name, kind, j) in enumerate(index['columns']):
+        if kind == 'text':
+            columns[i] = index['uniques'][j][codes[j]]
+        elif kind == 'pickle':
+            columns[i] = j.values
+        else:
+            columns[i] = blocks[kind][j]
+    df = pd.DataFrame(columns, index = pd.RangeIndex(index['rows']))
+    df.columns = [name for name, _, _ in index['columns']]
+    return df
+
+# Cell
+def _is_time(label):
+    return re.fullmatch(r'\s*[-+]?\d*\.?\d+\s*[a-zA-Z]*\s*', str(label)) is not None
+
+def plate_format(df):
+    """Format of a plate reader table: 'wide' for a 'Time' column and one column per well (timepoints x wells, as the growth assay files),
+    'wells' for a 'Well' column and one column per timepoint such as '0s', '120s' (wells x timepoints, as the kinetic assay files),
+    'long' otherwise (one row per well, or per well and timepoint, with named measurement columns)."""
+    values = [c for c in df.columns if c not in TEXT_COLUMNS]
+    if 'Time' in df.columns and 'Well' not in df.columns:
+        return 'wide'
+    if 'Well' in df.columns and 'Time' not in df.columns and values and all(_is_time(c) for c in values):
+        return 'wells'
+    return 'long'
+
+def _to_long(df, value):
+    """Long table ('Well', 'Time', value) of a wide or wells table, other text columns ('Plate', ...) are kept."""
+    fmt = plate_format(df)
+    if fmt == 'long':
+        return df
+    text = [c for c in df.columns if c in TEXT_COLUMNS and c != 'Well']
+    if fmt == 'wide':
+        wells = [c for c in df.columns if c not in TEXT_COLUMNS and c != 'Time']
+        long = melt_wells(np.asarray(wells, dtype = object), df.Time.values, **{value: df[wells].values.T})
+        for c in text:
+            long[c] = np.tile(df[c].values, len(wells))
+        return long
+    times = [c for c in df.columns if c not in TEXT_COLUMNS]
+    long = melt_wells(df.Well.values, _time_axis(times), **{value: df[times].values})
+    for c in text:
+        long[c] = np.repeat(df[c].values, len(times))
+    return long
+
+# Cell
+@instrument(catch = False)
+def read_plate(path, sheet = 0, dtype = None, value_dtype = 'float64', long = False, value = 'OD', cache = True):
+    """Reads a plate reader export (csv or excel, first sheet by default) with explicit column types instead of type inference:
+    str for TEXT_COLUMNS ('Well', 'Plate', ...), value_dtype for all other columns, and dtype (a dict) for any column.
+    With long = True wide and wells tables (see `plate_format`) are melted to one row per well and timepoint,
+    columns 'Well', 'Time' and value, as `melt_wells` does.
+    The parsed table is cached next to the file (in a .simplydrug folder), keyed by the file content and the read options,
+    so later reads of the same plate load the cached columns instead of parsing the file again. cache = False always parses the file."""
+    entry = _cache_entry(path, sheet, dtype, value_dtype) if cache else None
+    df = _load_cache(entry) if cache else None
+    if df is None:
+        df = _parse(path, sheet, dtype, value_dtype)
+        if cache:
+            _write_cache(df, entry)
+    return _to_long(df, value) if long else df
+
+def _read_task(args):
+    path, kwargs = args
+    return _run_logged(lambda: read_plate(path, **kwargs))
+
+@instrument(catch = False)
+def read_plates(paths, n_jobs = None, **kwargs):
+    """Reads several plate reader files with `read_plate` (keyword arguments are passed on), in the order of paths.
+    Cached plates are loaded in this process, the files that need parsing are read in a pool of n_jobs processes (all cores by default)."""
+    paths = list(paths)
+    frames = [None]*len(paths)
+    if kwargs.get('cache', True):
+        for i, path in enumerate(paths):
+            frames[i] = _load_cache(_cache_entry(path, kwargs.get('sheet', 0), kwargs.get('dtype'), kwargs.get('value_dtype', 'float64')))
+            if frames[i] is not None and kwargs.get('long'):
+                frames[i] = _to_long(frames[i], kwargs.get('value', 'OD'))
+    missing = [i for i, df in enumerate(frames) if df is None]
+    n_jobs = n_jobs or os.cpu_count() or 1
+    for i, df in zip(missing, _map_shards(_read_task, [(paths[i], kwargs) for i in missing], min(n_jobs, len(missing)) or 1)):
+        frames[i] = df
+    return frames
+
+def clear_plate_cache(path):
+    """Removes the cached tables of a plate reader file, or of all files in a folder. Returns the number of entries removed."""
+    folder, name = (path, None) if os.path.isdir(path) else os.path.split(os.path.abspath(path))
+    root = os.path.join(folder, _CACHE_FOLDER)
+    if not os.path.isdir(root):
+        return 0
+    removed = 0
+    for entry in os.listdir(root):
+        if name is None or entry.rsplit('.', 1)[0] == name:
+            shutil.rmtree(os.path.join(root, entry), ignore_errors = True)
+            removed += 1
+    return removed
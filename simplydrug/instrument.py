@@ -0,0 +1,168 @@
+__all__ = ['instrument', 'enable_instrumentation', 'disable_instrumentation', 'instrumentation_enabled', 'set_strict',
+           'instrumented', 'MemorySink', 'JsonLinesSink']
+
+# Cell
+import os
+import json
+import time
+import logging
+import functools
+import threading
+import tracemalloc
+
+# Cell
+_STATE = {'enabled': False, 'memory': False, 'strict': os.environ.get('SIMPLYDRUG_STRICT', '') not in ('', '0'), 'sinks': [], 'tracing': False}
+_LOCAL = threading.local()
+
+def enable_instrumentation(*sinks, memory = False):
+    """Starts recording every call of the instrumented public functions: wall time, input and output row counts,
+    success or failure with the exception, and with memory = True the peak traced memory of the call (tracemalloc, which slows
+    the calls down). Every record is sent to the sinks, objects with an `emit(record)` method such as MemorySink or JsonLinesSink;
+    a MemorySink is used if none is given. Returns the list of active sinks.
+    Worker processes forked while instrumentation is on record too, use a JsonLinesSink to collect their records."""
+    _STATE['sinks'].extend(sinks or [MemorySink()])
+    _STATE.update(enabled = True, memory = memory)
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _STATE['tracing'] = True # started here, so stopped by disable_instrumentation
+    return list(_STATE['sinks'])
+
+def disable_instrumentation():
+    """Stops recording and removes the sinks. tracemalloc is stopped only if `enable_instrumentation` started it,
+    tracing started by the caller keeps running."""
+    if _STATE['tracing'] and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _STATE.update(enabled = False, memory = False, sinks = [], tracing = False)
+
+def instrumentation_enabled():
+    return _STATE['enabled']
+
+def set_strict(strict = True):
+    """In strict mode errors of the public functions are raised instead of being logged and turned into a None result.
+    Also turned on by setting the SIMPLYDRUG_STRICT environment variable to 1. Returns the previous setting."""
+    previous, _STATE['strict'] = _STATE['strict'], bool(strict)
+    return previous
+
+class instrumented:
+    """Context manager recording the calls of a block, e.g.
+    `with instrumented() as (sink, ): sd.run_dr(...)` then `sink.summary()`. strict = True also re-raises errors in the block."""
+    def __init__(self, *sinks, memory = False, strict = None):
+        self.sinks, self.memory, self.strict = sinks or (MemorySink(), ), memory, strict
+
+    def __enter__(self):
+        self._strict = set_strict(self.strict) if self.strict is not None else None
+        return enable_instrumentation(*self.sinks, memory = self.memory)
+
+    def __exit__(self, *exc):
+        disable_instrumentation()
+        if self._strict is not None:
+            set_strict(self._strict)
+        return False
+
+# Cell
+class MemorySink:
+    """Keeps the call records in memory; `to_frame` lists them and `summary` aggregates them per function."""
+    def __init__(self):
+        self.records = []
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        with self._lock:
+            self.records.append(record)
+
+    def to_frame(self):
+        import pandas as pd
+        return pd.DataFrame(self.records)
+
+    def summary(self):
+        """Calls, failures, total, mean and max wall time, input rows and max peak memory of every function."""
+        calls = self.to_frame()
+        if calls.empty:
+            return calls
+        calls['failed'] = ~calls.ok
+        calls['rows'] = calls.rows_in.map(lambda rows: sum(rows.values()))
+        return calls.groupby('function').agg(calls = ('time', 'size'), failures = ('failed', 'sum'), total_time = ('time', 'sum'),
+                                             mean_time = ('time', 'mean'), max_time = ('time', 'max'), rows = ('rows', 'sum'),
+                                             peak_mb = ('peak_mb', 'max')).sort_values('total_time', ascending = False)
+
+class JsonLinesSink:
+    """Appends every call record as one line of json to a file. Lines are written with a single write call,
+    so several processes can share the file."""
+    def __init__(self, path):
+        self.path = path
+
+    def emit(self, record):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record, default = str) + '\n')
+
+# Cell
+def _rows(value):
+    """Number of rows of a DataFrame, array or any object with a shape (PlateStack, KineticPlate), None otherwise."""
+    shape = getattr(value, 'shape', None)
+    return int(shape[0]) if isinstance(shape, tuple) and shape else None
+
+def _record(func, names, args, kwargs, catch):
+    rows_in = {}
+    for name, value in list(zip(names, args)) + list(kwargs.items()):
+        n = _rows(value)
+        if n is not None:
+            rows_in[name] = n
+    record = {'function': f'{func.__module__}.{func.__qualname__}', 'start': time.time(), 'rows_in': rows_in, 'rows_out': None,
+              'time': None, 'peak_mb': None, 'ok': True, 'error': None, 'pid': os.getpid()}
+    tracing = _STATE['memory'] and tracemalloc.is_tracing()
+    if tracing:
+        if not hasattr(_LOCAL, 'peaks'):
+            _LOCAL.peaks = []
+        stack = _LOCAL.peaks
+        base, peak = tracemalloc.get_traced_memory()
+        if stack: # keep the peak of the enclosing call before resetting it
+            stack[-1] = max(stack[-1], peak)
+        if hasattr(tracemalloc, 'reset_peak'): # python 3.9+, otherwise peaks are since tracing started
+            tracemalloc.reset_peak()
+        stack.append(0)
+    start = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+        record['rows_out'] = _rows(result)
+        return result
+    except Exception as e:
+        record.update(ok = False, error = f'{type(e).__name__}: {e}')
+        if catch and not _STATE['strict']:
+            logging.error(f'{func.__name__} raised an error: {e}')
+            return None
+        raise
+    finally:
+        record['time'] = time.perf_counter() - start
+        if tracing:
+            peak = max(tracemalloc.get_traced_memory()[1], stack.pop()) # nested calls reset the peak, their maximum is kept on the stack
+            if stack:
+                stack[-1] = max(stack[-1], peak)
+            record['peak_mb'] = (peak - base)/2**20
+        for sink in _STATE['sinks']:
+            try:
+                sink.emit(record)
+            except Exception as e:
+                logging.debug(f'instrument: sink {sink} failed: {e}')
+
+def instrument(func = None, catch = True):
+    """Decorator of the public functions. When instrumentation is disabled (the default) it costs one dictionary lookup per call.
+    With catch = True errors are logged and None is returned, as `handle_exceptions` always did, unless strict mode is on
+    (see `set_strict`); with catch = False errors always propagate. When enabled, every call is recorded (see `enable_instrumentation`).
+    Use as @instrument or @instrument(catch = False)."""
+    if func is None:
+        return functools.partial(instrument, catch = catch)
+    code = getattr(func, '__code__', None)
+    names = code.co_varnames[:code.co_argcount] if code else ()
+
+    @functools.wraps(func) # keeps the name, so decorated functions can be sent to worker processes
+    def wrapper(*args, **kwargs):
+        if _STATE['enabled']:
+            return _record(func, names, args, kwargs, catch)
+        if not catch or _STATE['strict']:
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            logging.error(f'{func.__name__} raised an error: {e}')
+            return None
+    return wrapper
@@ -0,0 +1,129 @@
+__all__ = ['KineticPlate', 'KineticStore']
+
+# Cell
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from .kinetics import melt_wells
+
+# Cell
+class KineticPlate:
+    """Readings of one plate: a memory-mapped wells x timepoints array (reads) with the well names (wells) and the time axis (times)
+    shared by all wells. Slicing with `select` reads only the requested wells and timepoints from disk.
+    `get_growth_scores`, `curve_qc` and `plot_curve_raw` accept a KineticPlate in place of the DataFrame."""
+    def __init__(self, name, wells, times, reads):
+        self.name, self.wells, self.times, self.reads = name, np.asarray(wells, dtype = object), np.asarray(times), reads
+        self._rows = pd.Index(self.wells)
+
+    @property
+    def shape(self):
+        return self.reads.shape
+
+    def __repr__(self):
+        return f'KineticPlate({self.name!r}, wells = {len(self.wells)}, timepoints = {len(self.times)})'
+
+    def select(self, wells = None, time_window = None):
+        """Returns wells, times and the reads (an in-memory array) of a subset of wells and a (start, end) time window, both inclusive.
+        Rows are read in file order, so a block of wells or a time window touches only that part of the file."""
+        rows = np.arange(len(self.wells)) if wells is None else np.sort(self._rows.get_indexer(np.asarray(wells, dtype = object)))
+        if np.any(rows < 0):
+            raise KeyError(f'KineticPlate: unknown wells {list(np.asarray(wells)[self._rows.get_indexer(np.asarray(wells, dtype = object)) < 0][:5])}')
+        start, end = (0, len(self.times)) if time_window is None else \
+                     (np.searchsorted(self.times, time_window[0], 'left'), np.searchsorted(self.times, time_window[1], 'right'))
+        if len(rows) == len(self.wells):
+            reads = np.array(self.reads[:, start:end])
+        else:
+            reads = np.array(self.reads[rows, start:end])
+        return self.wells[rows], self.times[start:end], reads
+
+    def sorted(self, wells = None, time_window = None):
+        """Like `select`, with the wells sorted by name, the order of `groupby('Well')` used by the long DataFrames."""
+        wells, times, reads = self.select(wells, time_window)
+        order = np.argsort(wells.astype(str), kind = 'mergesort')
+        return wells[order], times, reads[order]
+
+    def to_frame(self, wells = None, time_window = None, column = 'OD'):
+        """Long DataFrame ('Well', 'Time', column) of a subset of the plate, wells sorted by name."""
+        wells, times, reads = self.sorted(wells, time_window)
+        return melt_wells(wells, times, **{column: reads})
+
+    def to_wide(self):
+        """The plate as a wide DataFrame, a 'Time' column and one column per well, like the plate reader csv files."""
+        wide = pd.DataFrame(np.asarray(self.reads).T, columns = self.wells)
+        wide.insert(0, 'Time', self.times)
+        return wide
+
+# Cell
+class KineticStore:
+    """Folder of memory-mapped kinetic readings, one wells x timepoints .npy file and one time axis file per plate,
+    with an index of the plates and their wells. Plates are added with `add_plate` (wide DataFrames, as read from the plate reader files)
+    or `add_array`, and opened with `plate` (or store[name]) as KineticPlate without loading them."""
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok = True)
+        self.index = {}
+        if os.path.exists(self._index_file):
+            with open(self._index_file, 'rb') as f:
+                self.index = pickle.load(f)
+
+    @property
+    def _index_file(self):
+        return os.path.join(self.path, 'index.pkl')
+
+    @property
+    def plates(self):
+        return list(self.index)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, name):
+        return self.plate(name)
+
+    def __repr__(self):
+        return f'KineticStore({self.path!r}, plates = {len(self.index)})'
+
+    def add_array(self, name, wells, times, reads, dtype = np.float64):
+        """Stores a wells x timepoints array of readings, timepoints sorted by time. Returns the stored KineticPlate.
+        The arrays are written to new files and the index is replaced in one rename, so a plate that is stored again
+        does not change KineticPlates already opened from it, they keep reading the previous readings."""
+        times = np.asarray(times)
+        order = np.argsort(times, kind = 'mergesort')
+        stems = [int(entry['stem'].split('_')[1]) for entry in self.index.values()]
+        stem = f'plate_{max(stems, default = -1) + 1:05d}'
+        tmp = os.path.join(self.path, stem + f'.{os.getpid()}.tmp')
+        out = np.lib.format.open_memmap(tmp, mode = 'w+', dtype = dtype, shape = np.shape(reads))
+        out[:] = np.asarray(reads)[:, order]
+        out.flush()
+        del out
+        os.replace(tmp, os.path.join(self.path, stem + '.npy'))
+        np.save(os.path.join(self.path, stem + '_time.npy'), times[order])
+        old = self.index.get(name)
+        self.index[name] = {'stem': stem, 'wells': list(wells)}
+        tmp = self._index_file + f'.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(self.index, f, protocol = pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._index_file)
+        if old is not None: # open memory maps keep the removed files readable
+            for suffix in ('.npy', '_time.npy'):
+                try:
+                    os.remove(os.path.join(self.path, old['stem'] + suffix))
+                except OSError: # still mapped on Windows
+                    pass
+        return self.plate(name)
+
+    def add_plate(self, name, df, time = 'Time', dtype = np.float64):
+        """Stores a wide DataFrame of readings: a time column and one column per well (other non-numeric columns, e.g. 'Plate', are dropped)."""
+        data = df.drop(columns = [time]).select_dtypes('number')
+        return self.add_array(name, data.columns, df[time].values, data.values.T, dtype)
+
+    def plate(self, name):
+        """Opens a plate of the store as a memory-mapped KineticPlate."""
+        entry = self.index[name]
+        reads = np.load(os.path.join(self.path, entry['stem'] + '.npy'), mmap_mode = 'r')
+        times = np.load(os.path.join(self.path, entry['stem'] + '_time.npy'))
+        return KineticPlate(name, entry['wells'], times, reads)
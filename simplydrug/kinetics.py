@@ -0,0 +1,198 @@
+__all__ = ['growth_rates', 'growth_scores', 'melt_wells', 'CURVE_QC_RULES', 'evaluate_curve_qc', 'pivot_wells', 'curve_qc',
+           'prefix_linear_fits', 'linear_fits', 'initial_rates']
+
+# Cell
+import re
+import warnings
+import numpy as np
+import pandas as pd
+from .instrument import instrument
+
+# Cell
+def growth_rates(od):
+    """Relative growth rate between consecutive reads, (OD[t] - OD[t-1])/OD[t-1], for a wells x timepoints matrix.
+    The first timepoint of every well gets rate 0."""
+    od = np.asarray(od, dtype = float)
+    past = np.concatenate([od[:, :1], od[:, :-1]], axis = 1)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        return (od - past)/past
+
+def growth_scores(od, grate = None):
+    """Growth score of every well of a wells x timepoints OD matrix, in one vectorized pass:
+    (max OD - first OD) + 0.25*max growth rate. NaN reads are ignored as in pandas."""
+    od = np.asarray(od, dtype = float)
+    grate = growth_rates(od) if grate is None else grate
+    with np.errstate(invalid = 'ignore'):
+        return (np.nanmax(od, axis = 1) - od[:, 0]) + np.nanmax(grate, axis = 1)*0.25
+
+# Cell
+def melt_wells(wells, times, index = None, **matrices):
+    """Melts wells x timepoints matrices to the long format used across simplydrug: one row per well and timepoint,
+    with columns 'Well', 'Time' and one column per matrix. Per-well vectors (1D arrays) are repeated over the timepoints.
+    Rows are ordered by well, then by time; index is repeated for every well if given."""
+    wells, times = np.asarray(wells), np.asarray(times)
+    n_wells, n_times = len(wells), len(times)
+    columns = {'Well': np.repeat(wells, n_times), 'Time': np.tile(times, n_wells)}
+    for name, values in matrices.items():
+        values = np.asarray(values)
+        columns[name] = np.repeat(values, n_times) if values.ndim == 1 else values.reshape(-1)
+    return pd.DataFrame(columns, index = None if index is None else np.tile(np.asarray(index), n_wells))
+
+# Cell
+CURVE_QC_RULES = [
+    {'name': 'sudden_drop', 'conditions': [('grate', 'min', '<', -0.2), ('grate', 'argmin', '>', 4)]},
+    {'name': 'high_start', 'conditions': [('OD', 'first', '>', 0.2)]},
+]
+
+_QC_STATS = {
+    'min': lambda m: np.nanmin(m, axis = 1),
+    'max': lambda m: np.nanmax(m, axis = 1),
+    'mean': lambda m: np.nanmean(m, axis = 1),
+    'std': lambda m: np.nanstd(m, axis = 1, ddof = 1),
+    'range': lambda m: np.nanmax(m, axis = 1) - np.nanmin(m, axis = 1),
+    'first': lambda m: m[:, 0],
+    'last': lambda m: m[np.arange(len(m)), np.maximum(np.sum(~np.isnan(m), axis = 1) - 1, 0)],
+    'argmin': lambda m: np.argmin(np.where(np.isnan(m), np.inf, m), axis = 1),
+    'argmax': lambda m: np.argmax(np.where(np.isnan(m), -np.inf, m), axis = 1),
+}
+
+_QC_OPS = {'<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal, '==': np.equal, '!=': np.not_equal}
+
+def evaluate_curve_qc(matrices, rules = None):
+    """Evaluates curve QC rules on all wells at once. matrices maps column names to wells x timepoints arrays
+    (timepoints in increasing order, NaN padded). Every rule is a dict with a 'name' and a list of 'conditions',
+    each condition is a (column, statistic, operator, value) tuple, e.g. ('grate', 'min', '<', -0.2).
+    Statistics are 'min', 'max', 'mean', 'std', 'range', 'first', 'last', 'argmin', 'argmax' (argmin/argmax give the timepoint position),
+    operators are '<', '<=', '>', '>=', '==', '!='. A well is rejected by a rule when all its conditions hold.
+    Returns a boolean array of rejected wells and an array with the name of the first rule that rejected each well ('' if none).
+    Defaults to CURVE_QC_RULES, the rules of `filter_curves`."""
+    rules = CURVE_QC_RULES if rules is None else rules
+    n_wells = len(next(iter(matrices.values())))
+    stats = {}
+    reason = np.full(n_wells, '', dtype = object)
+    with np.errstate(invalid = 'ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning) # all-NaN wells
+        for rule in rules:
+            hit = np.ones(n_wells, dtype = bool)
+            for column, stat, op, value in rule['conditions']:
+                if (column, stat) not in stats:
+                    stats[column, stat] = _QC_STATS[stat](np.asarray(matrices[column], dtype = float))
+                hit &= _QC_OPS[op](stats[column, stat], value)
+            reason[hit & (reason == '')] = rule['name']
+    return reason != '', reason
+
+# Cell
+def pivot_wells(df, columns, well = 'Well', time = 'Time'):
+    """Pivots long time-series data into wells x timepoints matrices, one per column in columns.
+    Returns the well names (sorted), and a dict of matrices with the reads of every well ordered by time and NaN padded."""
+    df = df.sort_values([well, time], kind = 'mergesort')
+    codes, wells = pd.factorize(df[well], sort = True)
+    pos = df.groupby(well, sort = False).cumcount().values
+    shape = (len(wells), pos.max() + 1 if len(pos) else 0)
+    matrices = {}
+    for column in columns:
+        m = np.full(shape, np.nan)
+        m[codes, pos] = df[column].values.astype(float)
+        matrices[column] = m
+    return np.asarray(wells), matrices
+
+@instrument(catch = False)
+def curve_qc(df, rules = None):
+    """Runs the curve QC rules on long time-series data (columns 'Well', 'Time' and the columns used by the rules).
+    df can also be a KineticPlate, its reads are the 'OD' column and 'grate' is computed from them.
+    Returns a per-well DataFrame with columns 'Well', 'Rejected' and 'Reason'."""
+    from .kinetic_store import KineticPlate
+    rules = CURVE_QC_RULES if rules is None else rules
+    columns = sorted({c[0] for rule in rules for c in rule['conditions']})
+    if isinstance(df, KineticPlate):
+        wells, _, od = df.sorted()
+        matrices = {'OD': od, 'grate': growth_rates(od)}
+    else:
+        wells, matrices = pivot_wells(df, columns)
+    rejected, reason = evaluate_curve_qc(matrices, rules)
+    return pd.DataFrame({'Well': wells, 'Rejected': rejected, 'Reason': reason})
+
+# Cell
+def _fit_from_sums(n, sx, sy, sxx, sxy, syy):
+    """Least-squares line and R2 from the sums of the points, elementwise."""
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        vx, vy, cxy = sxx - sx**2/n, syy - sy**2/n, sxy - sx*sy/n
+        slope = cxy/vx
+        intercept = (sy - slope*sx)/n
+        r2 = np.where(vy > 0, cxy**2/(vx*vy), 1.)
+    return slope, intercept, np.where(n >= 2, r2, np.nan)
+
+def linear_fits(x, y):
+    """Straight-line least-squares fit of every row of y (wells x timepoints) against x in one closed-form pass.
+    NaN reads are left out of their well's fit. Returns slope, intercept, R2 and the number of points of every well."""
+    x, y = np.broadcast_to(np.asarray(x, dtype = float), np.shape(y)), np.asarray(y, dtype = float)
+    w = ~np.isnan(y)
+    x, y = np.where(w, x, 0.), np.where(w, y, 0.)
+    n = w.sum(axis = 1)
+    return _fit_from_sums(n, x.sum(1), y.sum(1), (x*x).sum(1), (x*y).sum(1), (y*y).sum(1)) + (n, )
+
+def prefix_linear_fits(x, y):
+    """Straight-line fits of the first k timepoints of every well, for all k at once (from cumulative sums).
+    Returns slope, intercept, R2 and number of points arrays of shape wells x timepoints, column k-1 being the fit of the first k reads."""
+    x, y = np.broadcast_to(np.asarray(x, dtype = float), np.shape(y)), np.asarray(y, dtype = float)
+    w = ~np.isnan(y)
+    x, y = np.where(w, x, 0.), np.where(w, y, 0.)
+    n = np.cumsum(w, axis = 1)
+    sums = [np.cumsum(v, axis = 1) for v in (x, y, x*x, x*y, y*y)]
+    return _fit_from_sums(n, *sums) + (n, )
+
+def _time_axis(labels):
+    """Numeric time axis from column labels such as 0, '120', '240s' or '1.5 h'."""
+    times = []
+    for label in labels:
+        m = re.search(r'[-+]?\d*\.?\d+(?:[eE][-+]?\d+)?', str(label))
+        if m is None:
+            raise ValueError(f'initial_rates: cannot read a time from column {label!r}, pass times')
+        times.append(float(m.group()))
+    return np.array(times)
+
+@instrument(catch = False)
+def initial_rates(data, times = None, window = None, auto = False, min_points = 3, min_r2 = 0.98, well = 'Well'):
+    """Initial rates (slopes) of all wells of a kinetic read in one closed-form least-squares pass, instead of one polyfit per well.
+    data is a DataFrame with one row per well, a well column and one column per timepoint (as the enzyme kinetics plate reader files),
+    or a KineticPlate. times is the time axis, by default read from the column labels ('0s', '120s', ... gives seconds).
+    Slopes are in signal units per unit of times.
+    window selects the linear range: the number of first reads (e.g. 6) or a (start, end) time interval, both inclusive.
+    With auto = True the range of every well is the longest run of first reads (within window, at least min_points)
+    whose fit has R2 >= min_r2: reads are added until the first fit that falls below min_r2, for all wells at once.
+    Wells whose first min_points reads already fall below min_r2 keep these reads. A window without reads gives NaN slopes.
+    Returns a DataFrame with columns 'Well', 'slope', 'intercept', 'r2', 'n_points' and 'end_time' (last time in the fit),
+    ready for `add_layout` and `run_statistics`."""
+    from .kinetic_store import KineticPlate
+    if isinstance(data, KineticPlate):
+        wells, read_times, y = data.sorted()
+    else:
+        columns = [c for c in data.columns if c != well]
+        wells, y = data[well].values, data[columns].values.astype(float)
+        read_times = _time_axis(columns) if times is None else None # labels are only parsed when no times are given
+    t = np.asarray(read_times if times is None else times, dtype = float)
+    order = np.argsort(t, kind = 'mergesort')
+    t, y = t[order], y[:, order]
+
+    if window is None:
+        start, end = 0, len(t)
+    elif np.ndim(window) == 0:
+        start, end = 0, int(window)
+    else:
+        start, end = np.searchsorted(t, window[0], 'left'), np.searchsorted(t, window[1], 'right')
+    t, y = t[start:end], y[:, start:end]
+
+    if auto and y.shape[1]:
+        slope, intercept, r2, n = prefix_linear_fits(t, y)
+        checked = n >= min_points
+        failed = checked & ~(r2 >= min_r2)
+        stop = np.where(failed.any(axis = 1), np.argmax(failed, axis = 1), y.shape[1]) # first failing prefix
+        passed = checked[np.arange(len(y)), np.maximum(stop - 1, 0)] & (stop > 0)
+        last = np.where(passed, stop - 1, min(min_points, y.shape[1]) - 1)
+        rows = np.arange(len(y))
+        slope, intercept, r2, n = slope[rows, last], intercept[rows, last], r2[rows, last], n[rows, last]
+    else:
+        slope, intercept, r2, n = linear_fits(t, y)
+        last = np.full(len(y), y.shape[1] - 1)
+    return pd.DataFrame({well: wells, 'slope': slope, 'intercept': intercept, 'r2': r2, 'n_points': n,
+                         'end_time': t[last] if len(t) else np.nan})
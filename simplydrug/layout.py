@@ -0,0 +1,180 @@
+__all__ = ['PlateGeometry', 'plate_geometry', 'infer_geometry', 'PLATE_FORMATS', 'PlateLayout', 'load_layout', 'clear_layout_cache', 'cache_dir']
+
+# Cell
+import os
+import pickle
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+
+# Cell
+def cache_dir(*parts):
+    """Folder for simplydrug's on-disk caches, $SIMPLYDRUG_CACHE_DIR or ~/.cache/simplydrug by default.
+    parts are joined to it as subfolders, which are created if needed."""
+    path = os.path.join(os.environ.get('SIMPLYDRUG_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'simplydrug')), *parts)
+    os.makedirs(path, exist_ok = True)
+    return path
+
+# Cell
+PLATE_FORMATS = {96: (8, 12), 384: (16, 24), 1536: (32, 48)}
+
+def _row_label(i):
+    """Row label of the 0-based row index: A..Z, then AA, AB, ... as on 1536-well plates."""
+    label = ''
+    i += 1
+    while i:
+        i, r = divmod(i - 1, 26)
+        label = chr(65 + r) + label
+    return label
+
+class PlateGeometry:
+    """Geometry of a plate format: row and column labels and a precomputed lookup from well names to positions.
+    Positions are row-major flat indices (row*n_cols + col). Well names are accepted with or without zero padding ('A1' or 'A01')."""
+    def __init__(self, n_rows, n_cols):
+        self.n_rows, self.n_cols = n_rows, n_cols
+        self.rows = [_row_label(i) for i in range(n_rows)]
+        self.cols = [str(j + 1) for j in range(n_cols)]
+        self.wells = np.array([r + c for r in self.rows for c in self.cols], dtype = object)
+        padded = np.array([r + c.zfill(2) for r in self.rows for c in self.cols], dtype = object)
+        positions = np.arange(n_rows*n_cols)
+        self._lookup = pd.Series(np.concatenate([positions, positions]), index = np.concatenate([self.wells, padded]))
+        self._lookup = self._lookup[~self._lookup.index.duplicated()]
+
+    @property
+    def shape(self):
+        return self.n_rows, self.n_cols
+
+    @property
+    def size(self):
+        return self.n_rows*self.n_cols
+
+    def __repr__(self):
+        return f'PlateGeometry({self.size} wells, {self.n_rows} x {self.n_cols})'
+
+    def index(self, wells):
+        """Flat plate positions of the wells in one hash lookup, -1 for names that are not wells of this plate."""
+        pos = self._lookup.index.get_indexer(pd.Index(np.asarray(wells, dtype = object)))
+        return np.where(pos >= 0, self._lookup.values[pos], -1)
+
+    def row_col(self, wells):
+        """Row and column indices (0-based) of the wells."""
+        return np.divmod(self.index(wells), self.n_cols)
+
+    def order(self, wells):
+        """Returns the wells sorted in plate order (row by row), in O(n) position lookups."""
+        wells = np.asarray(wells, dtype = object)
+        return list(wells[np.argsort(self.index(wells), kind = 'mergesort')])
+
+    def to_grid(self, wells, values, fill = np.nan):
+        """Scatters per-well values into a plate grid of shape (n_rows, n_cols, ...) in one vectorized assignment.
+        values can be a vector or a (wells x features) array; plate positions without a value get fill."""
+        values = np.asarray(values)
+        idx = self.index(wells)
+        if np.any(idx < 0):
+            raise ValueError(f'wells not on a {self.size}-well plate: {list(np.asarray(wells)[idx < 0][:5])}')
+        grid = np.full((self.size, ) + values.shape[1:], fill, dtype = np.result_type(values, np.asarray(fill)))
+        grid[idx] = values
+        return grid.reshape((self.n_rows, self.n_cols) + values.shape[1:])
+
+_GEOMETRIES = {}
+
+def plate_geometry(n_wells):
+    """Returns the (cached) PlateGeometry of a 96, 384 or 1536-well plate."""
+    if n_wells not in PLATE_FORMATS:
+        raise ValueError(f'Unknown plate format: {n_wells} wells, supported formats are {list(PLATE_FORMATS)}')
+    if n_wells not in _GEOMETRIES:
+        _GEOMETRIES[n_wells] = PlateGeometry(*PLATE_FORMATS[n_wells])
+    return _GEOMETRIES[n_wells]
+
+def infer_geometry(wells):
+    """Returns the PlateGeometry of the smallest plate format that has all the wells, e.g. 'P24' is on a 384-well plate."""
+    pos = plate_geometry(1536).index(wells)
+    if np.any(pos < 0):
+        raise ValueError(f'Unknown well names: {list(np.asarray(wells)[pos < 0][:5])}')
+    row, col = np.divmod(pos, 48)
+    for n_wells, (n_rows, n_cols) in sorted(PLATE_FORMATS.items()):
+        if row.max(initial = 0) < n_rows and col.max(initial = 0) < n_cols:
+            return plate_geometry(n_wells)
+
+# Cell
+class PlateLayout:
+    """Plate layout parsed once from the layout excel file: one flattened column per sheet, in sheet order.
+    Sheet names are the column names, e.g. layout['Status'] is the status of every well in the order of layout['Well']."""
+    def __init__(self, columns, path = None):
+        self.columns, self.path = dict(columns), path
+
+    @property
+    def sheets(self):
+        return list(self.columns)
+
+    def __getitem__(self, sheet):
+        return self.columns[sheet]
+
+    def __contains__(self, sheet):
+        return sheet in self.columns
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __repr__(self):
+        return f'PlateLayout({self.path!r}, wells = {len(self)}, sheets = {self.sheets})'
+
+    def to_frame(self, sheets = None):
+        """Returns the layout as a new DataFrame with one column per sheet (all sheets by default)."""
+        return pd.DataFrame({sheet: self.columns[sheet] for sheet in (sheets or self.sheets)})
+
+    @classmethod
+    def from_excel(cls, layout_path):
+        """Parses every sheet of the layout file, opening the workbook only once."""
+        with pd.ExcelFile(layout_path) as xls:
+            return cls({sheet: np.asarray(xls.parse(sheet)).reshape(-1) for sheet in xls.sheet_names}, layout_path)
+
+# Cell
+_LAYOUTS = {}
+
+def _layout_key(layout_path):
+    path = os.path.abspath(layout_path)
+    st = os.stat(path)
+    return path, st.st_size, st.st_mtime_ns
+
+def load_layout(layout_path, disk_cache = True):
+    """Returns the PlateLayout of the layout file, parsing the workbook only if it changed since it was last seen.
+    Layouts are cached in-process and, unless disk_cache is False, in a binary cache file under `cache_dir('layouts')`.
+    Both caches are keyed by the absolute file path, size and modification time. A PlateLayout is returned as is."""
+    if isinstance(layout_path, PlateLayout):
+        return layout_path
+    key = _layout_key(layout_path)
+    if key in _LAYOUTS:
+        return _LAYOUTS[key]
+
+    cache_file = None
+    if disk_cache:
+        cache_file = os.path.join(cache_dir('layouts'), hashlib.sha1(repr(key).encode()).hexdigest() + '.pkl')
+        try:
+            with open(cache_file, 'rb') as f:
+                layout = PlateLayout(pickle.load(f), layout_path)
+            _LAYOUTS[key] = layout
+            return layout
+        except (OSError, EOFError, pickle.UnpicklingError):
+            pass
+
+    layout = PlateLayout.from_excel(layout_path)
+    _LAYOUTS[key] = layout
+    if cache_file:
+        try:
+            tmp = cache_file + f'.{os.getpid()}.tmp'
+            with open(tmp, 'wb') as f:
+                pickle.dump(layout.columns, f, protocol = pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, cache_file)
+        except OSError as e:
+            logging.debug(f'load_layout: could not write layout cache: {e}')
+    return layout
+
+def clear_layout_cache(disk = False):
+    """Empties the in-process layout cache, and the on-disk cache too if disk is True."""
+    _LAYOUTS.clear()
+    if disk:
+        folder = cache_dir('layouts')
+        for f in os.listdir(folder):
+            os.remove(os.path.join(folder, f))
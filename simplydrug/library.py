@@ -0,0 +1,148 @@
+__all__ = ['ChemLibrary', 'build_library', 'open_library']
+
+# Cell
+import os
+import pickle
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+from .layout import cache_dir
+
+# Cell
+_STORE_VERSION = 2
+
+class ChemLibrary:
+    """Columnar chemical library store. The rows are grouped by library plate and every column is kept in its own .npy file,
+    numeric columns as values and text columns as integer codes of their unique values, as the plate reader cache of `read_plate` does.
+    Columns are memory-mapped, so a per-plate lookup reads only that plate's slice of every column.
+    Build it with `build_library` or `open_library` and pass it to `add_layout` in place of chem_path."""
+    def __init__(self, store_path, max_cached = 8):
+        self.store_path, self.max_cached = store_path, max_cached
+        with open(os.path.join(store_path, 'index.pkl'), 'rb') as f:
+            index = pickle.load(f)
+        if index.get('version') != _STORE_VERSION:
+            raise ValueError(f'ChemLibrary: {store_path} was built by another version of simplydrug, build it again')
+        self.source, self.rows, self.columns, self._layout = index['source'], index['rows'], index['columns'], index['layout']
+        self.counts = {plate: stop - start for plate, (start, stop) in self.rows.items()}
+        self._arrays, self._plates = {}, {}
+
+    def __getstate__(self): # workers reopen the column files instead of receiving copies of them
+        return dict(self.__dict__, _arrays = {}, _plates = {})
+
+    @property
+    def plates(self):
+        return list(self.rows)
+
+    def __contains__(self, plate):
+        return plate in self.rows
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def __repr__(self):
+        return f'ChemLibrary({self.store_path!r}, plates = {len(self.rows)}, compounds = {len(self)})'
+
+    def _array(self, name):
+        if name not in self._arrays:
+            if name.endswith('.pkl'):
+                with open(os.path.join(self.store_path, name), 'rb') as f:
+                    self._arrays[name] = pickle.load(f)
+            else:
+                self._arrays[name] = np.load(os.path.join(self.store_path, name), mmap_mode = 'r')
+        return self._arrays[name]
+
+    def plate(self, plate):
+        """Returns the compounds of one library plate (an empty DataFrame for unknown plates), with the row labels of the csv file.
+        Recently used plates stay in memory."""
+        if plate not in self.rows:
+            return pd.DataFrame(columns = self.columns)
+        if plate not in self._plates:
+            if len(self._plates) >= self.max_cached:
+                self._plates.pop(next(iter(self._plates)))
+            start, stop = self.rows[plate]
+            columns = {}
+            for i, (kind, name) in enumerate(self._layout):
+                values = self._array(name)[start:stop]
+                columns[i] = self._array(name[:-4] + '.pkl')[values] if kind == 'text' else np.array(values)
+            df = pd.DataFrame(columns, index = pd.Index(np.array(self._array('index.npy')[start:stop])))
+            df.columns = self.columns
+            self._plates[plate] = df
+        return self._plates[plate].copy()
+
+    def lookup(self, plate, wells):
+        """Returns the compounds in the given wells of a library plate, one row per well in the order of wells."""
+        return self.plate(plate).drop_duplicates('Well').set_index('Well').reindex(wells).reset_index()
+
+# Cell
+def _source_key(chem_path):
+    st = os.stat(chem_path)
+    return os.path.abspath(chem_path), st.st_size, st.st_mtime_ns
+
+def build_library(chem_path, store_path):
+    """Converts the chemical library csv file (with 'Plate' and 'Well' columns) into a columnar ChemLibrary at store_path.
+    The csv is read once, with the same column types `add_layout` gets from `pd.read_csv(chem_path, low_memory = False)`.
+    Rows are stored grouped by plate, in the order of the csv within every plate; rows without a plate are left out.
+    The store is written to a temporary folder and renamed, so a rebuild replaces the previous store as a whole
+    (no column files of the old library are left behind) and readers never see a partial store."""
+    store_path = os.path.normpath(store_path)
+    if os.path.isdir(store_path) and os.listdir(store_path) and not os.path.exists(os.path.join(store_path, 'index.pkl')):
+        raise ValueError(f'build_library: {store_path} is not empty and not a library store')
+    compounds = pd.read_csv(chem_path, low_memory = False)
+    codes, plates = pd.factorize(compounds['Plate'])
+    order = np.argsort(codes, kind = 'mergesort')[np.sum(codes < 0):] # grouped by plate, in csv order
+    counts = np.bincount(codes[codes >= 0], minlength = len(plates))
+    stops = np.cumsum(counts)
+    rows = compounds.iloc[order]
+    tmp, old = store_path + f'.{os.getpid()}.tmp', store_path + f'.{os.getpid()}.old'
+    try:
+        os.makedirs(tmp)
+        layout = []
+        for i in range(rows.shape[1]):
+            col, name = rows.iloc[:, i], f'column_{i:03d}.npy'
+            if isinstance(col.dtype, np.dtype) and col.dtype.kind in 'biufc':
+                layout.append(('values', name))
+                np.save(os.path.join(tmp, name), col.values)
+            else:
+                code, unique = pd.factorize(col)
+                layout.append(('text', name))
+                np.save(os.path.join(tmp, name), code.astype(np.int32))
+                with open(os.path.join(tmp, name[:-4] + '.pkl'), 'wb') as f: # code -1 (missing) picks the nan
+                    pickle.dump(np.append(np.asarray(unique, dtype = object), np.nan), f, protocol = pickle.HIGHEST_PROTOCOL)
+        np.save(os.path.join(tmp, 'index.npy'), rows.index.values)
+        with open(os.path.join(tmp, 'index.pkl'), 'wb') as f:
+            pickle.dump({'version': _STORE_VERSION, 'source': _source_key(chem_path), 'columns': list(compounds.columns), 'layout': layout,
+                         'rows': {plate: (int(stop - n), int(stop)) for plate, stop, n in zip(plates, stops, counts)}},
+                        f, protocol = pickle.HIGHEST_PROTOCOL)
+        if os.path.exists(store_path):
+            os.replace(store_path, old)
+        os.replace(tmp, store_path)
+    finally:
+        shutil.rmtree(tmp, ignore_errors = True)
+        shutil.rmtree(old, ignore_errors = True)
+    return ChemLibrary(store_path)
+
+_LIBRARIES = {}
+
+def open_library(chem_path, store_path = None):
+    """Opens the ChemLibrary of a chemical library csv file, building it on first use.
+    Unless store_path is given, the store lives under `cache_dir('libraries')`, keyed by the csv path, size and modification time,
+    so an edited library is converted again. A store folder can also be opened directly."""
+    if isinstance(chem_path, ChemLibrary):
+        return chem_path
+    if os.path.isdir(chem_path):
+        return ChemLibrary(chem_path)
+    key = _source_key(chem_path)
+    store_path = store_path or os.path.join(cache_dir('libraries'), hashlib.sha1(repr(key).encode()).hexdigest())
+    if (key, store_path) in _LIBRARIES:
+        return _LIBRARIES[key, store_path]
+    library = None
+    if os.path.exists(os.path.join(store_path, 'index.pkl')):
+        try:
+            library = ChemLibrary(store_path)
+        except (ValueError, KeyError, EOFError, pickle.UnpicklingError): # store of an older format
+            pass
+    if library is None or library.source != key: # missing or built from an older version of the csv
+        library = build_library(chem_path, store_path)
+    _LIBRARIES[key, store_path] = library
+    return library
@@ -0,0 +1,143 @@
+__all__ = ['enable_cache', 'disable_cache', 'cache_enabled', 'cache_stats', 'clear_cache', 'hash_inputs', 'memoized']
+
+# Cell
+import os
+import mmap
+import pickle
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+from .layout import cache_dir
+
+# Cell
+_MEMO = {'enabled': False, 'path': None, 'max_bytes': 2*1024**3, 'hits': 0, 'misses': 0, 'evictions': 0, 'code': None}
+
+def enable_cache(max_bytes = 2*1024**3, path = None):
+    """Turns on the on-disk memoization of dose-response fits (`fit_dr`, used by `run_dr`) and growth scores (`get_growth_scores`).
+    Results are stored under path (default `cache_dir('memo')`), keyed by a hash of the input data and every parameter
+    of the computation, and the least recently used entries are evicted when the cache grows over max_bytes.
+    Off by default: only results computed with the cache on are stored."""
+    _MEMO.update(enabled = True, path = path or cache_dir('memo'), max_bytes = max_bytes)
+    os.makedirs(_MEMO['path'], exist_ok = True)
+
+def disable_cache():
+    _MEMO['enabled'] = False
+
+def cache_enabled():
+    return _MEMO['enabled']
+
+def cache_stats():
+    """Hit, miss and eviction counts of this session, and the number of entries and bytes of the cache folder."""
+    files = _entries() if _MEMO['path'] else []
+    return {'hits': _MEMO['hits'], 'misses': _MEMO['misses'], 'evictions': _MEMO['evictions'],
+            'entries': len(files), 'bytes': sum(size for _, size, _ in files)}
+
+def clear_cache():
+    """Deletes every stored result and resets the counters."""
+    for f, _, _ in (_entries() if _MEMO['path'] else []):
+        os.remove(f)
+    _MEMO.update(hits = 0, misses = 0, evictions = 0)
+
+# Cell
+def _update_hash(h, obj):
+    if isinstance(obj, pd.DataFrame):
+        h.update(repr((list(obj.columns), [str(t) for t in obj.dtypes])).encode())
+        h.update(pd.util.hash_pandas_object(obj, index = True).values.tobytes())
+    elif isinstance(obj, pd.Series):
+        h.update(repr((obj.name, str(obj.dtype))).encode())
+        h.update(pd.util.hash_pandas_object(obj, index = True).values.tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update(repr((obj.shape, str(obj.dtype))).encode())
+        h.update(np.ascontiguousarray(obj).tobytes() if obj.dtype != object else repr(obj.tolist()).encode())
+    elif isinstance(obj, (list, tuple)):
+        h.update(f'{type(obj).__name__}{len(obj)}'.encode())
+        for item in obj:
+            _update_hash(h, item)
+    elif isinstance(obj, dict):
+        _update_hash(h, sorted(obj.items(), key = lambda kv: repr(kv[0])))
+    elif hasattr(obj, 'reads') and hasattr(obj, 'times'): # KineticPlate
+        _update_hash(h, (np.asarray(obj.wells), np.asarray(obj.times)))
+        reads = obj.reads
+        if isinstance(reads, np.memmap) and isinstance(reads.base, mmap.mmap) and reads.filename: # a whole stored array
+            st = os.stat(reads.filename)
+            _update_hash(h, ('file', reads.filename, st.st_size, st.st_mtime_ns, reads.offset, reads.shape, str(reads.dtype)))
+        else:
+            _update_hash(h, np.asarray(reads))
+    else:
+        h.update(repr(obj).encode())
+
+def _code_version():
+    """Hash of the source files of the package, so results computed by a different version of the code are not reused."""
+    if _MEMO['code'] is None:
+        from . import __version__
+        h = hashlib.sha256(__version__.encode())
+        folder = os.path.dirname(os.path.abspath(__file__))
+        for name in sorted(os.listdir(folder)):
+            if name.endswith('.py'):
+                with open(os.path.join(folder, name), 'rb') as f:
+                    h.update(name.encode() + f.read())
+        _MEMO['code'] = h.hexdigest()
+    return _MEMO['code']
+
+def hash_inputs(*parts):
+    """Content hash of the inputs of a computation: DataFrames, arrays, KineticPlates and plain parameters,
+    together with a hash of the simplydrug source code so results of other code versions are not reused.
+    KineticPlates of a `KineticStore` are keyed by the path, size and modification time of their file, not its content."""
+    h = hashlib.sha256(_code_version().encode())
+    for part in parts:
+        _update_hash(h, part)
+    return h.hexdigest()
+
+# Cell
+def _entries():
+    """(file, size, last use) of every cache entry."""
+    out = []
+    for name in os.listdir(_MEMO['path']):
+        if name.endswith('.pkl'):
+            f = os.path.join(_MEMO['path'], name)
+            try:
+                st = os.stat(f)
+            except OSError:
+                continue
+            out.append((f, st.st_size, st.st_mtime))
+    return out
+
+def _evict():
+    files = sorted(_entries(), key = lambda e: e[2]) # least recently used first
+    total = sum(size for _, size, _ in files)
+    for f, size, _ in files:
+        if total <= _MEMO['max_bytes']:
+            break
+        try:
+            os.remove(f)
+            _MEMO['evictions'] += 1
+        except OSError:
+            pass
+        total -= size
+
+def memoized(kind, key_parts, compute):
+    """Returns compute(), from the on-disk cache when it is enabled and a result of kind with the same key_parts is stored.
+    key_parts must contain everything the result depends on (input data, model, method, parameters)."""
+    if not _MEMO['enabled']:
+        return compute()
+    f = os.path.join(_MEMO['path'], f'{kind}_{hash_inputs(kind, key_parts)}.pkl')
+    try:
+        with open(f, 'rb') as fh:
+            result = pickle.load(fh)
+        os.utime(f) # mark as recently used
+        _MEMO['hits'] += 1
+        return result
+    except (OSError, EOFError, pickle.UnpicklingError):
+        pass
+    _MEMO['misses'] += 1
+    result = compute()
+    try:
+        tmp = f + f'.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as fh:
+            pickle.dump(result, fh, protocol = pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, f)
+        _evict()
+    except OSError as e:
+        logging.debug(f'memoized: could not store {kind} result: {e}')
+    return result
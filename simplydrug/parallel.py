@@ -0,0 +1,126 @@
+__all__ = ['shard_groups', 'run_dr_parallel', 'plot_dr_viability_parallel']
+
+# Cell
+import os
+import logging
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from .instrument import instrument
+
+# Cell
+class _LogCollector(logging.Handler):
+    """Collects log records emitted in a worker so they can be replayed in the parent process."""
+    def __init__(self):
+        super().__init__(level = logging.INFO)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append((record.levelno, record.getMessage()))
+
+_WORKER = {'pool': False}
+
+def _init_worker():
+    """Worker initializer: figures are only ever saved to disk, so use the non-interactive backend."""
+    _WORKER['pool'] = True
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    plt.switch_backend('Agg')
+
+def _run_logged(func, *args):
+    """Runs func(*args) and returns its output, the log records it emitted in a pool worker and the error it raised (None if it did not).
+    Errors of a worker are returned instead of raised, so its records reach the parent and are replayed before the error is re-raised there.
+    In the parent process (the serial path of `_map_shards`) records go to the root handlers as they are emitted and errors propagate,
+    so no records are returned."""
+    if not _WORKER['pool']:
+        return func(*args), [], None
+    root = logging.getLogger()
+    level, handlers, collector = root.level, root.handlers, _LogCollector()
+    root.handlers = [collector] # also keeps handlers inherited by forked workers from printing twice
+    root.setLevel(logging.INFO)
+    try:
+        return func(*args), collector.records, None
+    except Exception as e:
+        return None, collector.records, e
+    finally:
+        root.handlers = handlers
+        root.setLevel(level)
+
+def _replay(results):
+    """Replays the log records of every result in order and yields the outputs, re-raises the error of a failed shard after its records."""
+    for output, records, error in results:
+        for levelno, msg in records:
+            logging.log(levelno, msg)
+        if error is not None:
+            raise error
+        yield output
+
+def _map_shards(func, shards, n_jobs):
+    """Applies func to every shard, in a process pool when n_jobs > 1. Output order follows the shard order,
+    log records of every shard are replayed in the parent in the same order, up to the first shard that raised."""
+    if n_jobs == 1 or len(shards) <= 1:
+        return list(_replay(func(shard) for shard in shards))
+    with ProcessPoolExecutor(max_workers = n_jobs, initializer = _init_worker) as pool:
+        results = list(pool.map(func, shards))
+    return list(_replay(results))
+
+def _imap_shards(func, shards, n_jobs, batch_size):
+    """Like `_map_shards`, but yields the outputs one by one and submits batch_size shards at a time to a single pool,
+    so only one batch of outputs is held in memory."""
+    if n_jobs == 1 or len(shards) <= 1:
+        yield from _replay(func(shard) for shard in shards)
+        return
+    with ProcessPoolExecutor(max_workers = n_jobs, initializer = _init_worker) as pool:
+        for start in range(0, len(shards), batch_size):
+            yield from _replay(pool.map(func, shards[start:start + batch_size]))
+
+# Cell
+def shard_groups(df, n_shards, key = 'Compound_id'):
+    """Splits DataFrame into at most n_shards DataFrames, keeping all rows of a group (compound) in one shard.
+    Groups are assigned in sorted order to contiguous shards, so the concatenated output of the shards is deterministic."""
+    names = np.sort(df[key].dropna().unique())
+    return [df[df[key].isin(chunk)] for chunk in np.array_split(names, max(1, min(n_shards, len(names)))) if len(chunk)]
+
+# Cell
+def _dr_shard(args):
+    df, y_label, path, save_as, plot, p0, bounds = args
+    from .dose_response import fit_dr, _log_failed_fits
+    from .plotting import plot_dr
+    def fit_and_plot():
+        result = fit_dr(df, p0 = p0, bounds = bounds)
+        _log_failed_fits(result)
+        if plot:
+            plot_dr(result, y_label, path, save_as)
+        return result['fit']
+    return _run_logged(fit_and_plot)
+
+@instrument(catch = False)
+def run_dr_parallel(df, y_label, path, save_as, n_jobs = None, plot = True, p0 = None, bounds = None, shards_per_job = 4):
+    """Parallel version of `run_dr`. Compounds are sharded across a pool of n_jobs processes (all cores by default),
+    every worker fits its compounds and renders and saves their plots itself, so the parent never holds the figures.
+    Returns the same fit table as `run_dr`, ordered by Compound_id. Set plot = False to compute the fit table only.
+    p0 and bounds are passed to `fit_dr` as in `run_dr`.
+    """
+    n_jobs = n_jobs or os.cpu_count() or 1
+    shards = shard_groups(df, n_jobs*shards_per_job if n_jobs > 1 else 1)
+    tables = _map_shards(_dr_shard, [(shard, y_label, path, save_as, plot, p0, bounds) for shard in shards], n_jobs)
+    fitData = pd.concat(tables, ignore_index = True) if tables else pd.DataFrame()
+    if not fitData.empty:
+        return fitData
+
+# Cell
+def _viability_shard(args):
+    data, y_label, path, ymax = args
+    from .plotting import plot_dr_viability
+    return _run_logged(plot_dr_viability, data, y_label, path, ymax)
+
+@instrument(catch = False)
+def plot_dr_viability_parallel(data, y_label, path, n_jobs = None, shards_per_job = 4):
+    """Parallel version of `plot_dr_viability`, compounds are sharded across a pool of n_jobs processes
+    and every plot is rendered and saved inside its worker."""
+    n_jobs = n_jobs or os.cpu_count() or 1
+    df = data[['Compound_id', 'Dose','logDose', 'Viability', 'Response']]
+    ymax = df[(df != 0).all(1)].groupby(['Compound_id','Dose']).Response.mean().max()*1.2 # same y axis for all shards
+    shards = shard_groups(data, n_jobs*shards_per_job if n_jobs > 1 else 1)
+    _map_shards(_viability_shard, [(shard, y_label, path, ymax) for shard in shards], n_jobs)
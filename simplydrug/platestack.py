@@ -0,0 +1,113 @@
+__all__ = ['PlateStack']
+
+# Cell
+import numpy as np
+import pandas as pd
+from .layout import PlateGeometry, infer_geometry
+
+# Cell
+class PlateStack:
+    """Multi-plate, multi-feature screening data in one dense float32 array of shape (plates, wells, features).
+    Wells are in plate order of the geometry (row by row), so `grid` gives (plates, rows, cols) views for spatial methods.
+    The descriptors are integer coded: status_codes and compound_codes (plates, wells) index into statuses and compounds (-1 if missing),
+    status codes are int8 unless there are more than 127 statuses. present marks the plate positions that had a row in the source data.
+    Build it from the long DataFrames used across simplydrug with `from_frame` and go back with `to_frame`.
+    `run_statistics`, `normalize_z`, `normalize_b` and `heatmap_plate` accept a PlateStack in place of the DataFrame."""
+    def __init__(self, data, plates, features, geometry, status_codes = None, statuses = (),
+                 compound_codes = None, compounds = (), present = None):
+        self.data = np.asarray(data, dtype = np.float32)
+        self.plates, self.features, self.geometry = pd.Index(plates), list(features), geometry
+        n_plates, n_wells = self.data.shape[:2]
+        none = lambda dtype: np.full((n_plates, n_wells), -1, dtype = dtype)
+        status_dtype = np.int8 if len(statuses) <= np.iinfo(np.int8).max else np.int32 # a few statuses in practice
+        self.status_codes = none(status_dtype) if status_codes is None else np.asarray(status_codes, dtype = status_dtype)
+        self.compound_codes = none(np.int32) if compound_codes is None else np.asarray(compound_codes, dtype = np.int32)
+        self.statuses, self.compounds = pd.Index(statuses), pd.Index(compounds)
+        self.present = np.ones((n_plates, n_wells), dtype = bool) if present is None else np.asarray(present, dtype = bool)
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    def __len__(self):
+        return len(self.plates)
+
+    def __repr__(self):
+        return f'PlateStack(plates = {len(self.plates)}, wells = {self.geometry.size}, features = {self.features})'
+
+    def __contains__(self, feature):
+        return feature in self.features
+
+    def feature(self, name):
+        """View of one feature, shape (plates, wells)."""
+        return self.data[:, :, self.features.index(name)]
+
+    def grid(self, name):
+        """View of one feature laid out as plates, shape (plates, rows, cols)."""
+        return self.feature(name).reshape(len(self.plates), *self.geometry.shape)
+
+    def status_mask(self, status):
+        """Boolean (plates, wells) array of the wells with the given Status."""
+        if status not in self.statuses:
+            return np.zeros(self.status_codes.shape, dtype = bool)
+        return self.status_codes == self.statuses.get_loc(status)
+
+    def add_feature(self, name, values):
+        """Adds (or replaces) a feature from a (plates, wells) array, returns the stack."""
+        values = np.asarray(values, dtype = np.float32).reshape(self.data.shape[:2])
+        if name in self.features:
+            self.data[:, :, self.features.index(name)] = values
+        else:
+            self.data = np.concatenate([self.data, values[:, :, None]], axis = 2)
+            self.features.append(name)
+        return self
+
+    @classmethod
+    def from_frame(cls, df, features, plate = 'Plate', well = 'Well', status = 'Status', compound = 'Compound_id', geometry = None):
+        """Builds a PlateStack from a long DataFrame with one row per plate and well. Missing plate, status or compound columns are allowed
+        (then all rows are one plate, or the codes are -1). The plate format is inferred from the well names unless geometry is given."""
+        geometry = geometry or infer_geometry(df[well])
+        if not isinstance(geometry, PlateGeometry):
+            raise TypeError('PlateStack: geometry must be a PlateGeometry')
+        pos = geometry.index(df[well])
+        if np.any(pos < 0):
+            raise ValueError(f'PlateStack: wells not on a {geometry.size}-well plate')
+        plate_codes, plates = pd.factorize(df[plate], sort = True) if plate in df else (np.zeros(len(df), dtype = int), pd.Index([0]))
+        shape = (len(plates), geometry.size)
+        data = np.full(shape + (len(features), ), np.nan, dtype = np.float32)
+        data[plate_codes, pos] = df[list(features)].values.astype(np.float32)
+        present = np.zeros(shape, dtype = bool)
+        present[plate_codes, pos] = True
+
+        def coded(column):
+            codes = np.full(shape, -1, dtype = np.int32)
+            if column not in df:
+                return codes, pd.Index([])
+            c, categories = pd.factorize(df[column])
+            codes[plate_codes, pos] = c
+            return codes, categories
+        status_codes, statuses = coded(status)
+        compound_codes, compounds = coded(compound)
+        return cls(data, plates, features, geometry, status_codes, statuses, compound_codes, compounds, present)
+
+    def to_frame(self, features = None, plate = 'Plate', categorical = True):
+        """Long DataFrame with one row per present plate position: plate, 'Well', 'Status', 'Compound_id' and the features.
+        The descriptor columns are categoricals built on the integer codes, so no strings are materialized per row;
+        with categorical = False they are plain columns, as in the DataFrames the stack was built from."""
+        features = self.features if features is None else list(features)
+        n_plates, n_wells = self.data.shape[:2]
+        keep = self.present.reshape(-1)
+        idx = [self.features.index(f) for f in features]
+        values = self.data.reshape(n_plates*n_wells, -1)[:, idx][keep]
+        columns = {plate: pd.Categorical.from_codes(np.repeat(np.arange(n_plates), n_wells)[keep], categories = self.plates),
+                   'Well': pd.Categorical.from_codes(np.tile(np.arange(n_wells), n_plates)[keep], categories = self.geometry.wells)}
+        if len(self.statuses):
+            columns['Status'] = pd.Categorical.from_codes(self.status_codes.reshape(-1)[keep], categories = self.statuses)
+        if len(self.compounds):
+            columns['Compound_id'] = pd.Categorical.from_codes(self.compound_codes.reshape(-1)[keep], categories = self.compounds)
+        if not categorical:
+            columns = {name: np.asarray(column) for name, column in columns.items()}
+        df = pd.DataFrame(columns)
+        for i, f in enumerate(features):
+            df[f] = values[:, i]
+        return df
@@ -0,0 +1,264 @@
+__all__ = ['heatmap_plate', 'histogram_feature', 'plot_dr', 'plot_dr_viability', 'plot_polynomial', 'plot_treatments',
+           'plot_curve_raw', 'plot_curve_mean', 'pointplot_plate']
+
+# Cell
+import logging
+import numpy as np
+import pandas as pd
+import seaborn as sns
+from matplotlib.ticker import FuncFormatter
+from matplotlib.collections import LineCollection
+from .instrument import instrument
+from .simplydrug import handle_exceptions, ll4, inv_log, pDose
+from .layout import load_layout, plate_geometry
+from .platestack import PlateStack
+from .kinetic_store import KineticPlate
+from .dose_response import fit_polynomials
+from .render import new_figure, save_figure
+
+# Cell
+@handle_exceptions
+def heatmap_plate(df, layout_path, features, path, save_as):
+    """Takes DataFrame (or a PlateStack), list of features, a path to layout file (or a PlateLayout), and the output folder and creates a plate heatmap for the input features.
+    96, 384 and 1536-well plates are supported.
+    """
+    if isinstance(df, PlateStack): # mean of the plates, as for a DataFrame with several plates
+        df = df.to_frame(features, categorical = False).drop(columns = ['Plate', 'Status', 'Compound_id'], errors = 'ignore')
+
+    # merge data with well names and status
+    layout = load_layout(layout_path).to_frame(['Well', 'Status'])
+    data = pd.merge(layout, df.groupby('Well').mean(), how = 'left', on ='Well').set_index('Well', drop = False)
+    samples = data[data.Status == 'Sample'].dropna()
+
+    # define plate format, raises ValueError for unknown formats
+    geometry = plate_geometry(data.shape[0])
+    yticks, xticks = geometry.rows, geometry.cols
+    width = 7 if geometry.size <= 384 else 14
+
+    # build heatmap for each feature
+    for f in features:
+        plate_view = geometry.to_grid(data.Well, data[f].values.astype(float)) # wells placed by position lookup
+        plate_view[np.isnan(plate_view)] = samples[f].mean() # fill missing values with sample mean value
+        vmin = samples[f].mean() - 3*(samples[f].std()) # min value for the heatmap
+        vmax = samples[f].mean() + 3*(samples[f].std()) # min value for the heatmap
+
+        # plot
+        fig = new_figure(width, width*4/7)
+        ax = sns.heatmap(plate_view, vmin, vmax, center = samples[f].mean(), yticklabels = yticks, xticklabels = xticks, cmap = 'RdBu_r', ax = fig.subplots())
+        ax.set_yticklabels(yticks, rotation = 0)
+        ax.set_xticklabels(xticks,rotation = 0)
+        ax.set_title(f + ' \n')
+        save_figure(fig, path, f + save_as if save_as else None, 'heatmap.png', 'heatmap_plate')
+
+# Cell
+@handle_exceptions
+def histogram_feature(df, feature, path, save_as):
+    """Creates histogram of the input feature.
+    """
+    fig = new_figure(6.4, 4.8)
+    ax = sns.distplot(df[feature].values, ax = fig.subplots())
+    ax.plot([-2, -2], [0, 0.5], color = 'r', linestyle = '--', lw = 1.7)
+    ax.plot([2, 2], [0, 0.5], color = 'r', linestyle = '--', lw = 1.7)
+    save_figure(fig, path, save_as, 'histogram.png', 'histogram_feature')
+
+# Cell
+@instrument(catch = False)
+def plot_dr(result, y_label, path, save_as, compounds = None):
+    """Plots dose response curves from the output of `fit_dr`. By default plots every compound with a fitted curve,
+    pass a list of Compound_id values to plot a subset only, e.g. the hits or `result['failed']`.
+    Compounds without a fitted curve are plotted as data points only.
+    """
+    pDose = lambda x:-np.log10(1e-6*x)
+    fitData, df_mean = result['fit'].set_index('Compound_id'), result['data']
+    if compounds is None:
+        compounds = list(fitData.index)
+
+    for name in compounds:
+        group = df_mean[df_mean.Compound_id == name]
+        if group.empty:
+            logging.info(f'plot_dr: no data for {name}')
+            continue
+        try:
+                fig = new_figure(6, 6)
+                axes = fig.subplots()
+                axes.errorbar(group.logDose, group.Response, yerr = group['std'], fmt='o')
+                axes.invert_xaxis()
+                if name in result['curves']:
+                    refDose, fitted = result['curves'][name]
+                    axes.plot(pDose(refDose), fitted)
+                axes.xaxis.set_major_formatter(FuncFormatter(lambda l, _: round(inv_log(l), 1))) # inverse log for xticks
+                axes.set_xlabel('Dose (um)')
+                axes.set_ylabel(y_label)
+                axes.set_title(name)
+
+                #plot EC_50_label
+                if name in fitData.index:
+                    fitCoefs = fitData.loc[name, ['hill slope', 'min response', 'max response', 'EC50']].values.astype(float)
+                    EC50_response = ll4(fitCoefs[3], *fitCoefs)
+                    ymin, ymax = axes.get_ylim()
+                    xmin, xmax = axes.get_xlim()
+                    axes.plot([xmin, pDose(fitCoefs[3])], [EC50_response, EC50_response], color = 'navy', linestyle = '--', lw = 0.7)
+                    axes.plot([pDose(fitCoefs[3]), pDose(fitCoefs[3])], [ymin, EC50_response], color = 'navy', linestyle = '--', lw = 0.7)
+                for side in ('top', 'right'):
+                    axes.spines[side].set_visible(False)
+
+                save_figure(fig, path, 'dr_' + name + save_as if save_as else None, 'dr_' + name + '.png', 'plot_dr')
+
+        except Exception as e:
+            logging.info(f'Plotting curve failed: {e}')
+
+# Cell
+@instrument(catch = False)
+def plot_dr_viability(data, y_label, path, ymax = None):
+    """Plots response vs viability. The DataFrame should contain columns ['Compound', 'Dose','logDose', 'Viability', 'Response'] (at least).
+    The response axis goes up to ymax, by default 1.2 times the highest mean response in the data."""
+    df = data[['Compound_id', 'Dose','logDose', 'Viability', 'Response']]
+    df = df[(df != 0).all(1)]  # drop zero values
+    df_mean = df.groupby(['Compound_id','Dose'], as_index = False).mean() # calculate response mean values
+    df_mean['resp_std'] = list(df.groupby(['Compound_id','Dose']).std().Response.values) # calculate response std
+    df_mean['via_std'] = list(df.groupby(['Compound_id','Dose']).std().Viability.values) # calculate viability std
+
+    for name, group in df_mean.groupby('Compound_id'):  # group data by compounds
+        group = group.sort_values('Dose')
+        error_resp, error_via  = group.resp_std, group.via_std
+
+        fig = new_figure(6, 6)
+        ax1 = fig.subplots()
+        ax1.set_title(name, fontsize = 16)
+
+        plot1 = ax1.plot(group.logDose, group.Response, 'b', label = 'Response')
+        ax1.set_xlim(max(group.logDose)*1.07, min(group.logDose)*0.9)
+        ax1.set_ylabel(y_label, fontsize = 16)
+        ax1.set_ylim(0, ymax if ymax else df_mean.Response.max()*1.2)
+        ax1.errorbar(group.logDose, group.Response,yerr = error_resp, fmt ='o', color ='b', ecolor = 'lightblue')
+
+        ax2 = ax1.twinx()
+        plot2 = ax2.plot(group.logDose, group.Viability, 'g', label = 'Viability')
+        ax2.set_xlim(max(group.logDose)*1.07, min(group.logDose)*0.9)
+        ax2.set_ylabel('Viability', fontsize = 16)
+        ax2.set_ylim(0, 120)
+        ax2.errorbar(group.logDose, group.Viability,yerr = error_via, fmt ='o', color = 'g', ecolor = 'lightgreen')
+        ax1.set_xlabel('Dose, um', fontsize = 16)
+
+        # create legend
+        lines = plot1 + plot2
+        ax1.legend(lines, [l.get_label() for l in lines])
+        inv_log = lambda x:((10**-x)/(1e-6)) # inverse log calculator to set xticks
+        ax1.xaxis.set_major_formatter(FuncFormatter(lambda loc, _: round(inv_log(loc), 1)))
+        save_figure(fig, path, name + '_raw_viability.png' if path else None, name + '_raw_viability.png', 'plot_dr_viability')
+
+# Cell
+@instrument(catch = False)
+def plot_polynomial(df, y_label, path, save_as, degree = 2, plot = True):
+    """Polynomial fit of the dose-response data of every compound. All compounds are fitted at once by
+    `simplydrug.dose_response.fit_polynomials`, the table of coefficients and goodness of fit is returned.
+    With plot = True (default) the mean responses, their standard deviations and the fitted polynomial of each compound are plotted."""
+    df = df[['Compound_id', 'Dose', 'Response']]
+    df = df[(df != 0).all(1)]  # drop zero values
+    df = df.assign(logDose = pDose(df.Dose.astype(float)))
+
+    fits = fit_polynomials(df, degree)
+    for name in fits.Compound_id[fits.p0.isna()]:
+        logging.info(f'Polynomial fit failed: {name}, not enough points for degree {degree}')
+    if not plot:
+        return fits
+
+    summary = df.groupby(['Compound_id', 'Dose'], as_index = False).agg(logDose = ('logDose', 'mean'),
+                       Response = ('Response', 'mean'), std = ('Response', 'std')) # mean and error bars of all compounds at once
+    coefs = fits.set_index('Compound_id')[[f'p{i}' for i in range(degree + 1)]]
+
+    # plot response
+    for name, mean_group in summary.groupby('Compound_id'):
+        fig = new_figure(6, 6)
+        ax = fig.subplots()
+        ax.errorbar(mean_group.logDose, mean_group.Response, yerr = list(mean_group['std'].values), fmt = 'o')
+        ax.set_xlim(max(mean_group.logDose)*1.1, min(mean_group.logDose)*0.9)
+        ax.xaxis.set_major_formatter(FuncFormatter(lambda l, _: round(inv_log(l), 1))) # inverse log for xticks
+        ax.set_xlabel('Dose (um)')
+        ax.set_ylabel(y_label)
+        ax.set_title(name)
+        for side in ('top', 'right'):
+            ax.spines[side].set_visible(False)
+
+        # plot polynomial_fit
+        if not coefs.loc[name].isna().any():
+            polyDose = np.linspace(min(mean_group.logDose)*0.98, max(mean_group.logDose)*1.02, 256)
+            ax.plot(polyDose, np.polyval(coefs.loc[name].values, polyDose), color = 'Navy')
+        save_figure(fig, path, 'polynomial_' + name + save_as if save_as else None, 'polynomial_' + name + '.png', 'plot_polynomial')
+    return fits
+
+# Cell
+@instrument(catch = False)
+def plot_treatments(df, x, y, column, kind, ylabel, palette, height, aspect, path, save_as):
+    """Creates plot by compounds. If your data has different treatments, set column = 'Treatment'.
+    kind is a seaborn categorical plot kind ('strip', 'swarm', 'box', 'violin', 'boxen', 'point', 'bar'), one panel per value of column."""
+    plot_data = df[df.Status != 'Reference'] #filter out the Reference wells
+    panels = [(None, plot_data)] if column is None else list(plot_data.groupby(column, sort = False))
+    fig = new_figure(height*aspect*len(panels), height)
+    axes = fig.subplots(1, len(panels), sharey = True, squeeze = False)[0]
+    for ax, (value, panel) in zip(axes, panels):
+        getattr(sns, kind + 'plot')(x = x, y = y, data = panel, palette = palette, ax = ax)
+        ax.set_ylabel('')
+        ax.set_title('' if value is None else f'{column} = {value}')
+        ax.tick_params(axis = 'x', labelrotation = 90)
+        for side in ('top', 'right'):
+            ax.spines[side].set_visible(False)
+    axes[0].set_ylabel(ylabel)
+    save_figure(fig, path, save_as, 'treatments.png', 'plot_treatments')
+
+# Cell
+@instrument(catch = False)
+def plot_curve_raw(df, x, y, units, hue, hue_order, xlabel, ylabel, xlimit, palette, path, save_as):
+    """Plots raw kinetic curves.
+    df can also be a KineticPlate (see `simplydrug.kinetic_store`), then hue maps wells to groups (a dict or a Series indexed by well,
+    e.g. results.set_index('Well').Result), x, y and units are not used, and only the wells of the hue_order groups are read from disk.
+    """
+    fig = new_figure(10, 7)
+    if isinstance(df, KineticPlate):
+        groups = pd.Series(hue)
+        wells, times, reads = df.select(wells = groups.index[groups.isin(hue_order)].intersection(df.wells))
+        groups = groups.reindex(wells).values
+        ax = fig.subplots()
+        for group in hue_order: # one collection per group instead of one line per well
+            rows = groups == group
+            if rows.any():
+                segments = np.stack([np.broadcast_to(times, reads[rows].shape), reads[rows]], axis = -1)
+                ax.add_collection(LineCollection(segments, colors = palette[group], label = group))
+        ax.autoscale_view()
+        ax.legend()
+    else:
+        ax = sns.lineplot(data = df, x = x, y = y, units = units, hue = hue, hue_order = hue_order, palette = palette, estimator = None,
+                          ax = fig.subplots())
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_xlim(0, xlimit)
+    save_figure(fig, path, save_as, 'curve_raw.png', 'plot_curve_raw')
+
+# Cell
+@instrument(catch = False)
+def plot_curve_mean(df, x, y, hue, hue_order, xlabel, ylabel, xlimit, palette, path, save_as):
+    """Plots mean kinetic curves."""
+    fig = new_figure(10, 7)
+    ax = sns.lineplot(data = df, x = x, y = y, hue = hue, hue_order = hue_order, palette = palette, ax = fig.subplots())
+    sns.despine(ax = ax)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_xlim(0, xlimit)
+    save_figure(fig, path, save_as, 'curve_mean.png', 'plot_curve_mean')
+
+# Cell
+@instrument(catch = False)
+def pointplot_plate(df, x, y, hue, hue_order, threshold, ylabel, palette,  path, save_as):
+    """Creates point plot for the experiment."""
+    fig = new_figure(15, 6)
+    ax = sns.stripplot(data = df, x = x, y = y, hue = hue, palette = palette, hue_order = hue_order, ax = fig.subplots())
+    if threshold:
+        ax.plot([0, len(df.Well.unique())], [threshold, threshold],'r-')
+        ax.plot([0, len(df.Well.unique())], [-threshold, -threshold],'r-')
+
+    ax.set_xticklabels([])
+    ax.set_xlabel(x)
+    ax.set_ylabel(ylabel)
+    ax.legend(loc = 'center left', bbox_to_anchor = (1, 0.5), frameon = False, title = hue)
+    sns.despine(ax = ax)
+    save_figure(fig, path, save_as, 'pointplot.png', 'pointplot_plate')
@@ -0,0 +1,95 @@
+__all__ = ['get_render_config', 'set_render_config', 'render_config', 'new_figure', 'save_figure', 'render_batch']
+
+# Cell
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from .instrument import instrument
+
+# Cell
+_CONFIG = {'dpi': 600, 'format': 'png', 'skip': False}
+
+def get_render_config():
+    """Current render settings of all plot functions: 'dpi', 'format' (file format and extension of saved figures) and 'skip'."""
+    return dict(_CONFIG)
+
+def set_render_config(dpi = None, format = None, skip = None):
+    """Changes the render settings used by every plot function of simplydrug, e.g. set_render_config(dpi = 150) for drafts,
+    format = 'svg' or 'pdf' for vector output, or skip = True to run the analyses without rendering any figure.
+    Only the given settings change. The defaults are dpi = 600, format = 'png', skip = False."""
+    for key, value in (('dpi', dpi), ('format', format), ('skip', skip)):
+        if value is not None:
+            _CONFIG[key] = value.lower().lstrip('.') if key == 'format' else value
+    return get_render_config()
+
+class render_config:
+    """Context manager applying render settings for a block, e.g. `with render_config(dpi = 100): sd.run_dr(...)`."""
+    def __init__(self, **settings):
+        self.settings = settings
+
+    def __enter__(self):
+        self._saved = get_render_config()
+        return set_render_config(**self.settings)
+
+    def __exit__(self, *exc):
+        _CONFIG.update(self._saved)
+        return False
+
+# Cell
+_STYLED = []
+
+def _style():
+    """Applies the simplydrug plot style once per process, instead of on every plot call."""
+    if not _STYLED:
+        import seaborn as sns
+        sns.set(context = 'notebook', style = 'white', palette = 'dark')
+        _STYLED.append(True)
+
+def new_figure(width, height):
+    """New matplotlib Figure on its own Agg canvas, outside of pyplot: nothing is registered globally,
+    so figures can be built and saved concurrently from threads or processes."""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    _style()
+    fig = Figure(figsize = (width, height))
+    FigureCanvasAgg(fig)
+    return fig
+
+def save_figure(fig, path, save_as, default, caller):
+    """Saves fig as path/save_as, or as default in the working directory if path or save_as is missing,
+    with the dpi and format of the render config (the file extension follows the format). Logs the file as caller.
+    Returns the file path, or None if rendering is skipped."""
+    name, folder, where = (save_as, path, 'the output folder') if path and save_as else (default, os.getcwd(), 'the working directory')
+    root, ext = os.path.splitext(name)
+    if ext.lower().lstrip('.') != _CONFIG['format']:
+        name = f"{root}.{_CONFIG['format']}"
+    if _CONFIG['skip']:
+        logging.info(f'{caller}: {name} skipped')
+        return None
+    file = os.path.join(folder, name)
+    fig.savefig(file, bbox_inches = 'tight', dpi = _CONFIG['dpi'], format = _CONFIG['format'])
+    logging.info(f'{caller}: {name} saved to {where}')
+    return file
+
+# Cell
+def _render_spec(args):
+    (func, kwargs), config = args
+    from .parallel import _run_logged
+    _CONFIG.update(config)
+    return _run_logged(lambda: func(**kwargs))
+
+@instrument(catch = False)
+def render_batch(specs, n_jobs = None, processes = True):
+    """Renders a queue of plots concurrently. specs is a list of (plot function, keyword arguments) pairs,
+    e.g. [(sd.heatmap_plate, dict(df = results, layout_path = layout, features = ['gscore_norm'], path = path, save_as = 'heatmap.png')), ...].
+    With processes = True the plots are shared out to a pool of n_jobs processes (all cores by default), which also parallelizes rasterization,
+    otherwise to a thread pool. The render config is passed on to the workers, log records are replayed in the order of specs.
+    Returns the return values of the plot functions, in the order of specs."""
+    from .parallel import _map_shards
+    specs = [(func, dict(kwargs)) for func, kwargs in specs]
+    n_jobs = n_jobs or os.cpu_count() or 1
+    if processes:
+        return _map_shards(_render_spec, [(spec, get_render_config()) for spec in specs], min(n_jobs, len(specs)) or 1)
+    _style()
+    with ThreadPoolExecutor(max_workers = n_jobs) as pool:
+        return list(pool.map(lambda spec: spec[0](**spec[1]), specs))
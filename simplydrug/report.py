@@ -0,0 +1,233 @@
+__all__ = ['ReportBuilder', 'folder_artifacts', 'df_to_table', 'create_presentation']
+
+# Cell
+import io
+import os
+import re
+import logging
+from xml.sax.saxutils import escape
+import pandas as pd
+from .parallel import _imap_shards, _run_logged
+from .instrument import instrument
+
+# Cell
+_CONTROL = re.compile(r'[\x00-\x08\x0B-\x1F]')
+
+def _cell_xml(text, font_size):
+    """XML of a table cell holding text, as python-pptx writes it for `cell.text = text` with the font size of the first paragraph set:
+    one paragraph per line, vertical tabs as line breaks, no runs for empty text and control characters escaped as _xHHHH_."""
+    paragraphs = []
+    for i, line in enumerate(text.split('\n')):
+        runs = ''.join(('<a:br/>' if j else '') + ('<a:r><a:t>%s</a:t></a:r>' % escape(_CONTROL.sub(lambda m: '_x%04X_' % ord(m.group()), run)) if run else '')
+                       for j, run in enumerate(line.split('\v')))
+        paragraphs.append('<a:p>%s%s</a:p>' % ('<a:pPr><a:defRPr sz="%d"/></a:pPr>' % (font_size*100) if i == 0 else '', runs))
+    return '<a:tc><a:txBody><a:bodyPr/><a:lstStyle/>%s</a:txBody><a:tcPr/></a:tc>' % ''.join(paragraphs)
+
+def _table_rows(df, height, font_size = 9):
+    """XML of all rows of a pptx table of the given height for df (header row first, first column named 'idx'), written as one string
+    instead of setting the text and font of every cell through python-pptx. Cells and row heights are the ones python-pptx writes."""
+    colnames = [name if isinstance(name, str) else ' '.join(name) for name in df.columns] # column names can be tuples
+    colnames[:1] = ['idx']
+    texts = [colnames] + [[str(val) for val in values] for values in df.values]
+    row_height = height // len(texts)
+    heights = [row_height]*(len(texts) - 1) + [height - (len(texts) - 1)*row_height] # last row absorbs the rounding
+    return ''.join('<a:tr h="%d">%s</a:tr>' % (h, ''.join(_cell_xml(text, font_size) for text in values)) for h, values in zip(heights, texts))
+
+def _add_table(slide, rows_xml, n_cols, left, top, width, height):
+    """Adds a table to the slide with prebuilt rows (see `_table_rows`), parsed in one go."""
+    from pptx.oxml import parse_xml
+    from pptx.oxml.ns import nsdecls
+    shape = slide.shapes.add_table(1, n_cols, left, top, width, height)
+    tbl = shape._element.graphic.graphicData.tbl
+    for tr in tbl.tr_lst:
+        tbl.remove(tr)
+    tbl.extend(list(parse_xml(f'<a:tbl {nsdecls("a")}>{rows_xml}</a:tbl>')))
+    return shape
+
+# Cell
+def _fit(size, box):
+    """Largest (width, height) with the aspect ratio of size (pixels) that fits into box (inches)."""
+    scale = min(box[0]/size[0], box[1]/size[1])
+    return size[0]*scale, size[1]*scale
+
+def _prepare_image(file, box, stretch, dpi, image_format, quality):
+    """Image bytes downsampled to dpi at the display size (inches) on the slide, and the display size.
+    Images are only resampled when they have more pixels than needed and only re-encoded when resampled or converted to jpeg."""
+    from PIL import Image
+    with Image.open(file) as im:
+        px = im.size
+        display = box if stretch else _fit(px, box)
+        target = (max(1, int(round(display[0]*dpi))), max(1, int(round(display[1]*dpi))))
+        resize = target[0] < px[0] or target[1] < px[1]
+        if not resize and image_format != 'jpeg':
+            with open(file, 'rb') as f:
+                return f.read(), display
+        im = im.resize(target, Image.LANCZOS, reducing_gap = 3.) if resize else im.copy() # reducing_gap: fast integer downscale first
+    buf = io.BytesIO()
+    if image_format == 'jpeg':
+        if im.mode in ('RGBA', 'LA', 'P'):
+            im = im.convert('RGBA')
+            background = Image.new('RGB', im.size, 'white')
+            background.paste(im, mask = im.split()[-1])
+            im = background
+        im.convert('RGB').save(buf, 'JPEG', quality = quality, optimize = True)
+    else:
+        im.save(buf, 'PNG')
+    return buf.getvalue(), display
+
+def _prepare(args):
+    """Worker: slide content of one artifact, images downsampled and tables serialized."""
+    artifact, settings = args
+    def run():
+        kind = artifact['kind']
+        if kind == 'image':
+            try:
+                data, display = _prepare_image(artifact['file'], artifact['box'], artifact['stretch'], settings['dpi'], settings['image_format'], settings['quality'])
+            except Exception as e:
+                logging.info(f'ReportBuilder: {artifact["file"]} skipped, {e}')
+                return None
+            return dict(artifact, data = data, display = display)
+        if kind == 'table':
+            table = artifact['table']
+            if not isinstance(table, pd.DataFrame):
+                try:
+                    table = pd.read_csv(table)
+                except Exception as e:
+                    logging.info(f'ReportBuilder: {table} skipped, {e}')
+                    return None
+            if settings['max_table_rows'] and table.shape[0] >= settings['max_table_rows']:
+                logging.info(f'ReportBuilder: table {artifact["title"]} skipped, {table.shape[0]} rows')
+                return None
+            return dict(artifact, table = None, n_cols = table.shape[1], rows_xml = _table_rows(table, artifact['height'], settings['font_size']))
+        return artifact
+    return _run_logged(run)
+
+# Cell
+class ReportBuilder:
+    """Builds a pptx report from an explicit, ordered list of artifacts, one slide each: images (`add_image`), tables (`add_table`)
+    and text (`add_text`). Images are downsampled to dpi at the size they are shown on the slide (600-dpi plots shown 6 inches high
+    need 900 pixels at 150 dpi, not 3600), optionally re-encoded as jpeg; tables are written as one XML block instead of cell by cell.
+    The slide contents are prepared in a pool of n_jobs processes, batch_size artifacts at a time, and added to the presentation in order,
+    so only one batch of images is held in memory. `save` writes the file once at the end.
+    """
+    def __init__(self, title = 'Technical Report', dpi = 150, image_format = 'png', quality = 85, max_table_rows = 30,
+                 font_size = 9, template = None):
+        self.title, self.template, self.artifacts = title, template, []
+        self.settings = dict(dpi = dpi, image_format = image_format.lower().replace('jpg', 'jpeg'), quality = quality,
+                             max_table_rows = max_table_rows, font_size = font_size)
+
+    def __len__(self):
+        return len(self.artifacts)
+
+    def __repr__(self):
+        return f'ReportBuilder({self.title!r}, artifacts = {len(self.artifacts)})'
+
+    def add_image(self, file, title = None, width = None, height = 6., stretch = False):
+        """Image slide. The image is fitted into width x height inches (width defaults to the slide width less the margins),
+        with stretch = True it is shown at exactly width x height. title defaults to the file name, '' for no title."""
+        self.artifacts.append(dict(kind = 'image', file = file, title = os.path.basename(file) if title is None else title,
+                                   box = (width, height), stretch = stretch))
+        return self
+
+    def add_table(self, table, title = None):
+        """Table slide from a DataFrame or a csv file; tables with max_table_rows rows or more are left out."""
+        from pptx.util import Inches
+        if title is None:
+            title = os.path.basename(table) if isinstance(table, str) else ''
+        self.artifacts.append(dict(kind = 'table', table = table, title = title, height = int(Inches(0.3))))
+        return self
+
+    def add_text(self, text, size = 18):
+        self.artifacts.append(dict(kind = 'text', text = text, size = size))
+        return self
+
+    def extend(self, artifacts):
+        """Adds a list of artifacts: files (images, or tables if they end with .csv), DataFrames, or artifacts of `folder_artifacts`."""
+        for artifact in artifacts:
+            if isinstance(artifact, dict):
+                self.artifacts.append(artifact)
+            elif isinstance(artifact, pd.DataFrame):
+                self.add_table(artifact)
+            elif str(artifact).lower().endswith('.csv'):
+                self.add_table(artifact)
+            else:
+                self.add_image(artifact)
+        return self
+
+    def _title_slide(self, report):
+        from datetime import date
+        from pptx.util import Inches, Pt
+        slide = report.slides.add_slide(report.slide_layouts[6])
+        subtitle = slide.shapes.add_textbox(left = Inches(5.), top = Inches(3.5), width = Inches(3), height = Inches(0.5),).text_frame
+        run = subtitle.paragraphs[0].add_run()
+        run.text = '{}\nGenerated on {:%m-%d-%Y}'.format(self.title, date.today())
+        run.font.size = Pt(18)
+
+    def _add_slide(self, report, item):
+        from pptx.util import Inches, Pt
+        slide = report.slides.add_slide(report.slide_layouts[6])
+        if item['kind'] == 'text':
+            box = slide.shapes.add_textbox(left = Inches(0.5), top = Inches(0.3), width = Inches(9), height = Inches(0.5)).text_frame
+            run = box.paragraphs[0].add_run()
+            run.text, run.font.size = item['text'], Pt(item['size'])
+            return
+        if item['title']:
+            slide.shapes.add_textbox(left = Inches(0.5), top = Inches(0.3), width = Inches(2), height = Inches(0.5)).text_frame.text = item['title']
+        if item['kind'] == 'image':
+            width, height = item['display']
+            slide.shapes.add_picture(io.BytesIO(item['data']), Inches(0.7), Inches(0.8), width = Inches(width), height = Inches(height))
+        else:
+            _add_table(slide, item['rows_xml'], item['n_cols'], left = Inches(0.3), top = Inches(1), width = Inches(12.5), height = item['height'])
+
+    def build(self, n_jobs = None, batch_size = 64):
+        """Returns the pptx Presentation with a title slide and one slide per artifact, in the order they were added."""
+        from pptx import Presentation
+        report = Presentation(self.template) if self.template else Presentation()
+        self._title_slide(report)
+        free_width = report.slide_width.inches - 1.4 # slide width less the margins
+        artifacts = [dict(a, box = (a['box'][0] or free_width, a['box'][1])) if a['kind'] == 'image' else a for a in self.artifacts]
+        n_jobs = n_jobs or os.cpu_count() or 1
+        for item in _imap_shards(_prepare, [(a, self.settings) for a in artifacts], min(n_jobs, len(artifacts)) or 1, batch_size):
+            if item is not None:
+                self._add_slide(report, item)
+        return report
+
+    def save(self, file, n_jobs = None, batch_size = 64):
+        """Builds the report and writes it to file in a single save. Returns the file name."""
+        self.build(n_jobs, batch_size).save(file)
+        logging.info(f'ReportBuilder: {os.path.basename(file)} saved, {len(self.artifacts)} artifacts')
+        return file
+
+# Cell
+def folder_artifacts(path):
+    """Artifacts of an output folder in the way `create_presentation` picked them up: png plots (heatmaps shown at 5.8 x 4 inches)
+    and csv tables, in file name order."""
+    from pptx.util import Inches
+    artifacts = []
+    for f in sorted(os.listdir(path)):
+        file = os.path.join(path, f)
+        if f.endswith('heatmap.png'):
+            artifacts.append(dict(kind = 'image', file = file, title = '', box = (5.8, 4.), stretch = True))
+        elif f.endswith('.png'):
+            artifacts.append(dict(kind = 'image', file = file, title = f, box = (None, 6.), stretch = False))
+        elif f.endswith('.csv'):
+            artifacts.append(dict(kind = 'table', table = file, title = f, height = int(Inches(0.3))))
+    return artifacts
+
+# Cell
+
+def df_to_table(df, slide, left, top, width, height):
+    """Converts a Pandas DataFrame to a PowerPoint table on the given slide of a PowerPoint presentation.
+    The table is a standard Powerpoint table, and can easily be modified with the Powerpoint tools (resizing columns, changing formatting etc).
+    All cells are written in one block of XML (see `_table_rows`), not one python-pptx call per cell.
+    Source:  https://github.com/robintw/PandasToPowerpoint/blob/master/PandasToPowerpoint.py
+     """
+    return _add_table(slide, _table_rows(df, int(height)), df.shape[1], left, top, width, height)
+
+# Cell
+@instrument(catch = False)
+def create_presentation(path, artifacts = None, dpi = 150, n_jobs = 1):
+    """Creates ppt report from files in the specified folder, or from an explicit ordered list of artifacts
+    (image files, csv files or DataFrames, see `simplydrug.report.ReportBuilder`). Images are downsampled to dpi at their size on the slide.
+    Returns the presentation, save it with `.save(file)`."""
+    return ReportBuilder(dpi = dpi).extend(folder_artifacts(path) if artifacts is None else artifacts).build(n_jobs)
@@ -0,0 +1,240 @@
+__all__ = ['group_moments', 'merge_moments', 'QuantileSketch', 'ScreenStats', 'median_polish', 'bscore']
+
+# Cell
+import warnings
+import numpy as np
+import pandas as pd
+
+# Cell
+def group_moments(values, codes, n_groups):
+    """Count, mean and M2 (sum of squared deviations from the mean) of values for every group in one vectorized pass.
+    codes are the group numbers (0 .. n_groups-1) of the values; NaN values are ignored as in pandas."""
+    values, codes = np.asarray(values, dtype = float), np.asarray(codes)
+    ok = ~np.isnan(values)
+    values, codes = values[ok], codes[ok]
+    count = np.bincount(codes, minlength = n_groups).astype(float)
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        mean = np.bincount(codes, weights = values, minlength = n_groups)/count
+    m2 = np.bincount(codes, weights = (values - mean[codes])**2, minlength = n_groups)
+    return count, mean, m2
+
+def merge_moments(a, b):
+    """Merges two (count, mean, M2) tuples of the same groups, as computed from two batches of data (Chan et al. parallel Welford update).
+    The result is the (count, mean, M2) of the combined data, without going back to the data."""
+    n_a, mean_a, m2_a = (np.asarray(x, dtype = float) for x in a)
+    n_b, mean_b, m2_b = (np.asarray(x, dtype = float) for x in b)
+    n = n_a + n_b
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        delta = np.where(n_b > 0, mean_b, 0.) - np.where(n_a > 0, mean_a, 0.)
+        mean = np.where(n_a > 0, mean_a, 0.) + delta*np.where(n > 0, n_b/n, 0.)
+        m2 = m2_a + m2_b + np.where(n > 0, delta**2*n_a*n_b/n, 0.)
+    return n, np.where(n > 0, mean, np.nan), m2
+
+# Cell
+class QuantileSketch:
+    """Mergeable quantile sketch: a weighted sample of at most max_size centroids summarizing a stream of values.
+    Quantiles are exact as long as fewer than 2*max_size values were added, otherwise neighbouring sorted values are merged
+    into max_size centroids of equal weight, and quantiles are approximated within about 1/max_size in rank."""
+    def __init__(self, max_size = 4096):
+        self.max_size = max_size
+        self.values, self.weights = np.zeros(0), np.zeros(0)
+
+    def __len__(self):
+        return int(self.weights.sum())
+
+    def update(self, values, weights = None):
+        values = np.asarray(values, dtype = float).reshape(-1)
+        weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype = float).reshape(-1)
+        ok = ~np.isnan(values)
+        self.values = np.concatenate([self.values, values[ok]])
+        self.weights = np.concatenate([self.weights, weights[ok]])
+        if len(self.values) > 2*self.max_size:
+            self._compress()
+        return self
+
+    def merge(self, other):
+        """Adds the values summarized by another sketch."""
+        return self.update(other.values, other.weights)
+
+    def _compress(self):
+        order = np.argsort(self.values, kind = 'mergesort')
+        values, weights = self.values[order], self.weights[order]
+        cum = np.cumsum(weights) - weights
+        bins = np.minimum((cum/weights.sum()*self.max_size).astype(int), self.max_size - 1)
+        w = np.bincount(bins, weights = weights, minlength = self.max_size)
+        v = np.bincount(bins, weights = values*weights, minlength = self.max_size)
+        keep = w > 0
+        self.values, self.weights = v[keep]/w[keep], w[keep]
+
+    @staticmethod
+    def _weighted_quantile(values, weights, q):
+        if not len(values):
+            return np.full(np.shape(q), np.nan)
+        order = np.argsort(values, kind = 'mergesort')
+        values, weights = values[order], weights[order]
+        pos = (np.cumsum(weights) - weights/2)/weights.sum() # midpoint rule: the median of an even sample is the mean of the two middle values
+        return np.interp(q, pos, values)
+
+    def quantile(self, q):
+        return self._weighted_quantile(self.values, self.weights, q)
+
+    def median(self):
+        return float(self.quantile(0.5))
+
+    def mad(self):
+        """Median absolute deviation from the median (unscaled)."""
+        return float(self._weighted_quantile(np.abs(self.values - self.median()), self.weights, 0.5))
+
+# Cell
+_MAD_SCALE = 1.4826 # MAD of a normal distribution is 0.6745 sigma
+
+class ScreenStats:
+    """Campaign-wide statistics of a feature, accumulated plate by plate without keeping the plates in memory.
+    For every Status ('Sample', 'Positive', 'Negative', ...; 'Reference' wells are excluded as in `run_statistics`) it keeps
+    the count, mean and M2 (merged Welford-style) and a QuantileSketch for the median and MAD.
+    Add plates with `update`, combine accumulators from different workers with `merge`.
+    `summary` and `plate_summary` give campaign and plate-level tables with the columns of `run_statistics`
+    plus median, MAD, Z_factor and SB, `z_score` and `robust_z` normalize a plate against the campaign (or its own plate) statistics."""
+    def __init__(self, feature, sketch_size = 4096):
+        self.feature, self.sketch_size = feature, sketch_size
+        self.statuses, self.sizes, self.moments, self.sketches = [], np.zeros(0), (np.zeros(0), np.zeros(0), np.zeros(0)), []
+        self.plates = {}
+
+    def _align(self, statuses):
+        """Adds unseen statuses to the campaign groups, returns the campaign group number of each status."""
+        for status in statuses:
+            if status not in self.statuses:
+                self.statuses.append(status)
+                self.sizes = np.append(self.sizes, 0.)
+                self.moments = tuple(np.append(m, v) for m, v in zip(self.moments, (0., np.nan, 0.)))
+                self.sketches.append(QuantileSketch(self.sketch_size))
+        return np.array([self.statuses.index(status) for status in statuses], dtype = int)
+
+    def _add(self, statuses, sizes, moments, sketches):
+        """Merges the counts, moments and sketches of a batch of status groups into the campaign groups."""
+        idx = self._align(statuses)
+        self.sizes = self.sizes + np.bincount(idx, weights = sizes, minlength = len(self.statuses))
+        expanded = tuple(np.bincount(idx, weights = np.nan_to_num(m), minlength = len(self.statuses)) for m in moments)
+        present = np.bincount(idx, minlength = len(self.statuses)) > 0
+        expanded = (expanded[0], np.where(present, expanded[1], np.nan), expanded[2])
+        self.moments = merge_moments(self.moments, expanded)
+        for i, sketch in zip(idx, sketches):
+            self.sketches[i].merge(sketch)
+
+    def update(self, df, plate = None):
+        """Adds the wells of one plate (columns 'Status' and the feature). plate names the plate in `plate_summary`
+        (its position in the stream by default, so name the plates of accumulators that will be merged).
+        Raises ValueError for a plate that was already added."""
+        plate = len(self.plates) if plate is None else plate
+        if plate in self.plates:
+            raise ValueError(f'ScreenStats: plate {plate!r} was already added')
+        df = df[df.Status.notna() & (df.Status != 'Reference')]
+        codes, statuses = pd.factorize(df.Status)
+        values = df[self.feature].values.astype(float)
+        moments = group_moments(values, codes, len(statuses))
+        order = np.argsort(codes, kind = 'mergesort')
+        groups = np.split(values[order], np.cumsum(np.bincount(codes, minlength = len(statuses)))[:-1])
+        sketches = [QuantileSketch(self.sketch_size).update(g) for g in groups]
+        sizes = np.bincount(codes, minlength = len(statuses)).astype(float) # wells, NaN values included as in `run_statistics`
+        self._add(list(statuses), sizes, moments, sketches)
+        # only the plate's summary is kept, the values go to the campaign sketches
+        self.plates[plate] = (list(statuses), sizes, moments, [s.median() for s in sketches], [s.mad() for s in sketches])
+        return self
+
+    def merge(self, other):
+        """Adds the plates accumulated by another ScreenStats of the same feature.
+        Raises ValueError if both hold plates of the same name, e.g. unnamed plates numbered from 0 in both."""
+        shared = [plate for plate in other.plates if plate in self.plates]
+        if shared:
+            raise ValueError(f'ScreenStats: cannot merge, plates {shared} are in both accumulators; name the plates in `update`')
+        self.plates.update(other.plates)
+        self._add(other.statuses, other.sizes, other.moments, other.sketches)
+        return self
+
+    def _campaign(self):
+        return self.statuses, self.sizes, self.moments, [s.median() for s in self.sketches], [s.mad() for s in self.sketches]
+
+    def _table(self, statuses, sizes, moments, medians, mads):
+        count, mean, m2 = moments
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            var = np.where(count > 1, m2/(count - 1), np.nan)
+        st = pd.DataFrame({'Feature': self.feature, 'Status': statuses, 'size': sizes.astype(int), 'mean': mean,
+                           'std': np.sqrt(var), 'var': var,
+                           'median': medians, 'MAD': mads})
+        st = st.sort_values('Status', kind = 'mergesort').reset_index(drop = True)
+        if {'Positive', 'Negative'} <= set(statuses):
+            pos, neg = st.set_index('Status').loc['Positive'], st.set_index('Status').loc['Negative']
+            st['Z_factor'] = 1 - 3*(pos['std'] + neg['std'])/abs(pos['mean'] - neg['mean'])
+            st['SB'] = pos['mean']/neg['mean']
+        return st
+
+    def summary(self):
+        """Campaign-level statistics, one row per Status."""
+        return self._table(*self._campaign())
+
+    def plate_summary(self):
+        """Plate-level statistics, one row per plate and Status."""
+        tables = [self._table(*self.plates[plate]).assign(Plate = plate) for plate in self.plates]
+        if not tables:
+            return pd.DataFrame()
+        st = pd.concat(tables, ignore_index = True)
+        return st[['Plate'] + [c for c in st.columns if c != 'Plate']]
+
+    def _center_scale(self, plate, status, robust):
+        statuses, _, moments, medians, mads = self._campaign() if plate is None else self.plates[plate]
+        if status not in statuses:
+            raise KeyError(f'ScreenStats: no {status} wells' + ('' if plate is None else f' on plate {plate}'))
+        i = list(statuses).index(status)
+        if robust:
+            return medians[i], _MAD_SCALE*mads[i]
+        count, mean, m2 = moments
+        return mean[i], np.sqrt(m2[i]/(count[i] - 1))
+
+    def z_score(self, df, plate = None, status = 'Sample'):
+        """(x - mean)/std of the feature, mean and std of the status wells of the campaign, or of plate if given."""
+        center, scale = self._center_scale(plate, status, robust = False)
+        return (df[self.feature] - center)/scale
+
+    def robust_z(self, df, plate = None, status = 'Sample'):
+        """Robust Z-score (x - median)/(1.4826*MAD) of the feature, median and MAD of the status wells of the campaign, or of plate if given."""
+        center, scale = self._center_scale(plate, status, robust = True)
+        return (df[self.feature] - center)/scale
+
+# Cell
+def median_polish(stack, mask = None, max_iter = 10, tol = 1e-6):
+    """Tukey's median polish of every plate of a stacked (plates x rows x cols) array, all plates in the same vectorized iterations.
+    Only wells where mask is True (e.g. samples, so controls do not bias the effects) and not NaN are used to estimate the effects.
+    Returns the plate (overall), row and column effects, with shapes (plates, ), (plates, rows) and (plates, cols),
+    and the residuals x - overall - row - col of all wells, masked or not."""
+    x = np.asarray(stack, dtype = float)
+    n_plates, n_rows, n_cols = x.shape
+    resid = x.copy() if mask is None else np.where(mask, x, np.nan)
+    overall, row, col = np.zeros(n_plates), np.zeros((n_plates, n_rows)), np.zeros((n_plates, n_cols))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning) # all-NaN rows and columns get no effect
+        for i in range(max_iter):
+            r = np.nan_to_num(np.nanmedian(resid, axis = 2))
+            resid -= r[:, :, None]
+            row += r
+            c = np.nan_to_num(np.nanmedian(resid, axis = 1))
+            resid -= c[:, None, :]
+            col += c
+            for effect in (row, col): # keep the row and column effects centered on 0
+                m = np.nanmedian(effect, axis = 1)
+                effect -= m[:, None]
+                overall += m
+            if max(np.abs(r).max(initial = 0), np.abs(c).max(initial = 0)) < tol:
+                break
+    return overall, row, col, x - overall[:, None, None] - row[:, :, None] - col[:, None, :]
+
+def bscore(stack, mask = None, max_iter = 10):
+    """B-scores of a stacked (plates x rows x cols) array: median polish residuals of every plate divided by
+    1.4826 times the MAD of that plate's residuals (Brideau et al. 2003). Effects and MADs are estimated on the wells
+    where mask is True only, all wells are scored."""
+    mask = np.ones(np.shape(stack), dtype = bool) if mask is None else np.asarray(mask, dtype = bool)
+    resid = median_polish(stack, mask, max_iter)[3]
+    fit = np.where(mask, resid, np.nan).reshape(len(resid), -1)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mad = np.nanmedian(np.abs(fit - np.nanmedian(fit, axis = 1)[:, None]), axis = 1)
+    return resid/(_MAD_SCALE*mad)[:, None, None]
@@ -0,0 +1,112 @@
+__all__ = ['synthetic_layout', 'write_layout', 'synthetic_library', 'synthetic_kinetics', 'synthetic_readout',
+           'synthetic_dose_response', 'write_synthetic_screen']
+
+# Cell
+import os
+import numpy as np
+import pandas as pd
+from .layout import PlateLayout, plate_geometry
+
+# Cell
+def synthetic_layout(n_wells = 384, n_control_cols = 2):
+    """PlateLayout of a 96, 384 or 1536-well screening plate: 'Negative' controls in the first n_control_cols columns,
+    'Positive' controls in the last n_control_cols columns and 'Sample' wells in between, like the yeast screen layout."""
+    geometry = plate_geometry(n_wells)
+    col = np.tile(np.arange(geometry.n_cols), geometry.n_rows)
+    status = np.where(col < n_control_cols, 'Negative', np.where(col >= geometry.n_cols - n_control_cols, 'Positive', 'Sample'))
+    return PlateLayout({'Well': geometry.wells.copy(), 'Status': status.astype(object)})
+
+def write_layout(layout, layout_path):
+    """Writes a PlateLayout as a layout excel file, one sheet per column laid out as the plate with column numbers as header,
+    the format read by `load_layout` and `add_layout`. Returns layout_path."""
+    geometry = plate_geometry(len(layout))
+    with pd.ExcelWriter(layout_path) as writer:
+        for sheet in layout.sheets:
+            grid = pd.DataFrame(np.asarray(layout[sheet], dtype = object).reshape(geometry.shape), columns = geometry.cols)
+            grid.to_excel(writer, sheet_name = sheet, index = False)
+    return layout_path
+
+# Cell
+def synthetic_library(plates, layout, seed = 0):
+    """Chemical library with one compound per 'Sample' well of every plate: columns 'Plate', 'Well', 'Compound_id' and 'SMILES',
+    as in the library csv files passed to `add_layout`."""
+    rng = np.random.default_rng(seed)
+    wells = np.asarray(layout['Well'])[np.asarray(layout['Status']) == 'Sample']
+    plate_col = np.repeat(np.asarray(plates, dtype = object), len(wells))
+    ids = np.char.add('cpd_', np.arange(len(plate_col)).astype(str)).astype(object)
+    atoms = np.array(['C', 'CC', 'CO', 'CN', 'c1ccccc1', 'C(=O)O', 'Cl', 'N'], dtype = object)
+    smiles = [''.join(parts) for parts in atoms[rng.integers(0, len(atoms), (len(plate_col), 4))]]
+    return pd.DataFrame({'Plate': plate_col, 'Well': np.tile(wells, len(plates)), 'Compound_id': ids, 'SMILES': smiles})
+
+# Cell
+def synthetic_kinetics(layout, n_times = 24, hit_rate = 0.02, noise = 0.005, seed = 0):
+    """Plate reader kinetic reading of a growth assay, in the wide format of the plate reader csv files:
+    one column per well and an hourly 'Time' column. Curves are logistic growth curves:
+    'Negative' controls grow, 'Positive' controls barely grow, samples are inhibited to a random degree and
+    a hit_rate fraction of the samples grows like the negative controls."""
+    rng = np.random.default_rng(seed)
+    wells, status = np.asarray(layout['Well']), np.asarray(layout['Status'])
+    times = np.arange(1, n_times + 1)
+    growth = np.where(status == 'Negative', 1., np.where(status == 'Positive', 0.05, rng.uniform(0.1, 0.5, len(wells))))
+    growth[(status == 'Sample') & (rng.random(len(wells)) < hit_rate)] = 1.
+    capacity = 0.1 + 1.2*growth*rng.normal(1, 0.05, len(wells))
+    midpoint = rng.normal(n_times*0.45, n_times*0.05, len(wells))
+    od = 0.1 + (capacity - 0.1)[:, None]/(1 + np.exp(-(times[None, :] - midpoint[:, None])/(n_times*0.08)))
+    od += rng.normal(0, noise, od.shape)
+    reading = pd.DataFrame(od.T, columns = wells)
+    reading['Time'] = times
+    return reading
+
+def synthetic_readout(plates, layout, features = ('Signal', ), hit_rate = 0.02, edge_effect = 0.1, seed = 0):
+    """Single-read screening data in long format: one row per plate and well with 'Plate', 'Well', 'Status' and the features.
+    Controls are shifted by +/- 5 standard deviations, hits by +4, and every plate gets a row and column gradient
+    (edge_effect in standard deviations per plate width) as seen with evaporation, for B-score normalization."""
+    rng = np.random.default_rng(seed)
+    geometry = plate_geometry(len(layout))
+    wells, status = np.asarray(layout['Well']), np.asarray(layout['Status'])
+    row, col = geometry.row_col(wells)
+    n_plates, n_wells = len(plates), len(wells)
+    frame = {'Plate': np.repeat(np.asarray(plates, dtype = object), n_wells), 'Well': np.tile(wells, n_plates),
+             'Status': np.tile(status, n_plates)}
+    shift = np.where(status == 'Negative', -5., np.where(status == 'Positive', 5., 0.))
+    for f in features:
+        values = rng.normal(0, 1, (n_plates, n_wells)) + shift
+        values[(np.tile(status, (n_plates, 1)) == 'Sample') & (rng.random((n_plates, n_wells)) < hit_rate)] += 4
+        values += edge_effect*rng.normal(1, 0.2, (n_plates, 1))*(row/geometry.n_rows + col/geometry.n_cols)*geometry.n_cols/12
+        frame[f] = 100 + 10*values.reshape(-1)
+    return pd.DataFrame(frame)
+
+# Cell
+def synthetic_dose_response(n_compounds = 20, n_doses = 8, n_replicates = 3, max_dose = 100., noise = 5., seed = 0):
+    """Dose-response series of n_compounds compounds: 'Compound_id', 'Dose' (um, serial 2-fold dilutions from max_dose),
+    'Response' drawn from LL.4 curves with random hill slopes, plateaus and EC50s plus gaussian noise,
+    and a 'Viability' column for `plot_dr_viability`."""
+    from .simplydrug import ll4
+    rng = np.random.default_rng(seed)
+    doses = max_dose/2.**np.arange(n_doses)
+    b = rng.uniform(-3, -0.5, n_compounds)
+    c = rng.uniform(0, 20, n_compounds)
+    d = rng.uniform(80, 120, n_compounds)
+    e = np.exp(rng.uniform(np.log(doses.min()), np.log(doses.max()), n_compounds))
+    dose = np.tile(np.repeat(doses, n_replicates), n_compounds)
+    k = np.repeat(np.arange(n_compounds), n_doses*n_replicates)
+    response = ll4(dose, b[k], c[k], d[k], e[k]) + rng.normal(0, noise, len(dose))
+    viability = 100 - 40*dose/(dose + e[k]) + rng.normal(0, noise, len(dose))
+    ids = np.char.add('cpd_', np.arange(n_compounds).astype(str)).astype(object)
+    return pd.DataFrame({'Compound_id': ids[k], 'Dose': dose, 'Response': response, 'Viability': viability})
+
+# Cell
+def write_synthetic_screen(path, n_plates = 4, n_wells = 384, n_times = 24, hit_rate = 0.02, seed = 0):
+    """Writes a synthetic growth screen to path: a layout excel file, a chemical library csv and one kinetic reading csv per plate.
+    Returns a dict with the keyword arguments of `run_campaign`: readings, chem_plates, layout_path and chem_path."""
+    os.makedirs(path, exist_ok = True)
+    layout = synthetic_layout(n_wells)
+    plates = [f'plate_{i + 1}' for i in range(n_plates)]
+    layout_path = write_layout(layout, os.path.join(path, f'layout_{n_wells}.xlsx'))
+    chem_path = os.path.join(path, 'library.csv')
+    synthetic_library(plates, layout, seed).to_csv(chem_path, index = False)
+    readings = []
+    for i, plate in enumerate(plates):
+        readings.append(os.path.join(path, plate + '.csv'))
+        synthetic_kinetics(layout, n_times, hit_rate, seed = seed + i + 1).assign(Plate = plate).to_csv(readings[-1], index = False)
+    return {'readings': readings, 'chem_plates': plates, 'layout_path': layout_path, 'chem_path': chem_path}
@@ -0,0 +1,24 @@
+import os
+import pandas as pd
+from simplydrug import run_campaign, growth_plate_pipeline, write_synthetic_screen
+
+def test_campaign_matches_serial_plates(tmp_path):
+    screen = write_synthetic_screen(str(tmp_path/'screen'), n_plates = 3, n_wells = 96, n_times = 12, hit_rate = 0.1)
+    results, timings = run_campaign(**screen, path = str(tmp_path/'campaign'), n_jobs = 2, plots = False, report = False)
+    expected = []
+    for reading, plate in zip(screen['readings'], screen['chem_plates']):
+        os.makedirs(tmp_path/'serial'/plate)
+        expected.append(growth_plate_pipeline(reading, screen['layout_path'], screen['chem_path'], plate, str(tmp_path/'serial'/plate), plate,
+                                              plots = False, report = False))
+    pd.testing.assert_frame_equal(results, pd.concat(expected, ignore_index = True))
+    assert (results.Result == 'Hit').any()
+    assert list(timings.Plate) == screen['chem_plates'] and (timings.error == '').all()
+    for plate in screen['chem_plates']:
+        assert os.path.exists(tmp_path/'campaign'/plate/f'{plate}_results.csv')
+
+def test_campaign_failed_plate(tmp_path):
+    screen = write_synthetic_screen(str(tmp_path/'screen'), n_plates = 2, n_wells = 96, n_times = 12)
+    screen['readings'][0] = str(tmp_path/'missing.csv')
+    results, timings = run_campaign(**screen, path = str(tmp_path/'campaign'), n_jobs = 1, plots = False, report = False)
+    assert list(results.Plate.unique()) == ['plate_2']
+    assert timings.error[0] != '' and timings.error[1] == ''
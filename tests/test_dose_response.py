@@ -0,0 +1,114 @@
+import os
+import warnings
+import numpy as np
+import pandas as pd
+from scipy import optimize as opt
+from simplydrug import (ll4, stack_curves, fit_ll4_batch, ll4_covariance, fit_dr, synthetic_dose_response, fit_polynomials,
+                        fit_polynomial_batch)
+
+DATA = os.path.join(os.path.dirname(__file__), '..', 'hts_notebooks', 'test_data')
+
+def multiple_dr():
+    return pd.read_csv(os.path.join(DATA, 'multiple_dr.csv')).rename(columns = {'Compound': 'Compound_id'})
+
+def dose_means(df):
+    """Per-dose mean responses, as the original run_dr fitted them."""
+    df = df[['Compound_id', 'Dose', 'Response']]
+    return df[(df != 0).all(axis = 1)].groupby(['Compound_id', 'Dose'], as_index = False).mean()
+
+def curve_fit_params(df, cov = False):
+    """Parameters (and covariances) of the original one curve at a time fits, None where curve_fit gives up."""
+    params = {}
+    for name, group in df.groupby('Compound_id'):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            try:
+                fit = opt.curve_fit(ll4, group.Dose, group.Response, method = 'lm')
+                params[name] = fit if cov else fit[0]
+            except RuntimeError:
+                params[name] = None
+    return params
+
+def test_batch_matches_curve_fit():
+    # multiple_dr.csv has a single response drop at the highest dose, its minimum and EC50 are pinned in test_fit_dr_ec50
+    for df, identified in ((dose_means(multiple_dr()), False), (dose_means(synthetic_dose_response(20)), True)):
+        names, x, y, mask = stack_curves(df)
+        fit = fit_ll4_batch(x, y, mask)
+        expected = curve_fit_params(df)
+        compared = 0
+        for i, name in enumerate(names):
+            if expected[name] is None or not fit['converged'][i]:
+                continue
+            residuals = np.sum((y[i][mask[i]] - ll4(x[i][mask[i]], *expected[name]))**2)
+            assert fit['residuals'][i] <= residuals*(1 + 1e-6), name
+            if identified and x[i][mask[i]].min() < expected[name][3] < x[i][mask[i]].max(): # EC50 within the doses
+                np.testing.assert_allclose(fit['params'][i], expected[name], rtol = 1e-3, err_msg = name)
+            compared += 1
+        assert compared >= len(names) - 1
+
+def test_batch_fails_where_curve_fit_fails():
+    df = dose_means(synthetic_dose_response(20))
+    names, x, y, mask = stack_curves(df)
+    fit = fit_ll4_batch(x, y, mask)
+    failed = [name for name, p in curve_fit_params(df).items() if p is None]
+    assert failed
+    assert not fit['converged'][np.isin(names, failed)].any()
+
+def test_batch_status():
+    x = np.array([[1., 2., 4., 8., 16.], [1., 2., 4., 8., 16.]])
+    y = np.array([[100., 90., 50., 10., 0.], [100., 90., 50., 0., 0.]])
+    mask = np.array([[True]*5, [True, True, True, False, False]])
+    fit = fit_ll4_batch(x, y, mask, p0 = 'self_start')
+    assert list(fit['status']) == ['converged', 'too_few_points']
+    assert list(fit['N']) == [5, 3]
+
+def test_fit_dr_ec50():
+    # values of the original curve_fit fits in run_dr
+    fit = fit_dr(multiple_dr())['fit'].set_index('Compound_id')
+    np.testing.assert_allclose(fit.loc[['Compound_1', 'Compound_2'], 'EC50'], [42.79, 46.67], rtol = 0.01)
+    np.testing.assert_allclose(fit.loc[['Compound_1', 'Compound_2'], 'min response'], [-48.94, -63.72], rtol = 0.03)
+
+def test_covariance_matches_curve_fit():
+    df = dose_means(synthetic_dose_response(20))
+    names, x, y, mask = stack_curves(df)
+    fit = fit_ll4_batch(x, y, mask)
+    cov = ll4_covariance(x, y, mask, fit['params'])
+    for i, (name, expected) in enumerate(curve_fit_params(df, cov = True).items()):
+        if expected is not None and x[i][mask[i]].min() < expected[0][3] < x[i][mask[i]].max():
+            np.testing.assert_allclose(np.sqrt(np.diag(cov[i])), np.sqrt(np.diag(expected[1])), rtol = 1e-2, err_msg = name)
+
+def test_covariance_ill_conditioned():
+    names, x, y, mask = stack_curves(dose_means(multiple_dr()))
+    fit = fit_ll4_batch(x, y, mask)
+    assert np.all(np.isfinite(ll4_covariance(x, y, mask, fit['params'])))
+    # c = d makes the hill slope and EC50 columns of the Jacobian zero
+    flat = np.array([[1., 50., 50., 10.]]*len(names))
+    assert np.all(np.isnan(ll4_covariance(x, y, mask, flat)))
+
+def test_bootstrap_intervals():
+    fit = fit_dr(synthetic_dose_response(5), uncertainty = 'bootstrap', n_boot = 50)['fit']
+    assert (fit.n_boot > 40).all()
+    assert ((fit['EC50 boot low'] <= fit.EC50) & (fit.EC50 <= fit['EC50 boot high'])).all()
+
+def test_self_start_physical_bounds():
+    df = synthetic_dose_response(500, noise = 8.)
+    default = fit_dr(df)['status']
+    status = fit_dr(df, p0 = 'self_start', bounds = 'physical')['status']
+    assert (~status.converged).mean() <= 0.01 < (~default.converged).mean()
+    assert status.n_iter.mean() < 0.5*default.n_iter.mean()
+
+def test_polynomials_match_polyfit():
+    df = synthetic_dose_response(20).assign(logDose = lambda d: -np.log10(1e-6*d.Dose))
+    df = df[~((df.Compound_id == 'cpd_3') & (df.Dose < 5))] # a shorter curve
+    fits = fit_polynomials(df, degree = 2).set_index('Compound_id')
+    for name, group in df.groupby('Compound_id'):
+        coef = np.polyfit(group.logDose, group.Response, 2)
+        np.testing.assert_allclose(fits.loc[name, ['p0', 'p1', 'p2']].values.astype(float), coef, rtol = 1e-6, err_msg = name)
+        rmse = np.sqrt(np.mean((group.Response - np.polyval(coef, group.logDose))**2))
+        np.testing.assert_allclose(fits.loc[name, 'rmse'], rmse, rtol = 1e-6)
+        assert fits.loc[name, 'N'] == len(group)
+
+def test_polynomial_batch_too_few_points():
+    coef, r2, rmse = fit_polynomial_batch([[1., 2., 3.], [1., 2., 3.]], [[1., 4., 9.], [1., 2., 0.]], [[True]*3, [True, True, False]])
+    np.testing.assert_allclose(coef[0], [1., 0., 0.], atol = 1e-10)
+    assert np.isnan(coef[1]).all() and np.isnan(rmse[1])
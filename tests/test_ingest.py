@@ -0,0 +1,44 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from simplydrug import read_plate, read_plates, clear_plate_cache, synthetic_kinetics, synthetic_layout
+from simplydrug import ingest
+
+def write_reading(path, seed = 0):
+    synthetic_kinetics(synthetic_layout(96), n_times = 6, seed = seed).assign(Plate = 'P1').to_csv(path, index = False)
+    return str(path)
+
+def cache_entries(tmp_path):
+    folder = tmp_path/'.simplydrug'
+    return sorted(os.listdir(folder)) if folder.exists() else []
+
+def test_cache_hit(tmp_path, monkeypatch):
+    path = write_reading(tmp_path/'plate.csv')
+    parsed = read_plate(path)
+    assert len(cache_entries(tmp_path)) == 1
+    assert parsed.Plate.dtype == object and parsed.A1.dtype == np.float64
+    monkeypatch.setattr(ingest, '_parse', lambda *args: pytest.fail('parsed again'))
+    pd.testing.assert_frame_equal(read_plate(path), parsed)
+    pd.testing.assert_frame_equal(read_plates([path, path], n_jobs = 1)[1], parsed)
+    long = read_plate(path, long = True)
+    assert list(long.columns[:3]) == ['Well', 'Time', 'OD'] and len(long) == 96*6
+
+def test_changed_file_invalidates(tmp_path):
+    path = write_reading(tmp_path/'plate.csv')
+    first = read_plate(path)
+    st = os.stat(path)
+    write_reading(tmp_path/'plate.csv', seed = 1)
+    os.utime(path, ns = (st.st_atime_ns, st.st_mtime_ns + 10**9)) # a new modification time even on coarse file systems
+    second = read_plate(path)
+    assert not np.allclose(first.A1, second.A1)
+    pd.testing.assert_frame_equal(second, read_plate(path, cache = False))
+    assert len(cache_entries(tmp_path)) == 1 # the entry of the old content is removed
+
+def test_options_keyed_and_cleared(tmp_path):
+    path = write_reading(tmp_path/'plate.csv')
+    read_plate(path)
+    assert read_plate(path, value_dtype = 'float32').A1.dtype == np.float32
+    assert len(cache_entries(tmp_path)) == 1 # one entry per source file
+    read_plate(path, cache = False)
+    assert clear_plate_cache(path) == 1 and cache_entries(tmp_path) == []
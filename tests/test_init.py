@@ -0,0 +1,27 @@
+import os
+import sys
+import types
+import subprocess
+import importlib
+import simplydrug
+
+def test_all_lists_public_names_only():
+    assert len(simplydrug.__all__) == len(set(simplydrug.__all__))
+    assert not [name for name in simplydrug.__all__ if isinstance(getattr(simplydrug, name), types.ModuleType)]
+    for module in ('plotting', 'render', 'report'):
+        assert simplydrug._LAZY[module] == importlib.import_module(f'simplydrug.{module}').__all__
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _fresh(code):
+    """Output of code run in a new interpreter, with simplydrug imported from this source tree."""
+    return subprocess.run([sys.executable, '-c', code], capture_output = True, text = True, check = True, cwd = ROOT).stdout.split()
+
+def test_headless_import():
+    code = ('import sys, logging, simplydrug; '
+            'print(sorted({m.split(".")[0] for m in sys.modules} & {"matplotlib", "seaborn", "pptx", "PIL"}), logging.getLogger().handlers)')
+    assert _fresh(code) == ['[]', '[]']
+
+def test_lazy_names_load_on_use():
+    code = 'import sys, simplydrug; simplydrug.heatmap_plate; print("seaborn" in sys.modules, "simplydrug.report" in sys.modules)'
+    assert _fresh(code) == ['True', 'False']
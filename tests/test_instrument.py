@@ -0,0 +1,18 @@
+import tracemalloc
+from simplydrug import enable_instrumentation, disable_instrumentation
+
+def test_caller_tracing_keeps_running():
+    tracemalloc.start()
+    try:
+        enable_instrumentation(memory = True)
+        disable_instrumentation()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+def test_own_tracing_is_stopped():
+    assert not tracemalloc.is_tracing()
+    enable_instrumentation(memory = True)
+    assert tracemalloc.is_tracing()
+    disable_instrumentation()
+    assert not tracemalloc.is_tracing()
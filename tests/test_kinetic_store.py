@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+from simplydrug import KineticStore, synthetic_layout, synthetic_kinetics
+
+def reading():
+    return synthetic_kinetics(synthetic_layout(96), n_times = 12)
+
+def test_plate_round_trip(tmp_path):
+    df = reading()
+    store = KineticStore(str(tmp_path))
+    store.add_plate('P1', df.sample(frac = 1, random_state = 0)) # unsorted timepoints are stored in time order
+    expected = df[['Time'] + list(df.columns[:-1])]
+    pd.testing.assert_frame_equal(KineticStore(str(tmp_path))['P1'].to_wide(), expected, check_names = False)
+
+def test_select(tmp_path):
+    df = reading()
+    plate = KineticStore(str(tmp_path)).add_plate('P1', df)
+    wells, times, reads = plate.select(['C3', 'A2', 'B1'], time_window = (3, 7))
+    assert list(wells) == ['A2', 'B1', 'C3'] # file order
+    assert list(times) == [3, 4, 5, 6, 7] # both ends included
+    np.testing.assert_array_equal(reads, df.set_index('Time').loc[3:7, ['A2', 'B1', 'C3']].values.T)
+    wells, times, reads = plate.select(time_window = (7.5, 100))
+    assert len(wells) == 96 and list(times) == [8, 9, 10, 11, 12]
+    with pytest.raises(KeyError):
+        plate.select(['A1', 'Z1'])
+
+def test_to_frame_sorted(tmp_path):
+    plate = KineticStore(str(tmp_path)).add_plate('P1', reading())
+    long = plate.to_frame(['B1', 'A10', 'A2'])
+    assert list(long.Well.unique()) == ['A10', 'A2', 'B1'] # sorted by name, as groupby('Well')
+    assert len(long) == 3*12
+
+def test_open_plates_survive_rewrite(tmp_path):
+    store = KineticStore(str(tmp_path))
+    old = store.add_array('P1', ['A1', 'A2'], [0, 60, 120], np.arange(6.).reshape(2, 3))
+    new = store.add_array('P1', ['A1', 'A2', 'A3'], [0, 60], np.ones((3, 2)))
+    np.testing.assert_array_equal(old.select()[2], np.arange(6.).reshape(2, 3))
+    np.testing.assert_array_equal(new.select()[2], np.ones((3, 2)))
+    reopened = KineticStore(str(tmp_path))
+    assert reopened.plates == ['P1'] and reopened['P1'].shape == (3, 2)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['index.pkl', 'plate_00001.npy', 'plate_00001_time.npy']
@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+from simplydrug import initial_rates
+
+def reads(*wells):
+    times = [f'{60*i}s' for i in range(len(wells[0]))]
+    return pd.DataFrame(np.array(wells), columns = times).assign(Well = [f'A{i + 1}' for i in range(len(wells))])
+
+def test_auto_stops_at_first_failing_fit():
+    y = np.arange(20.)
+    y[4] = 6.5 # the fits of the first 5 to 14 reads fall below 0.98, longer ones pass again
+    rates = initial_rates(reads(y, 2*np.arange(20.)), auto = True)
+    assert list(rates.n_points) == [4, 20]
+    assert list(rates.end_time) == [180., 1140.]
+    np.testing.assert_allclose(rates.slope, [1/60, 2/60])
+
+def test_auto_keeps_min_points():
+    rates = initial_rates(reads([0., 5., 1., 6., 2.]), auto = True)
+    assert rates.n_points[0] == 3
+
+def test_empty_window():
+    rates = initial_rates(reads(np.arange(5.)), window = (1000, 2000), auto = True)
+    assert rates.n_points[0] == 0
+    assert np.isnan(rates.slope[0]) and np.isnan(rates.end_time[0])
@@ -0,0 +1,71 @@
+import os
+import re
+import numpy as np
+import pytest
+from simplydrug import (PlateLayout, load_layout, clear_layout_cache, plate_geometry, infer_geometry, order_wells, synthetic_layout,
+                        write_layout)
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv('SIMPLYDRUG_CACHE_DIR', str(tmp_path/'cache'))
+    clear_layout_cache()
+    yield
+    clear_layout_cache()
+
+def assert_layouts_equal(layout, expected):
+    assert layout.sheets == expected.sheets
+    for sheet in expected.sheets:
+        np.testing.assert_array_equal(layout[sheet], expected[sheet])
+
+def test_disk_cache_equals_parse(tmp_path, cache, monkeypatch):
+    path = write_layout(synthetic_layout(96), str(tmp_path/'layout.xlsx'))
+    parsed = load_layout(path)
+    clear_layout_cache() # in-process cache only, the disk cache is kept
+    monkeypatch.setattr(PlateLayout, 'from_excel', classmethod(lambda cls, path: pytest.fail('parsed again')))
+    assert_layouts_equal(load_layout(path), parsed)
+    monkeypatch.undo()
+    assert_layouts_equal(load_layout(path), PlateLayout.from_excel(path))
+
+def test_changed_file_parsed_again(tmp_path, cache):
+    path = str(tmp_path/'layout.xlsx')
+    write_layout(synthetic_layout(96), path)
+    first = load_layout(path)
+    write_layout(synthetic_layout(96, n_control_cols = 1), path)
+    st = os.stat(path)
+    os.utime(path, ns = (st.st_atime_ns, st.st_mtime_ns + 10**9)) # a new modification time even on coarse file systems
+    layout = load_layout(path)
+    assert (layout['Status'] != first['Status']).any()
+    assert_layouts_equal(layout, PlateLayout.from_excel(path))
+
+@pytest.mark.parametrize('n_wells, last', [(96, 'H12'), (384, 'P24'), (1536, 'AF48')])
+def test_geometry_index(n_wells, last):
+    geometry = plate_geometry(n_wells)
+    n_rows, n_cols = geometry.shape
+    assert geometry.size == n_wells and geometry.wells[-1] == last
+    assert list(geometry.index(['A1', 'A02', 'B1', last, 'ZZ1'])) == [0, 1, n_cols, n_wells - 1, -1]
+    assert infer_geometry(geometry.wells) is geometry
+    np.testing.assert_array_equal(geometry.index(geometry.wells), np.arange(n_wells))
+
+def test_1536_rows():
+    geometry = plate_geometry(1536)
+    assert geometry.rows[24:] == ['Y', 'Z', 'AA', 'AB', 'AC', 'AD', 'AE', 'AF']
+    assert list(geometry.row_col(['Z48', 'AA1', 'AF48'])[0]) == [25, 26, 31]
+    assert infer_geometry(['A1', 'P24']) is plate_geometry(384)
+    assert infer_geometry(['A1', 'A25']) is geometry
+    with pytest.raises(ValueError):
+        infer_geometry(['A1', 'AG1'])
+
+def natural_sort(wells):
+    """order_wells of the original library."""
+    return sorted(wells, key = lambda key: [int(c) if c.isdigit() else c for c in re.split('([0-9]+)', key)])
+
+@pytest.mark.parametrize('n_wells', [96, 384])
+def test_order_wells_matches_natural_sort(n_wells):
+    wells = list(np.random.default_rng(0).permutation(plate_geometry(n_wells).wells))
+    assert order_wells(wells) == natural_sort(wells) == list(plate_geometry(n_wells).wells)
+
+def test_order_wells_1536():
+    wells = list(np.random.default_rng(0).permutation(plate_geometry(1536).wells))
+    assert order_wells(wells) == list(plate_geometry(1536).wells)
+    assert order_wells(['AA1', 'B1', 'Z48', 'A2']) == ['A2', 'B1', 'Z48', 'AA1'] # natural sort gives AA1 first
+    assert order_wells(['A10', 'blank', 'A2']) == natural_sort(['A10', 'blank', 'A2']) # not all wells
@@ -0,0 +1,64 @@
+import os
+import pickle
+import numpy as np
+import pandas as pd
+import pytest
+from simplydrug import ChemLibrary, build_library, open_library, synthetic_layout, synthetic_library
+
+def test_rebuild_replaces_store(tmp_path):
+    chem_path, store = str(tmp_path/'library.csv'), str(tmp_path/'store')
+    layout = synthetic_layout(96)
+    synthetic_library(['P1', 'P2', 'P3'], layout).to_csv(chem_path, index = False)
+    assert len(build_library(chem_path, store).plates) == 3
+    synthetic_library(['P4'], layout).to_csv(chem_path, index = False)
+    library = build_library(chem_path, store)
+    assert library.plates == ['P4']
+    assert sorted(os.listdir(store)) == sorted(os.listdir(build_library(chem_path, str(tmp_path/'fresh')).store_path))
+    assert sorted(os.listdir(tmp_path)) == ['fresh', 'library.csv', 'store']
+
+def test_refuses_other_folders(tmp_path):
+    chem_path, store = str(tmp_path/'library.csv'), tmp_path/'store'
+    synthetic_library(['P1'], synthetic_layout(96)).to_csv(chem_path, index = False)
+    store.mkdir()
+    (store/'notes.txt').write_text('keep')
+    with pytest.raises(ValueError):
+        build_library(chem_path, str(store))
+    assert os.listdir(store) == ['notes.txt']
+
+def library_csv(tmp_path):
+    chem_path = str(tmp_path/'library.csv')
+    compounds = synthetic_library(['P1', 'P2', 'P3'], synthetic_layout(96)).sample(frac = 1, random_state = 0)
+    compounds['MW'] = np.arange(len(compounds))*1.5
+    compounds['Batch'] = np.arange(len(compounds)) % 4
+    compounds.loc[compounds.index[:5], 'SMILES'] = np.nan
+    compounds.loc[compounds.index[5], 'Plate'] = np.nan # left out of the store
+    compounds.to_csv(chem_path, index = False)
+    return chem_path
+
+def test_plates_match_csv(tmp_path):
+    chem_path = library_csv(tmp_path)
+    library = build_library(chem_path, str(tmp_path/'store'))
+    compounds = pd.read_csv(chem_path, low_memory = False)
+    assert library.plates == list(compounds.Plate.dropna().unique()) and len(library) == compounds.Plate.notna().sum()
+    for plate in library.plates:
+        pd.testing.assert_frame_equal(library.plate(plate), compounds[compounds.Plate == plate])
+    assert library.plate('P9').empty and list(library.plate('P9').columns) == list(compounds.columns)
+    lookup = library.lookup('P2', ['A3', 'A1', 'H12'])
+    assert list(lookup.Well) == ['A3', 'A1', 'H12'] and lookup.Compound_id.isna().tolist() == [False, True, True] # controls have no compound
+
+def test_columns_memory_mapped(tmp_path):
+    library = build_library(library_csv(tmp_path), str(tmp_path/'store'))
+    library.plate('P1')
+    assert all(isinstance(a, np.memmap) for name, a in library._arrays.items() if name.endswith('.npy'))
+    copy = pickle.loads(pickle.dumps(library))
+    assert copy._arrays == {} and copy._plates == {}
+    pd.testing.assert_frame_equal(copy.plate('P3'), library.plate('P3'))
+
+def test_old_store_rebuilt(tmp_path):
+    chem_path, store = library_csv(tmp_path), str(tmp_path/'store')
+    os.makedirs(store)
+    with open(os.path.join(store, 'index.pkl'), 'wb') as f:
+        pickle.dump({'source': None, 'files': {}, 'counts': {}, 'columns': []}, f)
+    with pytest.raises(ValueError):
+        ChemLibrary(store)
+    assert len(open_library(chem_path, store).plates) == 3
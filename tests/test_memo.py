@@ -0,0 +1,26 @@
+import os
+import numpy as np
+from simplydrug import KineticStore, hash_inputs
+from simplydrug import memo
+
+def test_store_plates_keyed_by_file(tmp_path):
+    store = KineticStore(str(tmp_path/'store'))
+    store.add_array('P1', ['A1', 'A2'], [0, 60, 120], np.arange(6.).reshape(2, 3))
+    key, path = hash_inputs(store.plate('P1')), store.plate('P1').reads.filename
+    st = os.stat(path)
+    assert hash_inputs(store.plate('P1')) == key # same path, size and modification time: the readings are not read
+    os.utime(path, ns = (st.st_atime_ns, st.st_mtime_ns + 10**9))
+    changed = hash_inputs(store.plate('P1'))
+    assert changed != key
+    store.add_array('P1', ['A1', 'A2'], [0, 60, 120], np.ones((2, 3)))
+    assert hash_inputs(store.plate('P1')) not in (key, changed)
+
+def test_code_changes_invalidate_results(tmp_path, monkeypatch):
+    memo.enable_cache(path = str(tmp_path/'memo'))
+    try:
+        assert memo.memoized('test', (1, ), lambda: 'first') == 'first'
+        assert memo.memoized('test', (1, ), lambda: 'second') == 'first'
+        monkeypatch.setitem(memo._MEMO, 'code', 'other')
+        assert memo.memoized('test', (1, ), lambda: 'second') == 'second'
+    finally:
+        memo.disable_cache()
@@ -0,0 +1,42 @@
+import logging
+import pytest
+import pandas as pd
+from simplydrug.parallel import _map_shards, _run_logged
+
+def _task(shard):
+    def run():
+        logging.warning(f'shard {shard}')
+        if shard == 'bad':
+            raise ValueError(shard)
+        return shard
+    return _run_logged(run)
+
+def test_serial_records_reach_handlers(caplog):
+    assert _map_shards(_task, ['a', 'b'], 1) == ['a', 'b']
+    assert [r.getMessage() for r in caplog.records] == ['shard a', 'shard b']
+
+def test_serial_records_kept_when_task_raises(caplog):
+    handlers = logging.getLogger().handlers
+    with pytest.raises(ValueError):
+        _map_shards(_task, ['a', 'bad'], 1)
+    assert [r.getMessage() for r in caplog.records] == ['shard a', 'shard bad']
+    assert logging.getLogger().handlers == handlers
+
+def test_pool_records_kept_when_task_raises(caplog):
+    with pytest.raises(ValueError, match = 'bad'):
+        _map_shards(_task, ['a', 'bad', 'c'], 2)
+    assert [r.getMessage() for r in caplog.records] == ['shard a', 'shard bad']
+
+def test_pool_records_replayed_in_order(caplog):
+    assert _map_shards(_task, list('abcdef'), 3) == list('abcdef')
+    assert [r.getMessage() for r in caplog.records] == [f'shard {s}' for s in 'abcdef']
+
+@pytest.mark.parametrize('n_jobs', [1, 3])
+def test_run_dr_parallel_matches_fit_dr(n_jobs):
+    from simplydrug import run_dr_parallel, fit_dr, synthetic_dose_response
+    df = synthetic_dose_response(30, noise = 8.).sample(frac = 1, random_state = 0)
+    kwargs = dict(n_jobs = n_jobs, plot = False, p0 = 'self_start', bounds = 'physical', shards_per_job = 2)
+    fit = run_dr_parallel(df, 'Response', '.', '.png', **kwargs)
+    expected = fit_dr(df, p0 = 'self_start', bounds = 'physical')['fit'].sort_values('Compound_id', ignore_index = True)
+    pd.testing.assert_frame_equal(fit, expected)
+    pd.testing.assert_frame_equal(run_dr_parallel(df, 'Response', '.', '.png', **kwargs), fit)
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+from simplydrug import PlateStack, synthetic_layout, synthetic_readout, synthetic_library
+
+def readout():
+    layout = synthetic_layout(384)
+    df = synthetic_readout(['P2', 'P1'], layout, features = ('Signal', 'Area'))
+    library = synthetic_library(['P2', 'P1'], layout)[['Plate', 'Well', 'Compound_id']]
+    return df.merge(library, how = 'left', on = ['Plate', 'Well'])
+
+def test_frame_round_trip():
+    df = readout().drop(index = [3, 500]) # wells without a row stay out of the frame
+    stack = PlateStack.from_frame(df, ['Signal', 'Area'])
+    assert stack.shape == (2, 384, 2) and stack.present.sum() == len(df)
+    expected = df.sort_values(['Plate'], kind = 'mergesort').reset_index(drop = True) # plates sorted, wells in plate order
+    expected[['Signal', 'Area']] = expected[['Signal', 'Area']].astype(np.float32)
+    back = stack.to_frame(categorical = False)[expected.columns]
+    pd.testing.assert_frame_equal(back, expected, check_dtype = False)
+    categorical = stack.to_frame()
+    assert (categorical.Status.astype(str) == back.Status).all()
+    np.testing.assert_array_equal(stack.status_mask('Sample').sum(), (df.Status == 'Sample').sum())
+
+def test_many_statuses():
+    df = readout()
+    df['Status'] = 'status_' + (df.index % 300).astype(str)
+    stack = PlateStack.from_frame(df, ['Signal'])
+    assert len(stack.statuses) == 300 and stack.status_codes.max() == 299
+    expected = df.sort_values('Plate', kind = 'mergesort').Status.reset_index(drop = True)
+    pd.testing.assert_series_equal(stack.to_frame(categorical = False).Status, expected)
+    assert stack.status_mask('status_299').sum() == (df.Status == 'status_299').sum()
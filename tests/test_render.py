@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+from PIL import Image
+from simplydrug import render_config, set_render_config, get_render_config, render_batch, new_figure, save_figure, histogram_feature
+
+def figure():
+    fig = new_figure(2, 2)
+    fig.subplots().plot([0, 1], [0, 1])
+    return fig
+
+def test_config_restored_on_exit():
+    before = get_render_config()
+    with render_config(dpi = 50, format = '.SVG') as config:
+        assert config == dict(before, dpi = 50, format = 'svg')
+        assert get_render_config() == config
+    assert get_render_config() == before
+    with pytest.raises(RuntimeError):
+        with render_config(skip = True):
+            raise RuntimeError()
+    assert get_render_config() == before
+
+def test_set_changes_given_settings_only():
+    before = get_render_config()
+    try:
+        assert set_render_config(dpi = 72) == dict(before, dpi = 72)
+    finally:
+        set_render_config(**before)
+
+def test_dpi_and_format(tmp_path):
+    with render_config(dpi = 50):
+        file = save_figure(figure(), str(tmp_path), 'plot.png', 'default.png', 'test')
+    assert np.allclose(Image.open(file).info['dpi'], 50, atol = 0.1)
+    with render_config(format = 'pdf'):
+        file = save_figure(figure(), str(tmp_path), 'plot.png', 'default.png', 'test')
+    assert file == str(tmp_path/'plot.pdf') and open(file, 'rb').read(4) == b'%PDF'
+
+def test_skip(tmp_path):
+    with render_config(skip = True):
+        assert save_figure(figure(), str(tmp_path), 'plot.png', 'default.png', 'test') is None
+    assert list(tmp_path.iterdir()) == []
+
+@pytest.mark.parametrize('processes', [True, False])
+def test_batch_honors_config(tmp_path, processes):
+    df = pd.DataFrame({'score': np.random.default_rng(0).normal(size = 100)})
+    specs = [(histogram_feature, dict(df = df, feature = 'score', path = str(tmp_path), save_as = f'hist_{i}.png')) for i in range(3)]
+    with render_config(format = 'svg'):
+        render_batch(specs, n_jobs = 2, processes = processes)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['hist_0.svg', 'hist_1.svg', 'hist_2.svg']
+    with render_config(skip = True):
+        render_batch([(func, dict(kwargs, save_as = f'skipped_{i}.png')) for i, (func, kwargs) in enumerate(specs)], n_jobs = 2, processes = processes)
+    assert len(list(tmp_path.iterdir())) == 3
@@ -0,0 +1,32 @@
+import pandas as pd
+import pytest
+
+pptx = pytest.importorskip('pptx')
+from pptx.util import Inches, Pt
+from lxml import etree
+from simplydrug import df_to_table
+
+def per_cell_table(df, slide, left, top, width, height):
+    """df_to_table of the original library, one python-pptx call per cell."""
+    res = slide.shapes.add_table(df.shape[0] + 1, df.shape[1], left, top, width, height)
+    colnames = list(df.columns)
+    colnames[0] = 'idx'
+    for col, name in enumerate(colnames):
+        res.table.cell(0, col).text = name if isinstance(name, str) else ' '.join(name)
+        res.table.cell(0, col).text_frame.paragraphs[0].font.size = Pt(9)
+    for row in range(df.shape[0]):
+        for col in range(df.shape[1]):
+            res.table.cell(row + 1, col).text = str(df.values[row, col])
+            res.table.cell(row + 1, col).text_frame.paragraphs[0].font.size = Pt(9)
+    return res
+
+def test_table_xml_matches_python_pptx():
+    df = pd.DataFrame({'Compound': ['', 'two\nlines', 'bell\x07 tab\t cr\r', 'soft\vbreak', '<&>', 'trailing\n'],
+                       'Value': [1.5, None, 3, -4, 0, 2e-9]})
+    prs = pptx.Presentation()
+    tables = []
+    for make in (per_cell_table, df_to_table):
+        slide = prs.slides.add_slide(prs.slide_layouts[6])
+        shape = make(df, slide, Inches(1), Inches(1), Inches(6), Inches(3))
+        tables.append(etree.tostring(shape._element.graphic.graphicData.tbl))
+    assert tables[1] == tables[0]
@@ -0,0 +1,122 @@
+import pytest
+import numpy as np
+import pandas as pd
+from simplydrug import get_growth_scores, filter_curves, normalize_b, set_strict, prune_dose, synthetic_layout, synthetic_kinetics, synthetic_readout, \
+    synthetic_dose_response
+
+def baseline_growth_scores(df):
+    """get_growth_scores of the original library, one well at a time."""
+    df = df.astype(float).sort_values(['Time'])
+    times = df.Time.values.astype(int)
+    ts_data = pd.concat([pd.DataFrame({'Well': name, 'Time': times, 'OD': data}) for name, data in df.drop(columns = ['Time']).items()])
+    wells = []
+    for name, well in ts_data.groupby('Well'):
+        well = well.copy()
+        well['past'] = np.append(well.OD.values[0], well.OD.values[:-1])
+        well['grate'] = (well.OD - well.past)/well.past
+        well['gscore'] = (well.OD.max() - well.OD.values[0]) + well.grate.max()*0.25
+        wells.append(well)
+    return pd.concat(wells).drop(columns = ['past'])
+
+def test_growth_scores_match_baseline():
+    df = synthetic_kinetics(synthetic_layout(96), n_times = 12)
+    df = df.sample(frac = 1, random_state = 0) # unsorted timepoints
+    pd.testing.assert_frame_equal(get_growth_scores(df), baseline_growth_scores(df), check_dtype = False)
+
+def baseline_bscore(df, feature, max_iter = 10):
+    """B-scores of one plate by a plain median polish of its (rows x columns) table of sample wells."""
+    row, col = df.Well.str[0], df.Well.str[1:].astype(int)
+    x = df.assign(_row = row, _col = col).pivot(index = '_row', columns = '_col', values = feature)
+    samples = df.assign(_row = row, _col = col).pivot(index = '_row', columns = '_col', values = 'Status') == 'Sample'
+    z, row_effect, col_effect = x.where(samples), pd.Series(0., index = x.index), pd.Series(0., index = x.columns)
+    for i in range(max_iter):
+        r = z.median(axis = 1).fillna(0)
+        z, row_effect = z.sub(r, axis = 0), row_effect + r
+        c = z.median(axis = 0).fillna(0)
+        z, col_effect = z - c, col_effect + c
+        if max(r.abs().max(), c.abs().max()) < 1e-6:
+            break
+    resid = x.sub(row_effect, axis = 0) - col_effect
+    fit = resid.where(samples).stack()
+    scores = resid/(1.4826*(fit - fit.median()).abs().median())
+    return scores.values[pd.Index(scores.index).get_indexer(row), pd.Index(scores.columns).get_indexer(col)]
+
+def test_bscore_matches_baseline():
+    df = synthetic_readout(['P1', 'P2', 'P3'], synthetic_layout(384))
+    expected = np.concatenate([baseline_bscore(plate, 'Signal') for _, plate in df.groupby('Plate', sort = False)])
+    np.testing.assert_allclose(normalize_b(df.copy(), 'Signal', plate = 'Plate').Signal_bscore.values, expected, rtol = 1e-9, atol = 1e-9)
+
+def baseline_prune_dose(df, threshold = -0.15):
+    """prune_dose of the original library, for one compound."""
+    prunned = []
+    curr_max = 0.0000001
+    for name, group in df.sort_values('Dose').groupby('Dose'):
+        percent_change = (group.Response.mean()/curr_max) - 1
+        if group.Response.mean() > curr_max:
+            curr_max = group.Response.mean()
+        if percent_change > threshold:
+            prunned.append(group)
+    return pd.concat(prunned)
+
+def test_prune_dose_matches_baseline():
+    df = synthetic_dose_response(20, noise = 20.)
+    df['Response'] = 100 - df.Response # rising curves, so responses drop past their maximum at the noisy high doses
+    expected = pd.concat([baseline_prune_dose(group) for _, group in df.groupby('Compound_id')])
+    pruned = prune_dose(df)
+    assert len(pruned) < len(df)
+    pd.testing.assert_frame_equal(pruned.sort_index(), expected.sort_index())
+
+@pytest.mark.parametrize('change, message', [(lambda df: df.assign(Plate = df.Plate.where(df.Well != 'B2')), 'no \'Plate\' value'),
+                                             (lambda df: df.assign(Well = df.Well.where(df.Well != 'B2', 'Z99')), 'Unknown well names'),
+                                             (lambda df: df.assign(Well = df.Well.where(df.Well != 'B2', 'B3')), 'duplicate wells')])
+def test_bscore_rejects_bad_wells(change, message):
+    df = change(synthetic_readout(['P1', 'P2'], synthetic_layout(96)))
+    previous = set_strict(True)
+    try:
+        with pytest.raises(ValueError, match = message):
+            normalize_b(df, 'Signal', plate = 'Plate')
+    finally:
+        set_strict(previous)
+
+def baseline_filter_curves(df):
+    """filter_curves of the original library, one well at a time, with the reason of every rejection."""
+    wells = []
+    for name, well in df.groupby('Well'):
+        well = well.copy().sort_values(['Time']).reset_index()
+        if (well.grate.min() < -0.2) and (well.grate.idxmin() > 4):
+            well['Result'], well['Reason'] = 'Invalid_sample', 'sudden_drop'
+        elif well.OD.values[0] > 0.2:
+            well['Result'], well['Reason'] = 'Invalid_sample', 'high_start'
+        else:
+            well['Result'], well['Reason'] = well.Status, ''
+        wells.append(well)
+    return pd.concat(wells)
+
+def growth_curves():
+    layout = synthetic_layout(96)
+    reading = synthetic_kinetics(layout, n_times = 12)
+    reading['B2'] = reading['B2'] + 0.3 # high start
+    reading.loc[reading.Time > 8, 'C3'] *= 0.5 # sudden drop late in the curve
+    reading.loc[reading.Time > 2, 'D4'] *= 0.5 # early drop, kept
+    df = get_growth_scores(reading)
+    return df.assign(Status = df.Well.map(dict(zip(layout['Well'], layout['Status'])))).sample(frac = 1, random_state = 0)
+
+def test_filter_curves_matches_baseline():
+    df = growth_curves()
+    clean, expected = filter_curves(df), baseline_filter_curves(df)
+    assert set(clean.Well[clean.Reason != '']) == {'B2', 'C3'}
+    pd.testing.assert_frame_equal(clean, expected, check_dtype = False)
+
+def test_filter_curves_custom_rules():
+    rules = [{'name': 'no_growth', 'conditions': [('OD', 'range', '<', 0.1)]},
+             {'name': 'late_peak', 'conditions': [('OD', 'argmax', '>=', 8), ('OD', 'max', '>', 1.)]}]
+    df = growth_curves()
+    clean = filter_curves(df, rules)
+    od = df.pivot(index = 'Well', columns = 'Time', values = 'OD')
+    no_growth = od.max(axis = 1) - od.min(axis = 1) < 0.1
+    late_peak = (od.values.argmax(axis = 1) >= 8) & (od.max(axis = 1) > 1.)
+    expected = pd.Series(np.where(no_growth, 'no_growth', np.where(late_peak, 'late_peak', '')), index = od.index)
+    reasons = clean.groupby('Well').Reason.first()
+    assert (reasons != '').any()
+    pd.testing.assert_series_equal(reasons, expected, check_names = False)
+    assert (clean.Result == clean.Status.where(clean.Reason == '', 'Invalid_sample')).all()
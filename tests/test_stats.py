@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+import pytest
+from simplydrug import ScreenStats, run_statistics, synthetic_layout, synthetic_readout
+
+def test_merged_workers_match_one_pass():
+    df = synthetic_readout(['P1', 'P2', 'P3', 'P4'], synthetic_layout(96))
+    plates = list(df.groupby('Plate'))
+    workers = [ScreenStats('Signal'), ScreenStats('Signal')]
+    for i, (plate, rows) in enumerate(plates):
+        workers[i % 2].update(rows, plate)
+    merged = workers[0].merge(workers[1]).summary().set_index('Status')
+    expected = run_statistics(df, 'Signal').set_index('Status')
+    np.testing.assert_allclose(merged.loc[expected.index, ['mean', 'std']], expected[['mean', 'std']], rtol = 1e-9)
+    assert sorted(workers[0].plates) == ['P1', 'P2', 'P3', 'P4']
+
+def test_merge_rejects_shared_plates():
+    df = synthetic_readout(['P1', 'P2'], synthetic_layout(96))
+    a, b = ScreenStats('Signal'), ScreenStats('Signal')
+    a.update(df[df.Plate == 'P1'])
+    b.update(df[df.Plate == 'P2'])
+    with pytest.raises(ValueError):
+        a.merge(b) # both unnamed plates are plate 0
+    with pytest.raises(ValueError):
+        a.update(df[df.Plate == 'P2'], 0)